@@ -0,0 +1,64 @@
+"""
+Пакетное редактирование файлов без графического интерфейса.
+
+Запуск: python batch.py [-j N] [-o КАТАЛОГ] [--json] СЦЕНАРИЙ ФАЙЛ...
+
+Сценарий описан в model.batch.parse_script ("-" - стандартный ввод).
+Для каждого файла выводится время открытия, правок и сохранения.
+"""
+import argparse
+import json
+import sys
+
+from model.batch import parse_script, run_batch
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description='Пакетное редактирование двоичных файлов')
+    parser.add_argument('script', help='файл сценария правок или -')
+    parser.add_argument('files', nargs='+', help='редактируемые файлы')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='количество процессов')
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help='каталог для результатов вместо перезаписи')
+    parser.add_argument('--json', action='store_true',
+                        help='выводить итоги в виде JSON-строк')
+    args = parser.parse_args()
+
+    if args.script == '-':
+        lines = sys.stdin.readlines()
+    else:
+        with open(args.script, encoding='utf-8') as file:
+            lines = file.readlines()
+    try:
+        edits = parse_script(lines)
+    except ValueError as error:
+        parser.error(str(error))
+
+    failed = 0
+    for result in run_batch(args.files, edits, args.output_dir, args.jobs):
+        failed += result.error is not None
+        if args.json:
+            print(json.dumps({'file': result.file_name,
+                              'target': result.target,
+                              'edits': result.edits,
+                              'bytes_written': result.bytes_written,
+                              'bytes_copied': result.bytes_copied,
+                              'open_time': result.open_time,
+                              'edit_time': result.edit_time,
+                              'save_time': result.save_time,
+                              'error': result.error}), flush=True)
+        elif result.error is not None:
+            print(f'{result.file_name}: {result.error}', file=sys.stderr)
+        else:
+            print(f'{result.file_name}: {result.edits} edits, '
+                  f'{result.bytes_written} bytes, '
+                  f'open {result.open_time:.3f} s, '
+                  f'edit {result.edit_time:.3f} s, '
+                  f'save {result.save_time:.3f} s', flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,377 @@
+"""
+Бенчмарк горячих путей модели на синтетических файлах: открытие
+буфера, update_data по случайным смещениям, to_hex и to_text, get_size,
+write_data, а также undo и redo по длинной истории правок. Для каждого
+размера файла замеры повторяются при нескольких плотностях правок
+(правок на мебибайт), сделанных заранее по случайным смещениям.
+
+Результаты пишутся в JSON. С --baseline каждое время на операцию
+сравнивается с прежним прогоном, и замедление больше порога считается
+регрессией: программа завершается с кодом 1. Qt не используется.
+
+Запуск: python -m benchmarks.hot_paths [--sizes 1M,64M,1G]
+[--densities 0,16,256] [-o results.json] [--baseline old.json]
+[--threshold 0.25] [--limit update_data=0.5]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from model.model import Buffer
+
+SUFFIXES = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+BENCHMARKS = ('open', 'edit', 'update_data', 'render', 'get_size',
+              'write_data', 'undo', 'redo')
+Result = Dict[str, object]
+
+
+def parse_size(text: str) -> int:
+    """
+    Разбирает размер с необязательным двоичным суффиксом K, M или G.
+
+    :param text: Размер, например 64M.
+    :type text: str
+    :return: Размер в байтах.
+    :rtype: int
+    :raises ValueError: Если размер записан неверно.
+    """
+    text = text.strip().upper().rstrip('B')
+    factor = SUFFIXES.get(text[-1:], 1)
+    if text[-1:] in SUFFIXES:
+        text = text[:-1]
+    return int(float(text) * factor)
+
+
+def generate_file(file_name: str, size: int, seed: int,
+                  chunk_size: int = 1048576) -> None:
+    """
+    Записывает файл из сдвинутых копий одного случайного блока.
+
+    :param file_name: Имя файла.
+    :type file_name: str
+    :param size: Размер файла.
+    :type size: int
+    :param seed: Зерно генератора.
+    :type seed: int
+    :param chunk_size: Размер блока.
+    :type chunk_size: int
+    """
+    block = random.Random(seed).randbytes(chunk_size)
+    with open(file_name, 'wb') as file:
+        for index, offset in enumerate(range(0, size, chunk_size)):
+            shift = index * 4099 % chunk_size
+            chunk = block[shift:] + block[:shift]
+            file.write(chunk[:size - offset])
+
+
+def timed(function: Callable[[int], None], ops: int,
+          repeat: int) -> Tuple[float, float]:
+    """
+    Выполняет function(номер) ops раз в каждом из repeat повторов.
+
+    :param function: Замеряемая операция.
+    :type function: Callable[[int], None]
+    :param ops: Количество операций в повторе.
+    :type ops: int
+    :param repeat: Количество повторов.
+    :type repeat: int
+    :return: Лучшее время повтора и время на операцию в секундах.
+    :rtype: Tuple[float, float]
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for index in range(ops):
+            function(index)
+        best = min(best, time.perf_counter() - start)
+    return best, best / max(ops, 1)
+
+
+def apply_edits(buffer: Buffer, count: int, rng: random.Random) -> None:
+    """
+    Делает count однобайтовых правок по случайным смещениям тем же
+    путём, что и ввод с клавиатуры: треть правок - вставки.
+
+    :param buffer: Буфер.
+    :type buffer: Buffer
+    :param count: Количество правок.
+    :type count: int
+    :param rng: Генератор случайных чисел.
+    :type rng: random.Random
+    """
+    rows = max(1, buffer.get_size() // buffer.len_ascii_char)
+    for _ in range(count):
+        buffer.update_data(rng.randrange(rows))
+        buffer.add_byte(rng.randrange(max(1, len(buffer.shown))),
+                        bytes((rng.randrange(256),)),
+                        rng.randrange(3) != 0)
+
+
+def replay_history(buffer: Buffer, undo: bool
+                   ) -> Tuple[Tuple[float, float], int]:
+    """
+    Отменяет (или повторяет) все записи журнала, включая вытесненные в
+    файл истории. Правки подряд склеиваются в одну запись, поэтому
+    записей бывает меньше, чем правок, и время делится на число
+    записей.
+
+    :param buffer: Буфер.
+    :type buffer: Buffer
+    :param undo: Отменять (True) или повторять (False).
+    :type undo: bool
+    :return: Время прохода и время на запись в секундах, число записей.
+    :rtype: Tuple[Tuple[float, float], int]
+    """
+    logger = buffer.logger
+    stack = logger.undo_stack if undo else logger.redo_stack
+    spilled = logger.spilled_undo if undo else logger.spilled_redo
+    step = logger.undo if undo else logger.redo
+    count = 0
+    start = time.perf_counter()
+    while stack or spilled:
+        step()
+        count += 1
+    elapsed = time.perf_counter() - start
+    return (elapsed, elapsed / max(count, 1)), count
+
+
+def run_case(file_name: str, size: int, density: int, ops: int,
+             repeat: int, selected: List[str], work_dir: str,
+             seed: int) -> List[Result]:
+    """
+    Замеряет выбранные операции на одном файле при одной плотности
+    правок.
+
+    :param file_name: Имя файла.
+    :type file_name: str
+    :param size: Размер файла.
+    :type size: int
+    :param density: Количество правок на мебибайт.
+    :type density: int
+    :param ops: Количество операций в повторе для быстрых операций.
+    :type ops: int
+    :param repeat: Количество повторов.
+    :type repeat: int
+    :param selected: Имена замеряемых операций.
+    :type selected: List[str]
+    :param work_dir: Каталог для записываемых файлов.
+    :type work_dir: str
+    :param seed: Зерно генератора.
+    :type seed: int
+    :return: Результаты замеров.
+    :rtype: List[Result]
+    """
+    rng = random.Random(seed)
+    edits = max(1, size * density >> 20) if density else 0
+    results: List[Result] = []
+
+    def record(name: str, measured: Tuple[float, float], count: int) -> None:
+        results.append({'benchmark': name, 'size': size,
+                        'density': density, 'edits': edits, 'ops': count,
+                        'seconds': measured[0], 'per_op': measured[1]})
+
+    if 'open' in selected:
+        record('open', timed(lambda _: Buffer(file_name).close(), 10,
+                             repeat), 10)
+    buffer = Buffer(file_name)
+    try:
+        start = time.perf_counter()
+        apply_edits(buffer, edits, rng)
+        if 'edit' in selected and edits:
+            elapsed = time.perf_counter() - start
+            record('edit', (elapsed, elapsed / edits), edits)
+        rows = max(1, buffer.get_size() // buffer.len_ascii_char)
+        shifts = [rng.randrange(rows) for _ in range(ops)]
+        if 'update_data' in selected:
+            record('update_data', timed(
+                lambda index: buffer.update_data(shifts[index]), ops,
+                repeat), ops)
+        if 'render' in selected:
+            def render(index: int) -> None:
+                buffer.row_cache.clear()
+                buffer.update_data(shifts[index])
+                buffer.to_hex()
+                buffer.to_text()
+            record('render', timed(render, ops, repeat), ops)
+        if 'get_size' in selected:
+            record('get_size', timed(lambda _: buffer.get_size(), ops,
+                                     repeat), ops)
+        if 'write_data' in selected:
+            target_name = os.path.join(work_dir, 'hexbench-write.bin')
+            try:
+                def write(_: int) -> None:
+                    with open(target_name, 'wb') as target:
+                        buffer.write_data(target)
+                record('write_data', timed(write, 1, repeat), 1)
+            finally:
+                os.remove(target_name)
+        if edits and ('undo' in selected or 'redo' in selected):
+            undo = redo = (float('inf'), float('inf'))
+            records = 0
+            for _ in range(repeat):
+                measured, records = replay_history(buffer, True)
+                undo = min(undo, measured)
+                redo = min(redo, replay_history(buffer, False)[0])
+            if 'undo' in selected:
+                record('undo', undo, records)
+            if 'redo' in selected:
+                record('redo', redo, records)
+    finally:
+        buffer.close()
+    return results
+
+
+def result_key(result: Result) -> str:
+    """
+    Ключ для сопоставления результата с базовым прогоном.
+
+    :param result: Результат замера.
+    :type result: Result
+    :return: Ключ.
+    :rtype: str
+    """
+    return f"{result['benchmark']}/{result['size']}/{result['density']}"
+
+
+def compare_results(results: List[Result], baseline: List[Result],
+                    threshold: float, limits: Dict[str, float]
+                    ) -> List[Result]:
+    """
+    Сравнивает время на операцию с базовым прогоном. Замер, которого
+    нет в базовом прогоне, пропускается.
+
+    :param results: Текущие результаты.
+    :type results: List[Result]
+    :param baseline: Результаты базового прогона.
+    :type baseline: List[Result]
+    :param threshold: Допустимое относительное замедление (0.25 -
+    на 25 %).
+    :type threshold: float
+    :param limits: Пороги для отдельных операций.
+    :type limits: Dict[str, float]
+    :return: Сравнения (ключ, отношение, порог, регрессия).
+    :rtype: List[Result]
+    """
+    previous = {result_key(result): result for result in baseline}
+    comparisons: List[Result] = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None or not old['per_op']:
+            continue
+        ratio = result['per_op'] / old['per_op']
+        limit = limits.get(result['benchmark'], threshold)
+        comparisons.append({'key': result_key(result), 'ratio': ratio,
+                            'threshold': limit,
+                            'regression': ratio > 1 + limit})
+    return comparisons
+
+
+def parse_limits(items: List[str]) -> Dict[str, float]:
+    """
+    Разбирает пороги вида ИМЯ=ЗНАЧЕНИЕ.
+
+    :param items: Пороги.
+    :type items: List[str]
+    :return: Пороги по именам операций.
+    :rtype: Dict[str, float]
+    :raises ValueError: Если порог записан неверно.
+    """
+    limits = {}
+    for item in items:
+        name, _, value = item.partition('=')
+        if name not in BENCHMARKS:
+            raise ValueError(f'Неизвестная операция: {name}')
+        limits[name] = float(value)
+    return limits
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк горячих путей модели')
+    parser.add_argument('--sizes', default='1M,16M,256M',
+                        help='размеры файлов через запятую (до 10G)')
+    parser.add_argument('--densities', default='0,16,256',
+                        help='правок на мебибайт через запятую')
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS),
+                        help='замеряемые операции через запятую')
+    parser.add_argument('--ops', type=int, default=1000,
+                        help='операций в повторе для быстрых операций')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='количество повторов')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dir', default=tempfile.gettempdir(),
+                        help='каталог для синтетических файлов')
+    parser.add_argument('--keep-files', action='store_true',
+                        help='не удалять синтетические файлы')
+    parser.add_argument('-o', '--output', default='hot_paths.json',
+                        help='файл результатов')
+    parser.add_argument('--baseline', default=None,
+                        help='результаты прежнего прогона')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='допустимое замедление (0.25 - на 25 %%)')
+    parser.add_argument('--limit', action='append', default=[],
+                        metavar='ИМЯ=ЗНАЧЕНИЕ',
+                        help='порог для отдельной операции')
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = [parse_size(item) for item in args.sizes.split(',')]
+        densities = [int(item) for item in args.densities.split(',')]
+        limits = parse_limits(args.limit)
+    except ValueError as error:
+        parser.error(str(error))
+    selected = args.benchmarks.split(',')
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f'Неизвестные операции: {", ".join(sorted(unknown))}')
+
+    results: List[Result] = []
+    print(f'{"benchmark":>12} {"size":>12} {"density":>8} {"ops":>8} '
+          f'{"per op, us":>12}', flush=True)
+    for size in sizes:
+        file_name = os.path.join(args.dir, f'hexbench-{size}.bin')
+        if not (os.path.exists(file_name)
+                and os.path.getsize(file_name) == size):
+            generate_file(file_name, size, args.seed)
+        try:
+            for density in densities:
+                for result in run_case(file_name, size, density, args.ops,
+                                       args.repeat, selected, args.dir,
+                                       args.seed):
+                    results.append(result)
+                    print(f'{result["benchmark"]:>12} {size:>12} '
+                          f'{density:>8} {result["ops"]:>8} '
+                          f'{result["per_op"] * 1e6:>12.2f}', flush=True)
+        finally:
+            if not args.keep_files:
+                os.remove(file_name)
+
+    report = {'python': platform.python_version(),
+              'platform': platform.platform(),
+              'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'results': results}
+    regressions = 0
+    if args.baseline is not None:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        report['comparison'] = compare_results(results, baseline,
+                                               args.threshold, limits)
+        for comparison in report['comparison']:
+            if comparison['regression']:
+                regressions += 1
+                print(f'regression: {comparison["key"]} '
+                      f'{comparison["ratio"]:.2f}x '
+                      f'(limit {1 + comparison["threshold"]:.2f}x)')
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
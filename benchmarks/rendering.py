@@ -0,0 +1,114 @@
+"""
+Микробенчмарк отрисовки области просмотра: сравнивает прежнее
+побайтовое построение строк с пакетным (bytes.hex, bytes.translate)
+без кэша строк и с прокруткой вперёд-назад через кэш строк.
+
+Запуск: python -m benchmarks.rendering
+"""
+import os
+import sys
+import tempfile
+import timeit
+from typing import List, Tuple
+
+from model.model import Buffer
+
+
+def legacy_tens_count(buffer: Buffer) -> str:
+    end = buffer.tens_offset + len(buffer.shown) // buffer.len_ascii_char + 1
+    return ''.join([str(hex(x))[2:].zfill(7) +
+                    '0\n' for x in range(buffer.tens_offset, end)])
+
+
+def legacy_to_hex(buffer: Buffer) -> str:
+    _hex = buffer.shown.hex()
+    hex_list = [_hex[i:i + 2] for i in range(0, len(_hex), 2)]
+    if len(hex_list) % buffer.len_ascii_char != 0:
+        for i in range(0, buffer.len_ascii_char -
+                       len(hex_list) % buffer.len_ascii_char):
+            hex_list.append('')
+    return ('\n'.join(
+        [' '.join([hex_list[j] for j in
+                   range(i, i + buffer.len_ascii_char)])
+         for i in range(0, len(hex_list),
+                        buffer.len_ascii_char)]).rstrip() + ' ')
+
+
+def legacy_to_text(buffer: Buffer) -> str:
+    text = ''.join([buffer.char_decrypt(i)
+                    for i in range(len(buffer.shown))])
+    full = len(text) - len(text) % buffer.len_ascii_char
+    res = '\n'.join([text[i:i + buffer.len_ascii_char]
+                     for i in range(0, full, buffer.len_ascii_char)])
+    return (res + '\n' + text[full:]).lstrip('\n')
+
+
+def legacy_frame(buffer: Buffer, shift: int) -> None:
+    buffer.update_data(shift)
+    legacy_to_hex(buffer)
+    legacy_to_text(buffer)
+    legacy_tens_count(buffer)
+
+
+def frame(buffer: Buffer, shift: int, cached: bool) -> None:
+    if not cached:
+        buffer.row_cache.clear()
+    buffer.update_data(shift)
+    buffer.to_hex()
+    buffer.to_text()
+    buffer.tens_count()
+
+
+def measure(buffer: Buffer, rows: int,
+            number: int = 200) -> Tuple[float, float, float]:
+    """
+    Замеряет время одного кадра в микросекундах при прокрутке на
+    строку вперёд и назад: прежняя отрисовка, пакетная без кэша строк
+    и пакетная с кэшем строк.
+
+    :param buffer: Буфер.
+    :type buffer: Buffer
+    :param rows: Количество строк области просмотра.
+    :type rows: int
+    :param number: Количество повторов.
+    :type number: int
+    :return: Время трёх вариантов отрисовки.
+    :rtype: Tuple[float, float, float]
+    """
+    buffer.row_count = rows
+    buffer.update_data(1)
+    assert legacy_to_hex(buffer) == buffer.to_hex()
+    assert legacy_to_text(buffer) == buffer.to_text()
+    assert legacy_tens_count(buffer) == buffer.tens_count()
+    results = []
+    for function in (lambda i: legacy_frame(buffer, i % 2),
+                     lambda i: frame(buffer, i % 2, False),
+                     lambda i: frame(buffer, i % 2, True)):
+        counter = iter(range(number * 3))
+        results.append(min(timeit.repeat(
+            lambda: function(next(counter)), number=number,
+            repeat=3)) / number * 1e6)
+    return results[0], results[1], results[2]
+
+
+def main(argv: List[str]) -> None:
+    rows_list = [int(arg) for arg in argv] or [30, 300, 3000]
+    test_file = tempfile.NamedTemporaryFile(delete=False)
+    test_file.write(os.urandom(max(rows_list) * 16 + 64))
+    test_file.close()
+    buffer = Buffer(test_file.name)
+    try:
+        print(f'{"rows":>6} {"legacy, us":>12} {"batched, us":>12} '
+              f'{"cached, us":>12} {"speedup":>8}')
+        for rows in rows_list:
+            number = max(1, 6000 // rows)
+            legacy, batched, cached = measure(buffer, rows, number)
+            print(f'{rows:>6} {legacy:>12.1f} {batched:>12.1f} '
+                  f'{cached:>12.1f} {legacy / cached:>7.1f}x')
+    finally:
+        buffer.close()
+        os.remove(test_file.name)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
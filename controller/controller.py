@@ -1,8 +1,18 @@
-from typing import Any, Callable, List
+import io
+import threading
+from typing import Any, Callable, List, Optional
 
+from PyQt5 import QtWidgets
+
+from model.analysis import Minimap
+from model.clipboard import HEX, RAW, Clipboard
+from model.compare import DiffIndex, compare_buffers
+from model.search import Searcher, replace_all
 from view import UiMainWindow
-from controller.cursor_manager import cursor_controller_for_hex, cursor_controller_for_text
-from view.file_manager import open_file, save_file
+from view.clipboard import RAW_MIME, RangeMimeData
+from controller.scheduler import InputBatcher, ScrollScheduler
+from view.file_manager import (export_patch_file, import_patch_file,
+                               open_file, save_file)
 
 
 def save_cursor(func: Callable) -> Callable:
@@ -15,23 +25,14 @@ def save_cursor(func: Callable) -> Callable:
     :rtype: Callable
     """
     def do(self, *args: Any) -> None:
-        bytes_field_position = self.ui.bytes_field.textCursor().position()
-        bytes_decryption_field_position = (
-            self.ui.bytes_decryption_field.textCursor().position())
+        self.input_batcher.flush()
+        hex_position = self.ui.hex_view.hex_position
+        text_position = self.ui.hex_view.text_position
 
         func(self)
         self.show_file()
 
-        bytes_field_cursor = self.ui.bytes_field.textCursor()
-        bytes_field_cursor.setPosition(bytes_field_position)
-
-        bytes_decryption_field_cursor = (
-            self.ui.bytes_decryption_field.textCursor())
-        bytes_decryption_field_cursor.setPosition(
-            bytes_decryption_field_position)
-
-        self.ui.bytes_field.setTextCursor(bytes_field_cursor)
-        self.ui.bytes_decryption_field.setTextCursor(bytes_decryption_field_cursor)
+        self.ui.hex_view.set_positions(hex_position, text_position)
     return do
 
 
@@ -48,6 +49,7 @@ def requires_research(func: Callable) -> Callable:
         func(self, *args)
         try:
             self.searcher.start()
+            self.show_search_results()
         except AttributeError:
             pass
     return foo
@@ -63,13 +65,14 @@ class HexEditor:
 
         self.ui = UiMainWindow()
 
-        (self.ui.bytes_field.cursorPositionChanged.
-         connect(lambda: cursor_controller_for_hex(self.ui)))
-        (self.ui.bytes_decryption_field.cursorPositionChanged.
-         connect(lambda: cursor_controller_for_text(self.ui)))
         self.ui.open_action.triggered.connect(self.dialog_to_open)
         self.ui.save_action.triggered.connect(self.dialog_to_save)
-        self.ui.scroll_bar.valueChanged.connect(self.show_file)
+        self.ui.export_patch_action.triggered.connect(self.export_patch)
+        self.ui.import_patch_action.triggered.connect(self.import_patch)
+        self.scroll_scheduler = ScrollScheduler(self.show_file,
+                                                self.prefetch_page)
+        self.ui.scroll_bar.valueChanged.connect(self.scroll_scheduler.schedule)
+        self.input_batcher = InputBatcher(self.apply_input)
 
         self.ui.hex_field_key_pres.connect(self.update_from_hex_position)
         self.ui.text_field_key_pres.connect(self.update_from_text_position)
@@ -82,6 +85,40 @@ class HexEditor:
 
         self.ui.undo_action.triggered.connect(self.undo)
         self.ui.redo_action.triggered.connect(self.redo)
+        self.ui.select_action.triggered.connect(self.mark_selection)
+        self.ui.copy_action.triggered.connect(self.copy_selection)
+        self.ui.paste_action.triggered.connect(self.paste)
+        self.clipboard = Clipboard()
+        self.selection_start: Optional[int] = None
+
+        self.ui.compare_action.triggered.connect(self.compare_with_file)
+        self.ui.next_difference_action.triggered.connect(
+            lambda: self.jump_to_difference(1))
+        self.ui.previous_difference_action.triggered.connect(
+            lambda: self.jump_to_difference(-1))
+        self.ui.compare_finished.connect(self.show_compare_status)
+        self.diff_index: Optional[DiffIndex] = None
+        self.compare_cancelled = threading.Event()
+        self.compare_thread: Optional[threading.Thread] = None
+
+        self.ui.minimap_view.seek_requested.connect(
+            lambda offset: self.ui.scroll_bar.setValue(offset // 16))
+        self.ui.scroll_bar.valueChanged.connect(
+            lambda row: self.ui.minimap_view.set_visible_offset(row * 16))
+        self.minimap: Optional[Minimap] = None
+
+        self.ui.search_field.returnPressed.connect(self.search)
+        self.ui.search_mode.currentIndexChanged.connect(self.search)
+        self.ui.search_results.itemActivated.connect(self.jump_to_result)
+        self.ui.search_results.itemClicked.connect(self.jump_to_result)
+        self.ui.search_found.connect(self.show_search_results)
+        self.ui.replace_button.clicked.connect(self.replace_all)
+        self.ui.search_previous_page.clicked.connect(
+            lambda: self.turn_search_page(-1))
+        self.ui.search_next_page.clicked.connect(
+            lambda: self.turn_search_page(1))
+        self.search_results_limit: int = 1000
+        self.search_page: int = 0
 
     def show_file(self) -> None:
         """
@@ -89,14 +126,27 @@ class HexEditor:
         """
         try:
             self.bytes_buffer.update_data(self.ui.scroll_bar.value())
-            self.ui.bytes_field.setText(self.bytes_buffer.to_hex())
-            self.ui.bytes_decryption_field.setText(self.bytes_buffer.to_text())
-            self.ui.count_units.setText(self.bytes_buffer.units_count())
-            self.ui.count_tens.setText(self.bytes_buffer.tens_count())
-            size = self.bytes_buffer.get_size() // 16
-            if self.bytes_buffer.get_size() % 16 == 0:
-                size -= 1
-            self.ui.scroll_bar.setRange(0, size)
+            self.ui.hex_view.set_rows(self.bytes_buffer.tens_offset,
+                                      self.bytes_buffer.render_rows())
+            size = self.bytes_buffer.get_size()
+            rows = size // 16
+            if size % 16 == 0:
+                rows -= 1
+            self.ui.scroll_bar.setRange(0, rows)
+        except AttributeError:
+            pass
+
+    def prefetch_page(self, step: int) -> None:
+        """
+        Заранее строит соседнюю страницу данных.
+
+        :param step: Сдвиг в страницах (1 - следующая, -1 - предыдущая).
+        :type step: int
+        """
+        try:
+            rows = self.bytes_buffer.row_count
+            self.bytes_buffer.prefetch_rows(
+                self.bytes_buffer.tens_offset + step * rows, rows)
         except AttributeError:
             pass
 
@@ -104,8 +154,9 @@ class HexEditor:
         """
         Добавляет курсор в поле с шестнадцатеричными данными.
         """
-        self.bytes_buffer.cursors.append(
-            self.ui.bytes_field.textCursor().position())
+        self.bytes_buffer.add_cursor(self.ui.hex_view.hex_position)
+        self.ui.hex_view.cursors = self.bytes_buffer.cursors
+        self.ui.hex_view.update()
 
     def reset_cursors(self) -> None:
         """
@@ -115,19 +166,146 @@ class HexEditor:
             self.bytes_buffer.cursors = []
         except Exception:
             pass
+        self.ui.hex_view.cursors = []
+        self.ui.hex_view.update()
 
     def dialog_to_open(self) -> None:
         """
         Открывает диалоговое окно для выбора файла.
         """
+        self.input_batcher.flush()
         try:
             self.bytes_buffer = open_file()
+            self.close_searcher()
+            self.close_comparison()
+            self.close_minimap()
+            self.minimap = Minimap(self.bytes_buffer,
+                                   on_progress=self.ui.minimap_updated.emit)
+            self.ui.minimap_view.set_minimap(self.minimap)
+            self.minimap.start()
+            self.searcher = Searcher(self.bytes_buffer,
+                                     lambda _: self.ui.search_found.emit())
+            self.search()
             self.show_file()
             self.ui.scroll_bar.setValue(0)
-            self.ui.bytes_field.setReadOnly(False)
-            self.ui.bytes_decryption_field.setReadOnly(False)
+            self.ui.hex_view.setReadOnly(False)
         except FileNotFoundError:
             pass
+        except AttributeError:
+            pass
+
+    def close_searcher(self) -> None:
+        """
+        Останавливает поиск по текущему буферу.
+        """
+        try:
+            self.searcher.close()
+            delattr(self, 'searcher')
+        except AttributeError:
+            pass
+        self.ui.search_results.clear()
+        self.ui.search_status.clear()
+
+    def close_minimap(self) -> None:
+        """
+        Останавливает анализ текущего буфера и очищает полосу обзора.
+        """
+        if self.minimap is not None:
+            self.minimap.close()
+            self.minimap = None
+        self.ui.minimap_view.set_minimap(None)
+
+    def search(self) -> None:
+        """
+        Запускает поиск введённого образца в шестнадцатеричном или
+        текстовом виде.
+        """
+        try:
+            pattern = self.parse_pattern(self.ui.search_field.text())
+            self.search_page = 0
+            self.searcher.search(pattern)
+            self.show_search_results()
+        except ValueError:
+            pass
+        except AttributeError:
+            pass
+
+    def parse_pattern(self, text: str) -> bytes:
+        """
+        Переводит введённый образец в байты в соответствии с выбранным
+        режимом поиска.
+
+        :param text: Введённый текст.
+        :type text: str
+        :return: Байты образца.
+        :rtype: bytes
+        """
+        if self.ui.search_mode.currentIndex() == 0:
+            return bytes.fromhex(text)
+        return text.encode(self.bytes_buffer.encoding)
+
+    @requires_research
+    @save_cursor
+    def replace_all(self) -> None:
+        """
+        Заменяет все вхождения образца поиска одним действием. Если
+        фоновый поиск этого образца завершён, берутся его результаты,
+        иначе пул процессов используется только для большого буфера.
+        """
+        try:
+            pattern = self.parse_pattern(self.ui.search_field.text())
+            replacement = self.parse_pattern(self.ui.replace_field.text())
+            if pattern:
+                workers = 1
+                if (self.bytes_buffer.get_size()
+                        > self.searcher.parallel_chunk_size):
+                    workers = self.searcher.workers
+                replace_all(self.bytes_buffer, pattern, replacement,
+                            workers, self.searcher.parallel_chunk_size,
+                            self.searcher.complete_results(pattern))
+        except ValueError:
+            pass
+        except AttributeError:
+            pass
+
+    def show_search_results(self) -> None:
+        """
+        Показывает текущую страницу найденных смещений.
+        """
+        try:
+            count = len(self.searcher.results)
+            pages = max(1, -(-count // self.search_results_limit))
+            self.search_page = min(self.search_page, pages - 1)
+            results = self.searcher.get_results(
+                self.search_page * self.search_results_limit,
+                self.search_results_limit)
+        except AttributeError:
+            return
+        self.ui.search_results.clear()
+        self.ui.search_results.addItems([f'{offset:08x}'
+                                         for offset in results])
+        self.ui.search_status.setText(
+            f"{self.ui.locale.localize('search.found')} {count} "
+            f"({self.search_page + 1}/{pages})")
+
+    def turn_search_page(self, step: int) -> None:
+        """
+        Переходит к соседней странице результатов поиска.
+
+        :param step: Направление перехода (-1 или 1).
+        :type step: int
+        """
+        self.search_page = max(0, self.search_page + step)
+        self.show_search_results()
+
+    def jump_to_result(self, item: Any) -> None:
+        """
+        Прокручивает данные к выбранному результату поиска.
+
+        :param item: Выбранный элемент списка результатов.
+        :type item: Any
+        """
+        self.ui.scroll_bar.setValue(int(item.text(), 16) // 16)
 
     @requires_research
     @save_cursor
@@ -137,6 +315,8 @@ class HexEditor:
         """
         try:
             self.bytes_buffer.logger.undo()
+        except OSError:
+            pass
         except AttributeError:
             pass
 
@@ -148,21 +328,183 @@ class HexEditor:
         """
         try:
             self.bytes_buffer.logger.redo()
+        except OSError:
+            pass
+        except AttributeError:
+            pass
+
+    def mark_selection(self) -> None:
+        """
+        Запоминает байт под курсором как начало выделения. Выделение
+        заканчивается на байте под курсором в момент копирования и
+        может охватывать любое количество строк.
+        """
+        self.selection_start = self.ui.hex_view.cursor_offset()
+
+    def copy_selection(self) -> None:
+        """
+        Копирует выделенный диапазон в буфер обмена. Байты читаются
+        порциями во временный файл, а другим приложениям данные
+        кодируются только по запросу.
+        """
+        self.input_batcher.flush()
+        end = self.ui.hex_view.cursor_offset()
+        start = end if self.selection_start is None \
+            else self.selection_start
+        start, end = min(start, end), max(start, end)
+        try:
+            self.clipboard.copy(self.bytes_buffer, start, end - start + 1)
+        except AttributeError:
+            return
+        self.selection_start = None
+        QtWidgets.QApplication.clipboard().setMimeData(
+            RangeMimeData(self.clipboard))
+
+    @requires_research
+    @save_cursor
+    def paste(self) -> None:
+        """
+        Вставляет содержимое буфера обмена перед байтом под курсором.
+        Собственная копия вставляется потоком из временного файла,
+        данные других приложений принимаются как двоичные, как ссылка
+        на файл или как шестнадцатеричный текст.
+        """
+        try:
+            offset = self.ui.hex_view.cursor_offset()
+            system = QtWidgets.QApplication.clipboard()
+            if system.ownsClipboard():
+                self.clipboard.paste(self.bytes_buffer, offset)
+                return
+            mime = system.mimeData()
+            if mime.hasFormat(RAW_MIME):
+                self.clipboard.load(io.BytesIO(bytes(mime.data(RAW_MIME))),
+                                    RAW)
+            elif mime.hasUrls() and mime.urls()[0].isLocalFile():
+                with open(mime.urls()[0].toLocalFile(), 'rb') as file:
+                    self.bytes_buffer.insert_range(offset, file)
+                return
+            elif mime.hasText():
+                self.clipboard.load(io.BytesIO(mime.text().encode('ascii')),
+                                    HEX)
+            else:
+                return
+            self.clipboard.paste(self.bytes_buffer, offset)
+        except (ValueError, UnicodeEncodeError, OSError):
+            pass
         except AttributeError:
             pass
 
+    def export_patch(self) -> None:
+        """
+        Сохраняет изменения буфера в виде патча.
+        """
+        self.input_batcher.flush()
+        try:
+            export_patch_file(self.bytes_buffer)
+        except OSError:
+            pass
+        except AttributeError:
+            pass
+
+    @requires_research
+    @save_cursor
+    def import_patch(self) -> None:
+        """
+        Применяет патч к исходному файлу одним действием.
+        """
+        try:
+            import_patch_file(self.bytes_buffer)
+        except (OSError, ValueError):
+            pass
+        except AttributeError:
+            pass
+
+    def compare_with_file(self) -> None:
+        """
+        Открывает второй файл и сравнивает его с текущим буфером в
+        фоновом потоке. Второй файл открывается без журнала, чтобы
+        сравнивалось содержимое на диске, а не несохранённые правки.
+        По окончании показывается количество различий.
+        """
+        self.input_batcher.flush()
+        try:
+            buffer = self.bytes_buffer
+            other = open_file(journal=False)
+        except (AttributeError, FileNotFoundError):
+            return
+        if other is None:
+            return
+        self.close_comparison()
+        self.compare_buffer = other
+        self.compare_cancelled.clear()
+
+        def run() -> None:
+            index = compare_buffers(buffer, other,
+                                    cancelled=self.compare_cancelled)
+            if not self.compare_cancelled.is_set():
+                self.diff_index = index
+                self.ui.compare_finished.emit()
+
+        self.compare_thread = threading.Thread(target=run, daemon=True)
+        self.compare_thread.start()
+
+    def close_comparison(self) -> None:
+        """
+        Останавливает сравнение и закрывает второй файл.
+        """
+        self.compare_cancelled.set()
+        if self.compare_thread is not None:
+            self.compare_thread.join()
+            self.compare_thread = None
+        self.diff_index = None
+        try:
+            self.compare_buffer.close()
+            delattr(self, 'compare_buffer')
+        except AttributeError:
+            pass
+
+    def show_compare_status(self) -> None:
+        """
+        Показывает количество найденных различий.
+        """
+        if self.diff_index is not None:
+            self.ui.search_status.setText(
+                f"{self.ui.locale.localize('compare.found')} "
+                f"{len(self.diff_index)}")
+
+    def jump_to_difference(self, step: int) -> None:
+        """
+        Прокручивает данные к соседнему различию и ставит на него
+        курсор.
+
+        :param step: Направление перехода (-1 или 1).
+        :type step: int
+        """
+        if self.diff_index is None:
+            return
+        offset = self.ui.hex_view.cursor_offset()
+        found = self.diff_index.next_after(offset) if step > 0 \
+            else self.diff_index.previous_before(offset)
+        if found is None:
+            return
+        self.ui.scroll_bar.setValue(found[0] // 16)
+        self.scroll_scheduler.flush()
+        column = found[0] - self.ui.hex_view.first_row * 16
+        self.ui.hex_view.set_positions(column * 3, column + column // 16)
+
     def dialog_to_save(self) -> None:
         """
         Открывает диалоговое окно для сохранения файла.
         """
+        self.input_batcher.flush()
         try:
             save_file(self.bytes_buffer)
-            self.ui.bytes_field.clear()
-            self.ui.bytes_field.setReadOnly(True)
-            self.ui.bytes_decryption_field.clear()
-            self.ui.bytes_decryption_field.setReadOnly(True)
-            self.ui.count_tens.clear()
-            self.ui.count_units.clear()
+            self.close_searcher()
+            self.close_comparison()
+            self.close_minimap()
+            self.bytes_buffer.close()
+            self.ui.hex_view.clear()
+            self.ui.hex_view.setReadOnly(True)
             delattr(self, 'bytes_buffer')
         except FileNotFoundError:
             pass
@@ -170,9 +512,38 @@ class HexEditor:
             pass
 
     @requires_research
+    def apply_input(self, is_hex: bool, position: int,
+                    edits: List[Callable[[int], int]]) -> None:
+        """
+        Применяет пачку правок с клавиатуры, затем один раз отрисовывает
+        данные и ставит курсор после последней правки.
+
+        :param is_hex: Правки из шестнадцатеричного поля.
+        :type is_hex: bool
+        :param position: Позиция курсора перед первой правкой.
+        :type position: int
+        :param edits: Правки.
+        :type edits: List[Callable[[int], int]]
+        """
+        try:
+            for edit in edits:
+                position = edit(position)
+            self.show_file()
+        except OSError:
+            self.show_file()
+            return
+        except AttributeError:
+            return
+        if is_hex:
+            self.ui.hex_view.set_positions(position,
+                                           self.ui.hex_view.text_position)
+        else:
+            self.ui.hex_view.set_positions(self.ui.hex_view.hex_position,
+                                           position)
+
     def update_from_hex_position(self, cursor: Any, char: str) -> None:
         """
-        Обновляет данные при изменении позиции курсора в шестнадцатеричном
+        Ставит в очередь изменение данных при вводе в шестнадцатеричном
         поле.
 
         :param cursor: Позиция курсора.
@@ -180,18 +551,14 @@ class HexEditor:
         :param char: Введенный символ.
         :type char: str
         """
-        try:
-            position = self.bytes_buffer.update_from_hex_position(
-                cursor.position(), char, True)
-            self.show_file()
-            cursor.setPosition(position)
-        except AttributeError:
-            pass
+        self.input_batcher.add(
+            True, cursor.position(),
+            lambda position: self.bytes_buffer.update_from_hex_position(
+                position, char, True))
 
-    @requires_research
     def update_from_text_position(self, cursor: Any, char: str) -> None:
         """
-        Обновляет данные при изменении позиции курсора в поле с текстовыми
+        Ставит в очередь изменение данных при вводе в поле с текстовыми
         данными.
 
         :param cursor: Позиция курсора.
@@ -199,43 +566,31 @@ class HexEditor:
         :param char: Введенный символ.
         :type char: str
         """
-        try:
-            position = self.bytes_buffer.update_from_text_position(
-                cursor.position(),
-                char, True)
-            self.show_file()
-            cursor.setPosition(position)
-        except AttributeError:
-            pass
+        self.input_batcher.add(
+            False, cursor.position(),
+            lambda position: self.bytes_buffer.update_from_text_position(
+                position, char, True))
 
-    @requires_research
     def backspace_event_from_text(self, cursor: Any) -> None:
         """
-        Обрабатывает событие удаления символа из поля с текстовыми данными.
+        Ставит в очередь удаление символа из поля с текстовыми данными.
 
         :param cursor: Позиция курсора.
         :type cursor: Any
         """
-        try:
-            position = self.bytes_buffer.backspace_event_from_text(
-                cursor.position())
-            self.show_file()
-            cursor.setPosition(position)
-        except AttributeError:
-            pass
+        self.input_batcher.add(
+            False, cursor.position(),
+            lambda position: self.bytes_buffer.backspace_event_from_text(
+                position))
 
-    @requires_research
     def backspace_event_from_hex(self, cursor: Any) -> None:
         """
-        Обрабатывает событие удаления символа из шестнадцатеричного поля.
+        Ставит в очередь удаление символа из шестнадцатеричного поля.
 
         :param cursor: Позиция курсора.
         :type cursor: Any
         """
-        try:
-            position = self.bytes_buffer.backspace_event_from_hex(
-                cursor.position())
-            self.show_file()
-            cursor.setPosition(position)
-        except AttributeError:
-            pass
+        self.input_batcher.add(
+            True, cursor.position(),
+            lambda position: self.bytes_buffer.backspace_event_from_hex(
+                position))
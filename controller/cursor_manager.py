@@ -1,39 +1,44 @@
-def cursor_controller_for_text(ui):
+def cursor_controller_for_text(position: int) -> int:
     """
     Контролирует курсор, чтобы он вёл себя правильно в поле
-    с переводом.
+    с переводом: курсор не встаёт на перевод строки.
 
-    :param ui: Объект пользовательского интерфейса.
-    :type ui: QtWidgets.QMainWindow
+    :param position: Позиция курсора в текстовом поле.
+    :type position: int
+    :return: Исправленная позиция.
+    :rtype: int
     """
-    cursor = ui.bytes_decryption_field.textCursor()
-    if cursor.position() % 17 == 16:
-        cursor.movePosition(cursor.Right, cursor.MoveAnchor, 1)
-        ui.bytes_decryption_field.setTextCursor(cursor)
+    if position % 17 == 16:
+        position += 1
+    return position
 
 
-def cursor_controller_for_hex(ui):
+def cursor_controller_for_hex(position: int) -> int:
     """
     Контролирует курсор, чтобы он вёл себя правильно в поле
-    с шестнадцатеричными данными.
+    с шестнадцатеричными данными: курсор не встаёт на пробел между
+    байтами.
 
-    :param ui: Объект пользовательского интерфейса.
-    :type ui: QtWidgets.QMainWindow
+    :param position: Позиция курсора в шестнадцатеричном поле.
+    :type position: int
+    :return: Исправленная позиция.
+    :rtype: int
     """
-    cursor = ui.bytes_field.textCursor()
-    position = cursor.position()
-    text = ui.bytes_field.toPlainText()
-    if position != len(text) and text[position] == ' ':
-        cursor.movePosition(cursor.Right, cursor.MoveAnchor, 1)
-        ui.bytes_field.setTextCursor(cursor)
+    if position % 3 == 2:
+        position += 1
+    return position
 
 
-def cursor_correcting_for_hex(cursor):
+def cursor_correcting_for_hex(position: int) -> int:
     """
-    Корректирует курсор для перемещения через стрелки.
+    Корректирует курсор для перемещения через стрелки: курсор со
+    второй цифры байта переносится на первую.
 
-    :param cursor: Курсор текста.
-    :type cursor: QTextCursor
+    :param position: Позиция курсора в шестнадцатеричном поле.
+    :type position: int
+    :return: Исправленная позиция.
+    :rtype: int
     """
-    if (cursor.position() - 1) % 3 == 0:
-        cursor.movePosition(cursor.Left, cursor.MoveAnchor, 1)
+    if (position - 1) % 3 == 0:
+        position -= 1
+    return position
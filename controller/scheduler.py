@@ -0,0 +1,143 @@
+from typing import Callable, List
+
+from PyQt5 import QtCore
+
+
+class ScrollScheduler(QtCore.QObject):
+    """
+    Планировщик прокрутки. Сливает изменения положения полосы
+    прокрутки в одну отрисовку за кадр, а после отрисовки, пока цикл
+    событий простаивает, заранее строит соседние страницы: сначала по
+    направлению движения, затем позади.
+
+    :param render: Отрисовка текущего положения.
+    :type render: Callable[[], None]
+    :param prefetch: Подготовка страницы со сдвигом на заданное
+    количество страниц (1 - следующая, -1 - предыдущая).
+    :type prefetch: Callable[[int], None]
+    :param interval: Длительность кадра в миллисекундах.
+    :type interval: int
+    """
+
+    def __init__(self, render: Callable[[], None],
+                 prefetch: Callable[[int], None],
+                 interval: int = 16) -> None:
+        super().__init__()
+        self.render: Callable[[], None] = render
+        self.prefetch: Callable[[int], None] = prefetch
+        self.value: int = 0
+        self.direction: int = 1
+        self.pages: List[int] = []
+
+        self.frame_timer = QtCore.QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(interval)
+        self.frame_timer.timeout.connect(self.flush)
+
+        self.prefetch_timer = QtCore.QTimer(self)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.setInterval(0)
+        self.prefetch_timer.timeout.connect(self.prefetch_next)
+
+    def schedule(self, value: int) -> None:
+        """
+        Запоминает новое положение и планирует отрисовку, если она ещё
+        не запланирована.
+
+        :param value: Положение полосы прокрутки.
+        :type value: int
+        """
+        if value != self.value:
+            self.direction = 1 if value > self.value else -1
+        self.value = value
+        self.prefetch_timer.stop()
+        if not self.frame_timer.isActive():
+            self.frame_timer.start()
+
+    def flush(self) -> None:
+        """
+        Отрисовывает последнее положение и запускает подготовку
+        соседних страниц.
+        """
+        self.frame_timer.stop()
+        self.render()
+        self.pages = [self.direction, -self.direction]
+        self.prefetch_timer.start()
+
+    def prefetch_next(self) -> None:
+        """
+        Готовит одну соседнюю страницу за такт цикла событий, чтобы не
+        задерживать ввод.
+        """
+        if not self.pages:
+            return
+        self.prefetch(self.pages.pop(0))
+        if self.pages:
+            self.prefetch_timer.start()
+
+
+class InputBatcher(QtCore.QObject):
+    """
+    Накопитель ввода. Правки от нажатий клавиш собираются в очередь и
+    применяются одной пачкой за такт цикла событий, поэтому при
+    автоповторе или быстром наборе данные отрисовываются и поиск
+    перезапускается один раз на пачку.
+
+    Пока пачка не применена, курсор в поле не двигается, и каждое
+    следующее нажатие приходит с той же позицией. Нажатие в другом
+    поле или с другой позицией сначала применяет накопленную пачку.
+
+    :param apply: Применение пачки: поле (True - шестнадцатеричное),
+    начальная позиция курсора и список правок. Каждая правка принимает
+    позицию курсора и возвращает новую.
+    :type apply: Callable[[bool, int, List[Callable[[int], int]]], None]
+    """
+
+    def __init__(self, apply: Callable[[bool, int,
+                                        List[Callable[[int], int]]], None]
+                 ) -> None:
+        super().__init__()
+        self.apply: Callable[[bool, int,
+                              List[Callable[[int], int]]], None] = apply
+        self.edits: List[Callable[[int], int]] = []
+        self.is_hex: bool = True
+        self.start: int = 0
+        self.position: int = 0
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.flush)
+
+    def add(self, is_hex: bool, position: int,
+            edit: Callable[[int], int]) -> None:
+        """
+        Добавляет правку в очередь.
+
+        :param is_hex: Правка из шестнадцатеричного поля.
+        :type is_hex: bool
+        :param position: Позиция курсора в поле.
+        :type position: int
+        :param edit: Правка.
+        :type edit: Callable[[int], int]
+        """
+        if self.edits and (is_hex != self.is_hex
+                           or position != self.position):
+            self.flush()
+        if not self.edits:
+            self.is_hex = is_hex
+            self.start = position
+        self.position = position
+        self.edits.append(edit)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self) -> None:
+        """
+        Применяет накопленные правки.
+        """
+        self.timer.stop()
+        if not self.edits:
+            return
+        edits, self.edits = self.edits, []
+        self.apply(self.is_hex, self.start, edits)
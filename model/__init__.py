@@ -1,2 +1,37 @@
+import importlib
+
 from model.model import Buffer
 from model.logging import LogRecord, Logger
+from model.piece_table import PieceTable
+from model.saving import WriteStats
+from model.render_cache import RowCache
+from model.journal import Journal
+
+# Подсистемы, не нужные для открытия и сохранения буфера, загружаются
+# при первом обращении, чтобы импорт пакета (например, из CLI) оставался
+# дешёвым.
+_LAZY = {
+    'Searcher': 'model.search',
+    'Clipboard': 'model.clipboard',
+    'export_patch': 'model.patch',
+    'import_patch': 'model.patch',
+    'DiffIndex': 'model.compare',
+    'compare_buffers': 'model.compare',
+    'HashTree': 'model.checksum',
+    'Minimap': 'model.analysis',
+}
+
+
+def __getattr__(name: str):
+    """
+    Импортирует подсистему пакета при первом обращении к её имени.
+
+    :param name: Имя атрибута пакета.
+    :type name: str
+    :return: Объект из соответствующего модуля.
+    """
+    if name not in _LAZY:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(_LAZY[name]), name)
+    globals()[name] = value
+    return value
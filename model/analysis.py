@@ -0,0 +1,380 @@
+import collections
+import math
+import os
+import struct
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from model.model import Buffer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b'HXM1'
+HEADER = struct.Struct('<4sQQQQ')
+ENTRY = struct.Struct('<5d')
+PRINTABLE = bytes(range(0x20, 0x7f)) + b'\t\n\r'
+CONTROL = bytes(value for value in range(1, 0x20)
+                if value not in b'\t\n\r') + b'\x7f'
+
+Stats = Tuple[float, float, float, float, float]
+
+
+def block_stats(data: bytes) -> Stats:
+    """
+    Считает энтропию блока (бит на байт, от 0 до 8) и доли классов
+    байтов: нулевых, печатаемых ASCII, управляющих и старших (0x80 и
+    выше). Без NumPy гистограмма строится collections.Counter - так же
+    точно, но в несколько раз медленнее.
+
+    :param data: Блок.
+    :type data: bytes
+    :return: Кортеж (энтропия, нули, текст, управляющие, старшие).
+    :rtype: Stats
+    """
+    if numpy is not None:
+        return many_block_stats(data, len(data) or 1)[0]
+    if not data:
+        return 0.0, 0.0, 0.0, 0.0, 0.0
+    total = len(data)
+    counter = collections.Counter(data)
+    counts = [counter[value] for value in range(256)]
+    entropy = 0.0 - sum(count / total * math.log2(count / total)
+                        for count in counts if count)
+    return (entropy, counts[0] / total,
+            sum(counts[value] for value in PRINTABLE) / total,
+            sum(counts[value] for value in CONTROL) / total,
+            sum(counts[0x80:]) / total)
+
+
+def many_block_stats(data: bytes, block_size: int) -> List[Stats]:
+    """
+    Считает block_stats для подряд идущих блоков одной большой порции.
+    С NumPy гистограммы строятся bincount без копирования блоков, а
+    энтропия и доли классов считаются для всех блоков сразу.
+
+    :param data: Порция.
+    :type data: bytes
+    :param block_size: Размер блока.
+    :type block_size: int
+    :return: Статистика блоков по порядку.
+    :rtype: List[Stats]
+    """
+    if numpy is None:
+        return [block_stats(data[start:start + block_size])
+                for start in range(0, len(data), block_size)]
+    values = numpy.frombuffer(data, dtype=numpy.uint8)
+    counts = numpy.stack([
+        numpy.bincount(values[start:start + block_size], minlength=256)
+        for start in range(0, max(len(values), 1), block_size)])
+    totals = counts.sum(axis=1, keepdims=True).clip(min=1)
+    shares = counts / totals
+    logs = numpy.log2(numpy.where(shares > 0, shares, 1))
+    entropy = 0.0 - (shares * logs).sum(axis=1)
+    printable = numpy.frombuffer(PRINTABLE, dtype=numpy.uint8)
+    control = numpy.frombuffer(CONTROL, dtype=numpy.uint8)
+    result = numpy.stack([entropy, shares[:, 0],
+                          shares[:, printable].sum(axis=1),
+                          shares[:, control].sum(axis=1),
+                          shares[:, 0x80:].sum(axis=1)], axis=1)
+    return [tuple(row) for row in result.tolist()]
+
+
+class Minimap:
+    """
+    Обзор содержимого буфера по блокам: энтропия и доли классов байтов.
+    Блоки читаются порциями по read_size байтов в фоновом потоке.
+
+    Минимап подписан на журнал изменений буфера: замена байтов
+    помечает свои блоки. При вставке и удалении значения блоков за
+    местом правки сдвигаются на целое число блоков. Если сдвиг кратен
+    размеру блока, пересчитываются только изменённые блоки, иначе
+    сдвинутые блоки тоже помечаются: их данные смещены меньше чем на
+    блок, и до пересчёта в фоне показываются сдвинутые приближённые
+    значения.
+
+    Для файла без правок результат сохраняется рядом с ним в индекс
+    (имя файла + .minimap) с размером и временем изменения файла, и
+    при следующем открытии читается оттуда.
+
+    :param buffer: Буфер.
+    :type buffer: Buffer
+    :param block_size: Размер блока.
+    :type block_size: int
+    :param read_size: Размер читаемой порции.
+    :type read_size: int
+    :param on_progress: Функция, вызываемая из фонового потока после
+    каждой порции.
+    :type on_progress: Optional[Callable[[], None]]
+    """
+
+    def __init__(self, buffer: Buffer, block_size: int = 1048576,
+                 read_size: int = 67108864,
+                 on_progress: Optional[Callable[[], None]] = None) -> None:
+        self.buffer: Buffer = buffer
+        self.block_size: int = block_size
+        self.read_size: int = max(block_size,
+                                  read_size - read_size % block_size)
+        self.on_progress: Optional[Callable[[], None]] = on_progress
+        self.index_path: str = buffer.file_name + '.minimap'
+        self.stats: List[Optional[Stats]] = []
+        self.stale: List[bool] = []
+        self.lock: threading.Lock = threading.Lock()
+        self.cancelled: threading.Event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.running: bool = False
+        self.reading: Optional[Tuple[int, int]] = None
+        self.resize(0)
+        self.load_index()
+        buffer.logger.listeners.append(self.on_change)
+
+    def resize(self, first: int) -> None:
+        """
+        Подгоняет количество блоков под размер буфера и помечает блоки,
+        начиная с first.
+
+        :param first: Номер первого изменённого блока.
+        :type first: int
+        """
+        count = -(-self.buffer.get_size() // self.block_size)
+        del self.stats[count:]
+        self.stats.extend([None] * (count - len(self.stats)))
+        self.stale = self.stale[:count] + [True] * (count - len(self.stale))
+        for index in range(first, count):
+            self.stale[index] = True
+
+    def shift(self, offset: int, removed: int, inserted: int) -> None:
+        """
+        Сдвигает значения блоков за изменённым диапазоном на целое число
+        блоков и помечает блоки, которые нужно пересчитать: изменённые,
+        а если сдвиг не кратен размеру блока, то и все сдвинутые.
+
+        :param offset: Логическое смещение изменения.
+        :type offset: int
+        :param removed: Количество удалённых байтов.
+        :type removed: int
+        :param inserted: Количество вставленных байтов.
+        :type inserted: int
+        """
+        size = self.block_size
+        count = -(-self.buffer.get_size() // size)
+        first = min(offset // size, count)
+        tail = min(-(-(offset + removed) // size), len(self.stats))
+        kept = len(self.stats) - tail
+        middle = max(count - first - kept, min(1, count - first))
+        kept = count - first - middle
+        start = len(self.stats) - kept
+        self.stats = (self.stats[:first] + [None] * middle
+                      + self.stats[start:])
+        self.stale = (self.stale[:first] + [True] * middle
+                      + self.stale[start:])
+        if self.reading is not None:
+            for index in range(*self.reading):
+                if index < first:
+                    self.stale[index] = True
+                elif start <= index < start + kept:
+                    self.stale[index - start + first + middle] = True
+        if (inserted - removed) % size:
+            for index in range(first + middle, count):
+                self.stale[index] = True
+
+    def on_change(self, offset: int, removed: int, inserted: int) -> None:
+        """
+        Учитывает изменение буфера и запускает пересчёт.
+
+        :param offset: Логическое смещение изменения.
+        :type offset: int
+        :param removed: Количество удалённых байтов.
+        :type removed: int
+        :param inserted: Количество вставленных байтов.
+        :type inserted: int
+        """
+        with self.lock:
+            if removed != inserted:
+                self.shift(offset, removed, inserted)
+            elif inserted:
+                first = offset // self.block_size
+                last = (offset + inserted - 1) // self.block_size
+                for index in range(first, min(last + 1, len(self.stale))):
+                    self.stale[index] = True
+        self.start()
+
+    def file_stamp(self) -> bytes:
+        """
+        Заголовок индекса для текущей версии файла.
+
+        :return: Заголовок.
+        :rtype: bytes
+        """
+        info = os.stat(self.buffer.file_name)
+        return HEADER.pack(MAGIC, info.st_size, info.st_mtime_ns,
+                           self.block_size, len(self.stats))
+
+    def is_pristine(self) -> bool:
+        """
+        Совпадает ли содержимое буфера с файлом.
+
+        :return: True, если правок нет.
+        :rtype: bool
+        """
+        with self.buffer.pieces.lock:
+            return self.buffer.pieces.overwritten_ranges() == []
+
+    def load_index(self) -> bool:
+        """
+        Читает индекс, если он относится к этой версии файла и буфер не
+        изменён.
+
+        :return: True, если индекс прочитан.
+        :rtype: bool
+        """
+        if not self.is_pristine():
+            return False
+        try:
+            with open(self.index_path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return False
+        if (data[:HEADER.size] != self.file_stamp()
+                or len(data) != HEADER.size + ENTRY.size * len(self.stats)):
+            return False
+        self.stats = list(ENTRY.iter_unpack(data[HEADER.size:]))
+        self.stale = [False] * len(self.stats)
+        return True
+
+    def save_index(self) -> None:
+        """
+        Сохраняет индекс, если все блоки посчитаны и буфер не изменён.
+        """
+        pristine = self.is_pristine()
+        with self.lock:
+            if any(self.stale) or not pristine:
+                return
+            data = self.file_stamp() + b''.join(ENTRY.pack(*stats)
+                                                for stats in self.stats)
+        temp_name = self.index_path + '.tmp'
+        try:
+            with open(temp_name, 'wb') as file:
+                file.write(data)
+            os.replace(temp_name, self.index_path)
+        except OSError:
+            pass
+
+    def start(self) -> None:
+        """
+        Запускает пересчёт устаревших блоков в фоновом потоке.
+        """
+        with self.lock:
+            if self.running or not any(self.stale):
+                return
+            self.running = True
+        self.cancelled.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """
+        Пересчитывает устаревшие блоки порциями, пока они есть. Порция,
+        во время чтения которой буфер изменился, снова помечается.
+        """
+        per_read = self.read_size // self.block_size
+        while True:
+            with self.lock:
+                first = next((index for index, stale
+                              in enumerate(self.stale) if stale), None)
+                if first is None or self.cancelled.is_set():
+                    self.running = False
+                    break
+                stop = first
+                while (stop < len(self.stale) and stop - first < per_read
+                       and self.stale[stop]):
+                    self.stale[stop] = False
+                    stop += 1
+                self.reading = (first, stop)
+                version = self.buffer.pieces.version
+            data = self.buffer.pieces.read(first * self.block_size,
+                                           (stop - first) * self.block_size)
+            results = many_block_stats(data, self.block_size)
+            with self.lock:
+                self.reading = None
+                for index, stats in enumerate(results, first):
+                    if index >= len(self.stats):
+                        break
+                    if self.buffer.pieces.version != version:
+                        self.stale[index] = True
+                    else:
+                        self.stats[index] = stats
+            if self.on_progress is not None:
+                self.on_progress()
+        if first is None:
+            self.save_index()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """
+        Ожидает завершения фонового пересчёта.
+
+        :param timeout: Наибольшее время ожидания в секундах.
+        :type timeout: Optional[float]
+        """
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def close(self) -> None:
+        """
+        Останавливает пересчёт и отписывается от изменений буфера.
+        """
+        self.cancelled.set()
+        self.join()
+        if self.on_change in self.buffer.logger.listeners:
+            self.buffer.logger.listeners.remove(self.on_change)
+
+    def rows(self, count: int) -> List[Optional[Stats]]:
+        """
+        Сводит блоки в count строк обзора: значения блоков, попавших в
+        строку, усредняются.
+
+        :param count: Количество строк.
+        :type count: int
+        :return: Статистика строк (None - ещё не посчитано).
+        :rtype: List[Optional[Stats]]
+        """
+        with self.lock:
+            stats = list(self.stats)
+        if not stats or count <= 0:
+            return []
+        return [average(stats[row * len(stats) // count:
+                              max(row * len(stats) // count + 1,
+                                  (row + 1) * len(stats) // count)])
+                for row in range(count)]
+
+    def offset_at(self, row: int, count: int) -> int:
+        """
+        Логическое смещение начала строки обзора.
+
+        :param row: Номер строки.
+        :type row: int
+        :param count: Количество строк.
+        :type count: int
+        :return: Смещение.
+        :rtype: int
+        """
+        blocks = len(self.stats)
+        return min(row * blocks // max(count, 1),
+                   max(blocks - 1, 0)) * self.block_size
+
+
+def average(stats: Sequence[Optional[Stats]]) -> Optional[Stats]:
+    """
+    Усредняет статистику блоков, пропуская непосчитанные.
+
+    :param stats: Статистика блоков.
+    :type stats: Sequence[Optional[Stats]]
+    :return: Средние значения либо None.
+    :rtype: Optional[Stats]
+    """
+    known = [item for item in stats if item is not None]
+    if not known:
+        return None
+    return tuple(sum(column) / len(known) for column in zip(*known))
@@ -0,0 +1,209 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Tuple
+
+from model.model import Buffer
+from model.search import replace_all
+
+Edit = Tuple[str, ...]
+COMMANDS = {'write': (2, 1), 'insert': (2, 1), 'delete': (2, 2),
+            'fill': (3, 2), 'replace': (2, 0)}
+
+
+class BatchResult:
+    """
+    Итог обработки одного файла.
+
+    :ivar file_name: Имя исходного файла.
+    :ivar target: Имя сохранённого файла.
+    :ivar edits: Количество применённых правок.
+    :ivar bytes_written: Записано байтов при сохранении.
+    :ivar bytes_copied: Из них скопировано ядром.
+    :ivar open_time: Время открытия в секундах.
+    :ivar edit_time: Время применения правок в секундах.
+    :ivar save_time: Время сохранения в секундах.
+    :ivar error: Текст ошибки либо None.
+    """
+
+    def __init__(self, file_name: str) -> None:
+        self.file_name: str = file_name
+        self.target: str = file_name
+        self.edits: int = 0
+        self.bytes_written: int = 0
+        self.bytes_copied: int = 0
+        self.open_time: float = 0.0
+        self.edit_time: float = 0.0
+        self.save_time: float = 0.0
+        self.error: Optional[str] = None
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Общее время обработки.
+
+        :return: Время в секундах.
+        :rtype: float
+        """
+        return self.open_time + self.edit_time + self.save_time
+
+
+def parse_number(text: str) -> int:
+    """
+    Разбирает неотрицательное число в десятичной или шестнадцатеричной
+    (0x...) записи.
+
+    :param text: Запись числа.
+    :type text: str
+    :return: Число.
+    :rtype: int
+    :raises ValueError: Если запись некорректна или число отрицательно.
+    """
+    number = int(text, 0)
+    if number < 0:
+        raise ValueError(f'Отрицательное число: {text}')
+    return number
+
+
+def parse_script(lines: List[str]) -> List[Edit]:
+    """
+    Разбирает сценарий правок. Каждая строка - команда и её аргументы
+    через пробел, строки с # - комментарии:
+
+        write OFFSET DATA         заменить байты начиная со смещения
+        insert OFFSET DATA        вставить байты
+        delete OFFSET LENGTH      удалить диапазон
+        fill OFFSET LENGTH DATA   заполнить диапазон образцом
+        replace PATTERN DATA      заменить все вхождения образца
+
+    DATA и PATTERN - байты в шестнадцатеричном виде, а для write и
+    insert также @путь к файлу, содержимое которого читается потоком.
+
+    :param lines: Строки сценария.
+    :type lines: List[str]
+    :return: Правки.
+    :rtype: List[Edit]
+    :raises ValueError: Если строка некорректна.
+    """
+    edits: List[Edit] = []
+    for number, line in enumerate(lines, 1):
+        words = line.split('#', 1)[0].split()
+        if not words:
+            continue
+        command, args = words[0].lower(), words[1:]
+        count, numbers = COMMANDS.get(command, (-1, 0))
+        if count != len(args):
+            raise ValueError(f'Строка {number}: {line.strip()}')
+        for arg in args[:numbers]:
+            parse_number(arg)
+        for arg in args[numbers:]:
+            if not (command in ('write', 'insert') and arg.startswith('@')):
+                bytes.fromhex(arg)
+        edits.append((command, *args))
+    return edits
+
+
+def apply_edit(buffer: Buffer, edit: Edit) -> None:
+    """
+    Применяет одну правку к буферу одним действием.
+
+    :param buffer: Буфер.
+    :type buffer: Buffer
+    :param edit: Правка из parse_script.
+    :type edit: Edit
+    """
+    command, *args = edit
+    if command == 'replace':
+        pattern = bytes.fromhex(args[0])
+        if pattern:
+            replace_all(buffer, pattern, bytes.fromhex(args[1]))
+        return
+    offset = parse_number(args[0])
+    if command == 'delete':
+        buffer.delete_range(offset, parse_number(args[1]))
+    elif command == 'fill':
+        buffer.fill_range(offset, parse_number(args[1]),
+                          bytes.fromhex(args[2]))
+    else:
+        apply = buffer.overwrite_range if command == 'write' \
+            else buffer.insert_range
+        if args[1].startswith('@'):
+            with open(args[1][1:], 'rb') as file:
+                apply(offset, file)
+        else:
+            apply(offset, bytes.fromhex(args[1]))
+
+
+def process_file(file_name: str, edits: List[Edit],
+                 output_dir: Optional[str] = None) -> BatchResult:
+    """
+    Открывает файл, применяет правки и сохраняет результат на место
+    или в output_dir. Ошибка записывается в результат, а не
+    выбрасывается, чтобы не останавливать остальные файлы.
+
+    :param file_name: Имя файла.
+    :type file_name: str
+    :param edits: Правки.
+    :type edits: List[Edit]
+    :param output_dir: Каталог для результатов (по умолчанию файл
+    перезаписывается).
+    :type output_dir: Optional[str]
+    :return: Итог обработки.
+    :rtype: BatchResult
+    """
+    result = BatchResult(file_name)
+    if output_dir is not None:
+        result.target = os.path.join(output_dir, os.path.basename(file_name))
+    started = time.perf_counter()
+    try:
+        buffer = Buffer(file_name)
+    except OSError as error:
+        result.error = str(error)
+        return result
+    try:
+        result.open_time = time.perf_counter() - started
+        started = time.perf_counter()
+        for edit in edits:
+            apply_edit(buffer, edit)
+            result.edits += 1
+        result.edit_time = time.perf_counter() - started
+        started = time.perf_counter()
+        stats = buffer.save(result.target)
+        result.save_time = time.perf_counter() - started
+        result.bytes_written = stats.bytes_written
+        result.bytes_copied = stats.bytes_copied
+    except (OSError, ValueError) as error:
+        result.error = str(error)
+    finally:
+        buffer.close()
+    return result
+
+
+def run_batch(file_names: List[str], edits: List[Edit],
+              output_dir: Optional[str] = None,
+              jobs: Optional[int] = None) -> Iterator[BatchResult]:
+    """
+    Обрабатывает файлы в пуле процессов и отдаёт итоги по мере
+    готовности. При jobs == 1 файлы обрабатываются в текущем процессе.
+
+    :param file_names: Имена файлов.
+    :type file_names: List[str]
+    :param edits: Правки.
+    :type edits: List[Edit]
+    :param output_dir: Каталог для результатов.
+    :type output_dir: Optional[str]
+    :param jobs: Количество процессов (по умолчанию по числу ядер).
+    :type jobs: Optional[int]
+    :return: Итератор итогов.
+    :rtype: Iterator[BatchResult]
+    """
+    if jobs == 1 or len(file_names) <= 1:
+        for file_name in file_names:
+            yield process_file(file_name, edits, output_dir)
+        return
+    with ProcessPoolExecutor(jobs) as executor:
+        futures = [executor.submit(process_file, file_name, edits,
+                                   output_dir)
+                   for file_name in file_names]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,484 @@
+import bisect
+import hashlib
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from model.model import Buffer
+
+CRC_POLYNOMIAL = 0xedb88320
+Node = Tuple[bytes, int, int]
+
+
+def gf2_times(matrix: List[int], vector: int) -> int:
+    """
+    Умножает матрицу 32x32 над GF(2) на вектор.
+
+    :param matrix: Столбцы матрицы.
+    :type matrix: List[int]
+    :param vector: Вектор.
+    :type vector: int
+    :return: Произведение.
+    :rtype: int
+    """
+    result = 0
+    index = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[index]
+        vector >>= 1
+        index += 1
+    return result
+
+
+def gf2_compose(first: List[int], second: List[int]) -> List[int]:
+    """
+    Перемножает матрицы: сначала применяется second, затем first.
+
+    :param first: Столбцы первой матрицы.
+    :type first: List[int]
+    :param second: Столбцы второй матрицы.
+    :type second: List[int]
+    :return: Столбцы произведения.
+    :rtype: List[int]
+    """
+    return [gf2_times(first, column) for column in second]
+
+
+class CrcShift:
+    """
+    Операторы сдвига CRC32 на заданное количество нулевых байтов.
+    С ними CRC32 склейки двух частей считается по CRC частей и длине
+    второй части, как crc32_combine из zlib. Операторы кэшируются по
+    длине: в дереве хэшей длин немного.
+    """
+
+    def __init__(self) -> None:
+        bit = [CRC_POLYNOMIAL] + [1 << n for n in range(31)]
+        byte = bit
+        for _ in range(3):
+            byte = gf2_compose(byte, byte)
+        self.byte: List[int] = byte
+        self.cache: Dict[int, List[int]] = {}
+
+    def matrix(self, length: int) -> List[int]:
+        """
+        Возвращает оператор сдвига на length байтов.
+
+        :param length: Количество байтов.
+        :type length: int
+        :return: Столбцы матрицы.
+        :rtype: List[int]
+        """
+        result = self.cache.get(length)
+        if result is None:
+            result = [1 << n for n in range(32)]
+            power = self.byte
+            rest = length
+            while rest:
+                if rest & 1:
+                    result = gf2_compose(power, result)
+                rest >>= 1
+                if rest:
+                    power = gf2_compose(power, power)
+            self.cache[length] = result
+        return result
+
+    def combine(self, first: int, second: int, length: int) -> int:
+        """
+        Вычисляет CRC32 склейки двух частей.
+
+        :param first: CRC32 первой части.
+        :type first: int
+        :param second: CRC32 второй части.
+        :type second: int
+        :param length: Длина второй части.
+        :type length: int
+        :return: CRC32 склейки.
+        :rtype: int
+        """
+        if not length:
+            return first
+        return gf2_times(self.matrix(length), first) ^ second
+
+
+class HashTree:
+    """
+    Дерево хэшей над логическим содержимым буфера. Содержимое делится
+    на куски; лист хранит хэш куска, его CRC32 и длину, а узел - хэш
+    пары детей, CRC32 их склейки и общую длину. Узел без пары
+    переносится на уровень выше как есть.
+
+    Сначала куски имеют длину chunk_size, а дальше их границы
+    привязаны к содержимому: вставка удлиняет кусок, в который попала,
+    а удаление укорачивает затронутые куски, так что сдвиг не трогает
+    остальные. Кусок длиннее двух chunk_size делится, пустой
+    удаляется. После обновления пересчитываются изменённые листья и
+    пути от них к корню; если число листьев изменилось, уровни над
+    листьями строятся заново без повторного чтения данных. Листья
+    хэшируются в пуле потоков: hashlib и zlib отпускают GIL.
+
+    CRC32 любого диапазона собирается из CRC32 узлов, а читаются только
+    неполные крайние куски. Корневой хэш (листья - H(0x00 + данные),
+    узлы - H(0x01 + левый + правый)) зависит от содержимого и
+    разбиения на куски, которое задаёт lengths.
+
+    :param buffer: Буфер.
+    :type buffer: Buffer
+    :param chunk_size: Размер куска.
+    :type chunk_size: int
+    :param algorithm: Алгоритм hashlib.
+    :type algorithm: str
+    :param workers: Количество потоков (по умолчанию по числу ядер).
+    :type workers: Optional[int]
+    """
+
+    def __init__(self, buffer: Buffer, chunk_size: int = 1048576,
+                 algorithm: str = 'sha256',
+                 workers: Optional[int] = None) -> None:
+        self.buffer: Buffer = buffer
+        self.pieces = buffer.pieces
+        self.chunk_size: int = chunk_size
+        self.algorithm: str = algorithm
+        self.workers: int = workers or os.cpu_count() or 1
+        self.shift: CrcShift = CrcShift()
+        self.lock: threading.RLock = threading.RLock()
+        self.leaves: List[Optional[Node]] = []
+        self.lengths: List[int] = []
+        self.offsets: List[int] = [0]
+        self.stamps: List[int] = []
+        self.stamp: int = 0
+        self.levels: List[List[Node]] = []
+        self.dirty: List[int] = []
+        self.thread: Optional[threading.Thread] = None
+        size = self.pieces.size
+        self.lengths = [min(self.chunk_size, size - offset)
+                        for offset in range(0, size, self.chunk_size)]
+        self.leaves = [None] * len(self.lengths)
+        self.stamps = [0] * len(self.lengths)
+        self.update_offsets(0)
+        buffer.logger.listeners.append(self.on_change)
+
+    def update_offsets(self, first: int) -> None:
+        """
+        Пересчитывает смещения листьев начиная с first и меняет метки
+        этих листьев: хэш, который считается для них сейчас, мог
+        прочитать данные по старому смещению.
+
+        :param first: Номер первого листа.
+        :type first: int
+        """
+        del self.offsets[first + 1:]
+        for index in range(first, len(self.lengths)):
+            self.offsets.append(self.offsets[-1] + self.lengths[index])
+            self.stamp += 1
+            self.stamps[index] = self.stamp
+
+    def mark(self, first: int, stop: int) -> None:
+        """
+        Помечает листья [first, stop) как устаревшие.
+
+        :param first: Номер первого листа.
+        :type first: int
+        :param stop: Номер листа после последнего.
+        :type stop: int
+        """
+        for index in range(first, min(stop, len(self.leaves))):
+            self.stamp += 1
+            self.stamps[index] = self.stamp
+            self.leaves[index] = None
+            if self.levels:
+                self.dirty.append(index)
+
+    def leaf_at(self, offset: int) -> int:
+        """
+        Номер листа, содержащего смещение. Смещение конца содержимого
+        относится к последнему листу.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :return: Номер листа.
+        :rtype: int
+        """
+        index = bisect.bisect_right(self.offsets, offset) - 1
+        return max(0, min(index, len(self.lengths) - 1))
+
+    def resize(self, offset: int, removed: int, inserted: int) -> None:
+        """
+        Меняет длины листьев после вставки или удаления: удалённые байты
+        вычитаются из затронутых листьев, вставленные добавляются к
+        листу, в который попало смещение. Изменённые листья помечаются,
+        длинные делятся, пустые удаляются.
+
+        :param offset: Логическое смещение изменения.
+        :type offset: int
+        :param removed: Количество удалённых байтов.
+        :type removed: int
+        :param inserted: Количество вставленных байтов.
+        :type inserted: int
+        """
+        first = self.leaf_at(offset)
+        if not self.lengths:
+            self.lengths.append(0)
+            self.leaves.append(None)
+            self.stamps.append(0)
+            self.levels = []
+            self.dirty = []
+        stop = first
+        position = offset
+        while removed and stop < len(self.lengths):
+            count = min(removed, self.offsets[stop + 1] - position)
+            self.lengths[stop] -= count
+            removed -= count
+            position += count
+            stop += 1
+        self.lengths[first] += inserted
+        stop = max(stop, first + 1)
+        lengths: List[int] = []
+        for length in self.lengths[first:stop]:
+            parts = [self.chunk_size] * (length // self.chunk_size) \
+                if length > 2 * self.chunk_size else []
+            if length - sum(parts):
+                parts.append(length - sum(parts))
+            lengths.extend(parts)
+        if len(lengths) != stop - first:
+            self.levels = []
+            self.dirty = []
+        self.lengths[first:stop] = lengths
+        self.leaves[first:stop] = [None] * len(lengths)
+        self.stamps[first:stop] = [0] * len(lengths)
+        self.update_offsets(first)
+        self.mark(first, first + len(lengths))
+
+    def on_change(self, offset: int, removed: int, inserted: int) -> None:
+        """
+        Учитывает изменение буфера.
+
+        :param offset: Логическое смещение изменения.
+        :type offset: int
+        :param removed: Количество удалённых байтов.
+        :type removed: int
+        :param inserted: Количество вставленных байтов.
+        :type inserted: int
+        """
+        with self.lock:
+            if removed != inserted:
+                self.resize(offset, removed, inserted)
+            elif inserted:
+                self.mark(self.leaf_at(offset),
+                          self.leaf_at(offset + inserted - 1) + 1)
+
+    def hash_leaf(self, offset: int, length: int) -> Node:
+        """
+        Хэширует кусок. Участки отображённого файла не копируются.
+
+        :param offset: Логическое смещение куска.
+        :type offset: int
+        :param length: Длина куска.
+        :type length: int
+        :return: Лист (хэш, CRC32, длина).
+        :rtype: Node
+        """
+        with self.pieces.lock:
+            parts = [self.pieces.read_source(source, start, count)
+                     for source, start, count
+                     in self.pieces.iter_pieces(offset, length)]
+        digest = hashlib.new(self.algorithm, b'\x00')
+        crc = 0
+        length = 0
+        for part in parts:
+            digest.update(part)
+            crc = zlib.crc32(part, crc)
+            length += len(part)
+        return digest.digest(), crc, length
+
+    def join_nodes(self, left: Node, right: Node) -> Node:
+        """
+        Строит узел из двух детей.
+
+        :param left: Левый ребёнок.
+        :type left: Node
+        :param right: Правый ребёнок.
+        :type right: Node
+        :return: Узел.
+        :rtype: Node
+        """
+        digest = hashlib.new(self.algorithm, b'\x01' + left[0] + right[0])
+        return (digest.digest(),
+                self.shift.combine(left[1], right[1], right[2]),
+                left[2] + right[2])
+
+    def refresh(self) -> None:
+        """
+        Пересчитывает устаревшие листья в пуле потоков и пути от них к
+        корню. Лист, изменённый или сдвинутый во время пересчёта,
+        остаётся устаревшим. Если размер буфера ещё не совпадает с
+        суммой длин листьев, вставка или удаление ждёт уведомления, и
+        результаты этого прохода отбрасываются.
+        """
+        with self.lock:
+            pending = [(index, self.offsets[index], self.lengths[index],
+                        self.stamps[index])
+                       for index, leaf in enumerate(self.leaves)
+                       if leaf is None]
+        if pending:
+            with ThreadPoolExecutor(self.workers) as executor:
+                nodes = list(executor.map(
+                    lambda item: self.hash_leaf(item[1], item[2]),
+                    pending))
+        else:
+            nodes = []
+        with self.lock:
+            if self.pieces.size != self.offsets[-1]:
+                return
+            for (index, _, _, stamp), node in zip(pending, nodes):
+                if index < len(self.leaves) and self.stamps[index] == stamp:
+                    self.leaves[index] = node
+            if any(leaf is None for leaf in self.leaves):
+                return
+            if not self.levels:
+                self.build_levels()
+            else:
+                self.update_paths(sorted(set(self.dirty)))
+            self.dirty = []
+
+    def build_levels(self) -> None:
+        """
+        Строит все уровни дерева над листьями.
+        """
+        level: List[Node] = list(self.leaves)
+        self.levels = [level]
+        while len(level) > 1:
+            level = [self.join_nodes(level[index], level[index + 1])
+                     if index + 1 < len(level) else level[index]
+                     for index in range(0, len(level), 2)]
+            self.levels.append(level)
+
+    def update_paths(self, indexes: List[int]) -> None:
+        """
+        Обновляет листья и их предков.
+
+        :param indexes: Номера изменённых листьев.
+        :type indexes: List[int]
+        """
+        for index in indexes:
+            self.levels[0][index] = self.leaves[index]
+        for depth in range(1, len(self.levels)):
+            below = self.levels[depth - 1]
+            indexes = sorted({index // 2 for index in indexes})
+            for index in indexes:
+                left = 2 * index
+                self.levels[depth][index] = (
+                    self.join_nodes(below[left], below[left + 1])
+                    if left + 1 < len(below) else below[left])
+
+    def start(self) -> None:
+        """
+        Запускает пересчёт в фоновом потоке.
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self.refresh, daemon=True)
+        self.thread.start()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """
+        Ожидает завершения фонового пересчёта.
+
+        :param timeout: Наибольшее время ожидания в секундах.
+        :type timeout: Optional[float]
+        """
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def close(self) -> None:
+        """
+        Дожидается пересчёта и отписывается от изменений буфера.
+        """
+        self.join()
+        if self.on_change in self.buffer.logger.listeners:
+            self.buffer.logger.listeners.remove(self.on_change)
+
+    def root(self) -> Node:
+        """
+        Возвращает корень дерева, пересчитав устаревшие листья.
+
+        :return: Корень (хэш, CRC32, длина).
+        :rtype: Node
+        """
+        self.join()
+        while True:
+            self.refresh()
+            with self.lock:
+                if not self.leaves:
+                    return (hashlib.new(self.algorithm, b'\x00').digest(),
+                            0, 0)
+                if self.levels and not self.dirty:
+                    return self.levels[-1][0]
+
+    def digest(self) -> bytes:
+        """
+        Корневой хэш дерева.
+
+        :return: Хэш.
+        :rtype: bytes
+        """
+        return self.root()[0]
+
+    def crc32(self, offset: int = 0, length: Optional[int] = None) -> int:
+        """
+        CRC32 логического диапазона (по умолчанию всего содержимого),
+        совпадающий с zlib.crc32 от его байтов.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param length: Длина диапазона (по умолчанию до конца).
+        :type length: Optional[int]
+        :return: CRC32.
+        :rtype: int
+        """
+        self.root()
+        with self.lock:
+            end = self.pieces.size if length is None \
+                else min(offset + length, self.pieces.size)
+            if offset >= end:
+                return 0
+            first = bisect.bisect_left(self.offsets, offset)
+            last = bisect.bisect_right(self.offsets, end) - 1
+            if first >= last:
+                return zlib.crc32(self.pieces.read(offset, end - offset))
+            crc = zlib.crc32(self.pieces.read(
+                offset, self.offsets[first] - offset))
+            for node in self.query(first, last):
+                crc = self.shift.combine(crc, node[1], node[2])
+            tail = self.pieces.read(self.offsets[last],
+                                    end - self.offsets[last])
+            return self.shift.combine(crc, zlib.crc32(tail), len(tail))
+
+    def query(self, first: int, stop: int) -> List[Node]:
+        """
+        Находит узлы, покрывающие листья [first, stop), по порядку.
+
+        :param first: Номер первого листа.
+        :type first: int
+        :param stop: Номер листа после последнего.
+        :type stop: int
+        :return: Узлы.
+        :rtype: List[Node]
+        """
+        left: List[Node] = []
+        right: List[Node] = []
+        depth = 0
+        while first < stop:
+            if first & 1:
+                left.append(self.levels[depth][first])
+                first += 1
+            if stop & 1:
+                stop -= 1
+                right.append(self.levels[depth][stop])
+            first >>= 1
+            stop >>= 1
+            depth += 1
+        return left + right[::-1]
@@ -0,0 +1,238 @@
+import io
+import tempfile
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from model.model import Buffer
+
+RAW: str = 'raw'
+HEX: str = 'hex'
+HEX_LINE: int = 16
+HEX_SEPARATORS: bytes = b' \t\r\n'
+
+
+def encode_hex(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Переводит поток байтов в шестнадцатеричный текст: по HEX_LINE байтов
+    в строке через пробел. Порции, кроме последней, должны быть кратны
+    HEX_LINE, чтобы строки не разрывались.
+
+    :param chunks: Порции байтов.
+    :type chunks: Iterable[bytes]
+    :return: Порции текста в ASCII.
+    :rtype: Iterator[bytes]
+    """
+    for chunk in chunks:
+        yield b''.join(chunk[start:start + HEX_LINE].hex(' ').encode()
+                       + b'\n'
+                       for start in range(0, len(chunk), HEX_LINE))
+
+
+class HexReader(io.RawIOBase):
+    """
+    Поток, который читает шестнадцатеричный текст из другого потока и
+    отдаёт байты. Текст разбирается порциями, пробелы и переводы строк
+    пропускаются, цифра байта на границе порций переносится в следующую.
+
+    :param stream: Поток с текстом в ASCII.
+    :type stream: BinaryIO
+    :param chunk_size: Размер читаемой порции текста.
+    :type chunk_size: int
+    """
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = 4194304) -> None:
+        super().__init__()
+        self.stream: BinaryIO = stream
+        self.chunk_size: int = chunk_size
+        self.pending: bytes = b''
+        self.decoded: bytes = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        """
+        Заполняет буфер декодированными байтами.
+
+        :param target: Буфер для записи.
+        :type target: bytearray
+        :return: Количество байтов (0 в конце потока).
+        :rtype: int
+        :raises ValueError: Если в тексте есть не шестнадцатеричные
+        символы или нечётное количество цифр.
+        """
+        while not self.decoded:
+            text = self.stream.read(self.chunk_size)
+            if not text:
+                if self.pending:
+                    raise ValueError('Нечётное количество цифр')
+                return 0
+            digits = self.pending + text.translate(None, HEX_SEPARATORS)
+            even = len(digits) & ~1
+            self.pending = digits[even:]
+            self.decoded = bytes.fromhex(digits[:even].decode('ascii'))
+        count = min(len(target), len(self.decoded))
+        target[:count] = self.decoded[:count]
+        self.decoded = self.decoded[count:]
+        return count
+
+
+class Clipboard:
+    """
+    Копия диапазона буфера. Небольшие копии хранятся в памяти, а
+    копии больше spool_size - во временном файле, поэтому диапазон
+    любого размера копируется и вставляется порциями. Текстовое
+    представление строится только по запросу.
+
+    :param spool_size: Наибольший размер копии в памяти.
+    :type spool_size: int
+    :param chunk_size: Размер порции при копировании.
+    :type chunk_size: int
+    """
+
+    def __init__(self, spool_size: int = 1048576,
+                 chunk_size: int = 4194304) -> None:
+        self.spool_size: int = spool_size
+        self.chunk_size: int = chunk_size - chunk_size % HEX_LINE
+        self.file: Optional[BinaryIO] = None
+        self.size: int = 0
+
+    @property
+    def path(self) -> Optional[str]:
+        """
+        Путь временного файла с копией.
+
+        :return: Путь либо None, если копия хранится в памяти.
+        :rtype: Optional[str]
+        """
+        return getattr(self.file, 'name', None)
+
+    def storage(self, size: Optional[int]) -> BinaryIO:
+        """
+        Создаёт хранилище для новой копии вместо прежней.
+
+        :param size: Ожидаемый размер (None - неизвестен).
+        :type size: Optional[int]
+        :return: Пустое хранилище.
+        :rtype: BinaryIO
+        """
+        self.clear()
+        if size is not None and size <= self.spool_size:
+            self.file = io.BytesIO()
+        else:
+            self.file = tempfile.NamedTemporaryFile(suffix='.clipboard')
+        return self.file
+
+    def copy(self, buffer: 'Buffer', offset: int, length: int) -> int:
+        """
+        Копирует логический диапазон буфера порциями.
+
+        :param buffer: Буфер.
+        :type buffer: Buffer
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param length: Длина диапазона.
+        :type length: int
+        :return: Количество скопированных байтов.
+        :rtype: int
+        """
+        length = max(0, min(length, buffer.get_size() - offset))
+        file = self.storage(length)
+        for chunk in buffer.iter_range(offset, length, self.chunk_size):
+            file.write(chunk)
+        self.size = length
+        file.flush()
+        return length
+
+    def load(self, stream: BinaryIO, data_format: str = RAW) -> int:
+        """
+        Загружает копию из внешнего потока, например из данных другого
+        приложения.
+
+        :param stream: Поток, открытый на чтение.
+        :type stream: BinaryIO
+        :param data_format: RAW или HEX.
+        :type data_format: str
+        :return: Количество загруженных байтов.
+        :rtype: int
+        :raises ValueError: Если шестнадцатеричный текст некорректен.
+        """
+        if data_format == HEX:
+            stream = io.BufferedReader(HexReader(stream, self.chunk_size),
+                                       self.chunk_size)
+        file = self.storage(None)
+        self.size = 0
+        while True:
+            chunk = stream.read(self.chunk_size)
+            if not chunk:
+                break
+            file.write(chunk)
+            self.size += len(chunk)
+        file.flush()
+        return self.size
+
+    def iter_chunks(self, data_format: str = RAW) -> Iterator[bytes]:
+        """
+        Перебирает копию порциями.
+
+        :param data_format: RAW или HEX.
+        :type data_format: str
+        :return: Итератор порций.
+        :rtype: Iterator[bytes]
+        """
+        if self.file is None:
+            return iter(())
+
+        def read() -> Iterator[bytes]:
+            for start in range(0, self.size, self.chunk_size):
+                self.file.seek(start)
+                yield self.file.read(self.chunk_size)
+        if data_format == HEX:
+            return encode_hex(read())
+        return read()
+
+    def write_to(self, target: BinaryIO, data_format: str = RAW) -> None:
+        """
+        Записывает копию в поток.
+
+        :param target: Поток, открытый на запись.
+        :type target: BinaryIO
+        :param data_format: RAW или HEX.
+        :type data_format: str
+        """
+        for chunk in self.iter_chunks(data_format):
+            target.write(chunk)
+
+    def paste(self, buffer: 'Buffer', offset: int,
+              overwrite: bool = False) -> int:
+        """
+        Вставляет копию в буфер одним действием. Копия из временного
+        файла передаётся буферу потоком, без чтения в память.
+
+        :param buffer: Буфер.
+        :type buffer: Buffer
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param overwrite: Заменить байты вместо вставки.
+        :type overwrite: bool
+        :return: Количество вставленных байтов.
+        :rtype: int
+        """
+        if self.file is None or not self.size:
+            return 0
+        self.file.seek(0)
+        data = self.file
+        if isinstance(data, io.BytesIO):
+            data = data.getbuffer()[:self.size].tobytes()
+        if overwrite:
+            return buffer.overwrite_range(offset, data, self.size)
+        return buffer.insert_range(offset, data, self.size)
+
+    def clear(self) -> None:
+        """
+        Удаляет копию и её временный файл.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.size = 0
@@ -0,0 +1,174 @@
+import bisect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from model.model import Buffer
+
+
+class DiffIndex:
+    """
+    Отсортированный список диапазонов [начало, конец), в которых два
+    буфера различаются. Соседние и перекрывающиеся диапазоны,
+    добавленные по порядку, объединяются.
+    """
+
+    def __init__(self) -> None:
+        self.ranges: List[Tuple[int, int]] = []
+        self.starts: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+    @property
+    def total(self) -> int:
+        """
+        Количество различающихся байтов.
+
+        :return: Количество байтов.
+        :rtype: int
+        """
+        return sum(end - start for start, end in self.ranges)
+
+    def add(self, start: int, end: int) -> None:
+        """
+        Добавляет диапазон. Диапазоны добавляются по возрастанию начала.
+
+        :param start: Начало диапазона.
+        :type start: int
+        :param end: Конец диапазона (не включается).
+        :type end: int
+        """
+        if start >= end:
+            return
+        if self.ranges and self.ranges[-1][1] >= start:
+            last_start, last_end = self.ranges[-1]
+            self.ranges[-1] = (last_start, max(last_end, end))
+            return
+        self.ranges.append((start, end))
+        self.starts.append(start)
+
+    def find(self, offset: int) -> Optional[Tuple[int, int]]:
+        """
+        Возвращает диапазон, содержащий смещение.
+
+        :param offset: Смещение.
+        :type offset: int
+        :return: Диапазон либо None.
+        :rtype: Optional[Tuple[int, int]]
+        """
+        index = bisect.bisect_right(self.starts, offset) - 1
+        if index >= 0 and offset < self.ranges[index][1]:
+            return self.ranges[index]
+        return None
+
+    def next_after(self, offset: int) -> Optional[Tuple[int, int]]:
+        """
+        Возвращает первый диапазон, начинающийся после смещения.
+
+        :param offset: Смещение.
+        :type offset: int
+        :return: Диапазон либо None.
+        :rtype: Optional[Tuple[int, int]]
+        """
+        index = bisect.bisect_right(self.starts, offset)
+        return self.ranges[index] if index < len(self.ranges) else None
+
+    def previous_before(self, offset: int) -> Optional[Tuple[int, int]]:
+        """
+        Возвращает последний диапазон, начинающийся до смещения.
+
+        :param offset: Смещение.
+        :type offset: int
+        :return: Диапазон либо None.
+        :rtype: Optional[Tuple[int, int]]
+        """
+        index = bisect.bisect_left(self.starts, offset) - 1
+        return self.ranges[index] if index >= 0 else None
+
+
+def diff_block(first: bytes, second: bytes, base: int,
+               grain: int = 64) -> List[Tuple[int, int]]:
+    """
+    Находит различающиеся диапазоны двух блоков одинаковой длины.
+    Блок делится пополам, пока половины различаются, и лишь участки не
+    длиннее grain сравниваются побайтно.
+
+    :param first: Первый блок.
+    :type first: bytes
+    :param second: Второй блок.
+    :type second: bytes
+    :param base: Смещение блоков.
+    :type base: int
+    :param grain: Длина участка для побайтного сравнения.
+    :type grain: int
+    :return: Диапазоны [начало, конец) по возрастанию.
+    :rtype: List[Tuple[int, int]]
+    """
+    ranges: List[Tuple[int, int]] = []
+    stack = [(0, len(first))]
+    while stack:
+        start, end = stack.pop()
+        if first[start:end] == second[start:end]:
+            continue
+        if end - start > grain:
+            middle = (start + end) // 2
+            stack.append((middle, end))
+            stack.append((start, middle))
+            continue
+        for index in range(start, end):
+            if first[index] == second[index]:
+                continue
+            if ranges and ranges[-1][1] == base + index:
+                ranges[-1] = (ranges[-1][0], base + index + 1)
+            else:
+                ranges.append((base + index, base + index + 1))
+    return ranges
+
+
+def compare_buffers(first: Buffer, second: Buffer,
+                    block_size: int = 1048576,
+                    workers: Optional[int] = None,
+                    cancelled: Optional[threading.Event] = None
+                    ) -> DiffIndex:
+    """
+    Сравнивает логическое содержимое двух буферов. Блоки по block_size
+    байтов читаются в пуле потоков и сравниваются целиком (memcmp
+    дешевле хэширования), совпавшие блоки пропускаются, а
+    различающиеся сравниваются побайтно. Хвост более длинного буфера
+    считается одним различием.
+
+    :param first: Первый буфер.
+    :type first: Buffer
+    :param second: Второй буфер.
+    :type second: Buffer
+    :param block_size: Размер блока.
+    :type block_size: int
+    :param workers: Количество потоков (по умолчанию по числу ядер).
+    :type workers: Optional[int]
+    :param cancelled: Событие отмены сравнения.
+    :type cancelled: Optional[threading.Event]
+    :return: Индекс различий (неполный, если сравнение отменено).
+    :rtype: DiffIndex
+    """
+    index = DiffIndex()
+    first_size, second_size = first.get_size(), second.get_size()
+    common = min(first_size, second_size)
+
+    def compare(start: int) -> List[Tuple[int, int]]:
+        if cancelled is not None and cancelled.is_set():
+            return []
+        length = min(block_size, common - start)
+        first_block = first.pieces.read(start, length)
+        second_block = second.pieces.read(start, length)
+        if first_block == second_block:
+            return []
+        return diff_block(first_block, second_block, start)
+
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as executor:
+        for ranges in executor.map(compare, range(0, common, block_size)):
+            for start, end in ranges:
+                index.add(start, end)
+    index.add(common, max(first_size, second_size))
+    return index
@@ -0,0 +1,113 @@
+import struct
+import tempfile
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from model.piece_table import Piece, build_tree, iter_nodes
+
+RECORD_HEADER = struct.Struct('<QQQI')
+PIECE_ENTRY = struct.Struct('<BQQ')
+
+
+class HistoryFile:
+    """
+    Файл истории, в который вытесняются старые записи журнала
+    изменений. Записи пишутся блоками в конец файла, а читаются
+    обратно последним записанным блоком соответствующего стека.
+
+    Запись хранится как заголовок (смещение, удалено байтов, вставлено
+    байтов, количество кусков) и список кусков (источник, начало,
+    длина). Сами данные кусков остаются в исходном файле и буфере
+    добавлений, поэтому запись занимает десятки байтов.
+
+    :param directory: Каталог для файла истории (по умолчанию
+    системный каталог временных файлов).
+    :type directory: Optional[str]
+    """
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory: Optional[str] = directory
+        self.file: Optional[BinaryIO] = None
+        self.size: int = 0
+        self.blocks: Dict[int, int] = {}
+
+    def write_block(self, records: List[Tuple[int, int, int,
+                                              Optional[Piece]]]
+                    ) -> int:
+        """
+        Дописывает блок записей в конец файла.
+
+        :param records: Записи: смещение, удалено байтов, вставлено
+        байтов и поддерево кусков.
+        :type records: List[Tuple[int, int, int, Optional[Piece]]]
+        :return: Смещение блока.
+        :rtype: int
+        """
+        if self.file is None:
+            self.file = tempfile.TemporaryFile(dir=self.directory,
+                                               suffix='.history')
+        data = bytearray()
+        for index, removed_size, inserted_size, node in records:
+            pieces = list(iter_nodes(node))
+            data += RECORD_HEADER.pack(index, removed_size, inserted_size,
+                                       len(pieces))
+            for piece in pieces:
+                data += PIECE_ENTRY.pack(piece.source, piece.start,
+                                         piece.length)
+        offset = self.size
+        self.file.seek(offset)
+        self.file.write(data)
+        self.size += len(data)
+        self.blocks[offset] = len(data)
+        return offset
+
+    def read_block(self, offset: int
+                   ) -> List[Tuple[int, int, int, Optional[Piece]]]:
+        """
+        Читает блок записей и освобождает его.
+
+        :param offset: Смещение блока.
+        :type offset: int
+        :return: Записи в том же порядке, в котором были записаны.
+        :rtype: List[Tuple[int, int, int, Optional[Piece]]]
+        """
+        self.file.seek(offset)
+        data = self.file.read(self.blocks[offset])
+        self.drop_block(offset)
+        records = []
+        position = 0
+        while position < len(data):
+            index, removed_size, inserted_size, count = (
+                RECORD_HEADER.unpack_from(data, position))
+            position += RECORD_HEADER.size
+            nodes = []
+            for _ in range(count):
+                nodes.append(Piece(*PIECE_ENTRY.unpack_from(data, position)))
+                position += PIECE_ENTRY.size
+            records.append((index, removed_size, inserted_size,
+                            build_tree(nodes)))
+        return records
+
+    def drop_block(self, offset: int) -> None:
+        """
+        Освобождает блок. Файл укорачивается до конца последнего
+        занятого блока.
+
+        :param offset: Смещение блока.
+        :type offset: int
+        """
+        self.blocks.pop(offset, None)
+        size = max((start + self.blocks[start] for start in self.blocks),
+                   default=0)
+        if self.file is not None and size < self.size:
+            self.size = size
+            self.file.truncate(size)
+
+    def clear(self) -> None:
+        """
+        Удаляет файл истории.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.size = 0
+        self.blocks.clear()
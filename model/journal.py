@@ -0,0 +1,558 @@
+import os
+import shutil
+import struct
+import threading
+import time
+from typing import BinaryIO, Optional, Tuple
+
+from model.piece_table import Piece, PieceTable, build_tree, iter_nodes
+
+MAGIC = b'HXJ2'
+HEADER = struct.Struct('<4sQQ')
+DATA = struct.Struct('<cQ')
+CUT = struct.Struct('<cQQ')
+PASTE = struct.Struct('<cQI')
+SNAPSHOT = struct.Struct('<cI')
+PIECE_ENTRY = struct.Struct('<BQQ')
+Checkpoint = Tuple[Optional[Piece], int, int, BinaryIO, Optional[int],
+                   int, int]
+
+
+def file_stamp(file_name: str) -> bytes:
+    """
+    Строит заголовок журнала по размеру и времени изменения файла.
+
+    :param file_name: Имя исходного файла.
+    :type file_name: str
+    :return: Заголовок журнала.
+    :rtype: bytes
+    """
+    info = os.stat(file_name)
+    return HEADER.pack(MAGIC, info.st_size, info.st_mtime_ns)
+
+
+def pack_pieces(node: Optional[Piece]) -> bytes:
+    """
+    Упаковывает куски поддерева в логическом порядке.
+
+    :param node: Корень поддерева.
+    :type node: Optional[Piece]
+    :return: Упакованные куски.
+    :rtype: bytes
+    """
+    return b''.join(PIECE_ENTRY.pack(piece.source, piece.start, piece.length)
+                    for piece in iter_nodes(node))
+
+
+def unpack_pieces(data: bytes, offset: int,
+                  count: int) -> Optional[Piece]:
+    """
+    Строит дерево из упакованных кусков.
+
+    :param data: Данные журнала.
+    :type data: bytes
+    :param offset: Смещение первого куска.
+    :type offset: int
+    :param count: Количество кусков.
+    :type count: int
+    :return: Корень дерева.
+    :rtype: Optional[Piece]
+    """
+    end = offset + count * PIECE_ENTRY.size
+    return build_tree([Piece(*entry) for entry
+                       in PIECE_ENTRY.iter_unpack(data[offset:end])])
+
+
+class Journal:
+    """
+    Журнал правок, который только дописывается. Таблица кусков
+    сообщает ему о каждой операции: дописывании в буфер добавлений или
+    в файл подкачки, вырезании и вставке кусков. Данные буфера
+    добавлений и файла подкачки лежат рядом с журналом в файлах с
+    суффиксами .add и .data, которые тоже только дописываются, а
+    журнал хранит только их длины. Каждая запись сразу передаётся
+    системе, а fsync выполняется пачками - не чаще раза в
+    sync_interval секунд или после sync_size байтов.
+
+    Когда после последнего снимка набирается snapshot_interval
+    операций или snapshot_size байтов записей, фоновый поток пишет
+    новый журнал: заголовок, длины файлов данных и снимок кусков. Записи,
+    дописанные за это время, переносятся в его хвост, и новый журнал
+    атомарно заменяет старый. Поэтому восстановление - это чтение
+    снимка и хвоста ограниченной длины, а правка не ждёт записи снимка.
+
+    Заголовок хранит размер и время изменения исходного файла: журнал
+    от другой версии файла не применяется. Если запись журнала не
+    удаётся (каталог только для чтения, диск заполнен), журнал
+    отключается и удаляется, а правки продолжаются без него.
+
+    :param path: Путь к файлу журнала.
+    :type path: str
+    :param sync_interval: Наибольший промежуток между fsync в секундах.
+    :type sync_interval: float
+    :param sync_size: Наибольший объём записей между fsync в байтах.
+    :type sync_size: int
+    :param snapshot_interval: Количество операций между снимками.
+    :type snapshot_interval: int
+    :param snapshot_size: Объём записей между снимками в байтах.
+    :type snapshot_size: int
+    """
+
+    def __init__(self, path: str, sync_interval: float = 1.0,
+                 sync_size: int = 1048576,
+                 snapshot_interval: int = 4096,
+                 snapshot_size: int = 1048576) -> None:
+        self.path: str = path
+        self.scratch_path: str = path + '.data'
+        self.add_path: str = path + '.add'
+        self.sync_interval: float = sync_interval
+        self.sync_size: int = sync_size
+        self.snapshot_interval: int = snapshot_interval
+        self.snapshot_size: int = snapshot_size
+        self.file: Optional[BinaryIO] = None
+        self.add_file: Optional[BinaryIO] = None
+        self.pieces: Optional[PieceTable] = None
+        self.file_name: str = ''
+        self.unsynced: int = 0
+        self.synced_at: float = time.monotonic()
+        self.operations: int = 0
+        self.tail_size: int = 0
+        self.lock: threading.Lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def path_for(file_name: str) -> str:
+        """
+        Возвращает путь журнала для исходного файла.
+
+        :param file_name: Имя исходного файла.
+        :type file_name: str
+        :return: Путь журнала.
+        :rtype: str
+        """
+        return file_name + '.journal'
+
+    def replay(self, pieces: PieceTable, file_name: str) -> int:
+        """
+        Применяет журнал к таблице кусков, если он относится к этой
+        версии файла. Устаревший журнал удаляется. Оборванная последняя
+        запись пропускается.
+
+        :param pieces: Таблица кусков только что открытого файла.
+        :type pieces: PieceTable
+        :param file_name: Имя исходного файла.
+        :type file_name: str
+        :return: Количество применённых операций.
+        :rtype: int
+        """
+        try:
+            with open(self.path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return 0
+        if data[:HEADER.size] != file_stamp(file_name):
+            self.remove()
+            return 0
+        pieces.scratch_path = self.scratch_path
+        try:
+            with open(self.add_path, 'rb') as file:
+                add_data = file.read()
+        except FileNotFoundError:
+            add_data = b''
+        position = HEADER.size
+        applied = 0
+        while position < len(data):
+            tag = data[position:position + 1]
+            if tag == b'A' and position + DATA.size <= len(data):
+                _, length = DATA.unpack_from(data, position)
+                start = len(pieces.add_buffer)
+                if start + length > len(add_data):
+                    break
+                pieces.add_buffer.extend(add_data[start:start + length])
+                position += DATA.size
+            elif tag == b'B' and position + DATA.size <= len(data):
+                _, length = DATA.unpack_from(data, position)
+                pieces.scratch_size += length
+                position += DATA.size
+            elif tag == b'C' and position + CUT.size <= len(data):
+                _, offset, length = CUT.unpack_from(data, position)
+                pieces.cut(offset, length)
+                position += CUT.size
+            elif tag == b'P' and position + PASTE.size <= len(data):
+                _, offset, count = PASTE.unpack_from(data, position)
+                start = position + PASTE.size
+                if start + count * PIECE_ENTRY.size > len(data):
+                    break
+                pieces.paste(offset, unpack_pieces(data, start, count))
+                position = start + count * PIECE_ENTRY.size
+            elif tag == b'S' and position + SNAPSHOT.size <= len(data):
+                _, count = SNAPSHOT.unpack_from(data, position)
+                start = position + SNAPSHOT.size
+                if start + count * PIECE_ENTRY.size > len(data):
+                    break
+                pieces.root = unpack_pieces(data, start, count)
+                pieces.version += 1
+                position = start + count * PIECE_ENTRY.size
+            else:
+                break
+            applied += 1
+        return applied
+
+    def start(self, pieces: PieceTable, file_name: str,
+              snapshot: bool = False) -> None:
+        """
+        Подключает журнал к таблице кусков. Снимок текущего состояния
+        записывается перед первой операцией либо сразу в фоновом потоке
+        (например, чтобы сжать восстановленный журнал).
+
+        :param pieces: Таблица кусков.
+        :type pieces: PieceTable
+        :param file_name: Имя исходного файла.
+        :type file_name: str
+        :param snapshot: Сразу записать снимок.
+        :type snapshot: bool
+        """
+        self.pieces = pieces
+        self.file_name = file_name
+        if pieces.scratch is None:
+            pieces.scratch_path = self.scratch_path
+        pieces.journal = self
+        if snapshot:
+            try:
+                self.start_checkpoint()
+            except OSError:
+                self.fail()
+
+    def open_add(self) -> BinaryIO:
+        """
+        Открывает файл буфера добавлений на дописывание. Хвост,
+        записанный без записи в журнале, отрезается, а недостающая часть
+        буфера (например, после сохранения) дописывается.
+
+        :return: Файл буфера добавлений.
+        :rtype: BinaryIO
+        """
+        if self.add_file is None:
+            add_buffer = self.pieces.add_buffer
+            file = open(self.add_path, 'ab', buffering=0)
+            size = os.fstat(file.fileno()).st_size
+            if size > len(add_buffer):
+                file.truncate(len(add_buffer))
+                size = len(add_buffer)
+            file.write(memoryview(add_buffer)[size:])
+            self.add_file = file
+        return self.add_file
+
+    def capture(self) -> Checkpoint:
+        """
+        Берёт снимок для записи нового журнала: корень дерева кусков,
+        длины файлов данных и позицию конца старого журнала. Под
+        блокировкой таблицы выполняется только эта работа за O(1), а
+        дерево снимка не изменяется до write_checkpoint.
+
+        :return: Снимок.
+        :rtype: Checkpoint
+        """
+        with self.pieces.lock:
+            root = self.pieces.snapshot()
+            try:
+                with self.lock:
+                    add_file = self.open_add()
+                    mark = None
+                    if self.file is not None:
+                        self.file.flush()
+                        mark = self.file.tell()
+                    return (root, len(self.pieces.add_buffer),
+                            self.pieces.scratch_size, add_file, mark,
+                            self.operations, self.tail_size)
+            except BaseException:
+                self.pieces.release_snapshot()
+                raise
+
+    def checkpoint(self) -> None:
+        """
+        Записывает новый журнал по только что взятому снимку.
+        """
+        self.write_checkpoint(self.capture())
+
+    def write_checkpoint(self, checkpoint: Checkpoint) -> None:
+        """
+        Записывает новый журнал из заголовка, длин файлов данных и
+        снимка кусков, не занимая блокировку таблицы. Записи,
+        дописанные в старый журнал после снимка, переносятся в хвост
+        нового, после чего он атомарно заменяет старый. Под self.lock
+        переносятся только записи, появившиеся во время fsync нового
+        журнала. Если журнал за это время отключён ошибкой записи,
+        новый журнал удаляется.
+
+        :param checkpoint: Снимок из capture.
+        :type checkpoint: Checkpoint
+        """
+        (root, add_size, scratch_size, add_file, mark, operations,
+         tail_size) = checkpoint
+        try:
+            nodes = pack_pieces(root)
+        finally:
+            self.pieces.release_snapshot()
+        self.sync_scratch()
+        os.fsync(add_file.fileno())
+        temp_name = self.path + '.tmp'
+        with open(temp_name, 'wb') as file:
+            file.write(file_stamp(self.file_name))
+            file.write(DATA.pack(b'A', add_size))
+            file.write(DATA.pack(b'B', scratch_size))
+            file.write(SNAPSHOT.pack(b'S', len(nodes) // PIECE_ENTRY.size))
+            file.write(nodes)
+            if mark is not None:
+                with open(self.path, 'rb') as old:
+                    old.seek(mark)
+                    shutil.copyfileobj(old, file)
+                    mark = old.tell()
+            file.flush()
+            os.fsync(file.fileno())
+            with self.lock:
+                if self.pieces.journal is not self:
+                    file.close()
+                    os.remove(temp_name)
+                    return
+                unsynced = 0
+                if mark is not None:
+                    self.file.flush()
+                    with open(self.path, 'rb') as old:
+                        old.seek(mark)
+                        unsynced = file.write(old.read())
+                    self.file.close()
+                file.flush()
+                os.replace(temp_name, self.path)
+                self.file = open(self.path, 'ab')
+                self.operations -= operations
+                self.tail_size -= tail_size
+                self.unsynced = unsynced
+
+    def start_checkpoint(self) -> None:
+        """
+        Берёт снимок и запускает запись нового журнала в фоновом
+        потоке, если она ещё не идёт. Вызывается без self.lock.
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+        checkpoint = self.capture()
+        self.thread = threading.Thread(target=self.run_checkpoint,
+                                       args=(checkpoint,), daemon=True)
+        self.thread.start()
+
+    def run_checkpoint(self, checkpoint: Checkpoint) -> None:
+        """
+        Записывает новый журнал в фоновом потоке. Ошибка записи
+        отключает журнал.
+
+        :param checkpoint: Снимок из capture.
+        :type checkpoint: Checkpoint
+        """
+        try:
+            self.write_checkpoint(checkpoint)
+        except OSError:
+            self.fail()
+
+    def fail(self) -> None:
+        """
+        Отключает журнал после ошибки записи и удаляет его файлы, чтобы
+        при следующем открытии не восстановилась только часть правок.
+        Файл подкачки остаётся, если таблица уже хранит в нём данные.
+        Блокировка таблицы не берётся: fail вызывается и из фонового
+        потока, которого может дожидаться поток правки.
+        """
+        with self.lock:
+            for file in (self.file, self.add_file):
+                if file is not None:
+                    try:
+                        file.close()
+                    except OSError:
+                        pass
+            self.file = None
+            self.add_file = None
+        self.pieces.journal = None
+        paths = [self.path, self.add_path]
+        if self.pieces.scratch is None:
+            self.pieces.scratch_path = None
+            paths.append(self.scratch_path)
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def join(self) -> None:
+        """
+        Ожидает завершения записи снимка.
+        """
+        if self.thread is not None:
+            self.thread.join()
+
+    def open_journal(self) -> None:
+        """
+        Записывает первый снимок, если журнал ещё не открыт. Идущая
+        запись снимка сначала дожидается.
+        """
+        if self.file is None:
+            self.join()
+        if self.file is None:
+            self.checkpoint()
+
+    def write(self, record: bytes) -> None:
+        """
+        Дописывает запись и при необходимости выполняет fsync. Первый
+        снимок пишется сразу, до первой операции. Когда набирается
+        достаточно операций, перед записью берётся снимок и
+        запускается запись нового журнала: запись делается до изменения
+        таблицы, поэтому снимок ещё не содержит эту операцию, и она
+        попадает в хвост.
+
+        :param record: Запись.
+        :type record: bytes
+        """
+        if self.pieces.journal is not self:
+            return
+        try:
+            self.open_journal()
+            with self.lock:
+                full = (self.operations >= self.snapshot_interval
+                        or self.tail_size >= self.snapshot_size)
+            if full:
+                self.start_checkpoint()
+            with self.lock:
+                if self.file is None:
+                    return
+                self.file.write(record)
+                self.file.flush()
+                self.operations += 1
+                self.tail_size += len(record)
+                self.unsynced += len(record)
+                if (self.unsynced >= self.sync_size or time.monotonic()
+                        - self.synced_at >= self.sync_interval):
+                    self.sync()
+        except OSError:
+            self.fail()
+
+    def sync(self) -> None:
+        """
+        Сбрасывает на диск файлы данных, затем записи журнала.
+        Вызывается под self.lock.
+        """
+        if self.file is None:
+            return
+        self.sync_scratch()
+        if self.add_file is not None:
+            os.fsync(self.add_file.fileno())
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    def sync_scratch(self) -> None:
+        """
+        Сбрасывает на диск файл подкачки, если он ведётся рядом с
+        журналом.
+        """
+        scratch = self.pieces.scratch if self.pieces is not None else None
+        if (scratch is not None
+                and self.pieces.scratch_path == self.scratch_path):
+            scratch.flush()
+            os.fsync(scratch.fileno())
+
+    def append_data(self, data: bytes) -> None:
+        """
+        Дописывает байты в файл буфера добавлений и записывает их длину.
+        Вызывается до изменения буфера.
+
+        :param data: Байты.
+        :type data: bytes
+        """
+        try:
+            self.open_journal()
+            with self.lock:
+                self.open_add().write(data)
+        except OSError:
+            self.fail()
+            return
+        self.write(DATA.pack(b'A', len(data)))
+
+    def append_scratch(self, length: int) -> None:
+        """
+        Записывает дописывание в файл подкачки. Вызывается после записи
+        данных, но до изменения размера файла подкачки в таблице.
+
+        :param length: Количество дописанных байтов.
+        :type length: int
+        """
+        self.write(DATA.pack(b'B', length))
+
+    def cut(self, offset: int, length: int) -> None:
+        """
+        Записывает вырезание диапазона. Вызывается до изменения таблицы.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param length: Длина диапазона.
+        :type length: int
+        """
+        self.write(CUT.pack(b'C', offset, length))
+
+    def paste(self, offset: int, node: Optional[Piece]) -> None:
+        """
+        Записывает вставку поддерева кусков. Вызывается до изменения
+        таблицы.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param node: Поддерево кусков.
+        :type node: Optional[Piece]
+        """
+        nodes = pack_pieces(node)
+        self.write(PASTE.pack(b'P', offset, len(nodes) // PIECE_ENTRY.size)
+                   + nodes)
+
+    def close(self) -> None:
+        """
+        Дожидается записи снимка, сбрасывает журнал на диск и отключает
+        его от таблицы. Файлы журнала остаются, чтобы правки
+        восстановились при следующем открытии.
+        """
+        self.join()
+        with self.lock:
+            if self.file is not None:
+                self.sync()
+                self.file.close()
+                self.file = None
+            if self.add_file is not None:
+                self.add_file.close()
+                self.add_file = None
+        if self.pieces is not None:
+            self.pieces.journal = None
+
+    def discard(self, keep_scratch: bool = False) -> None:
+        """
+        Закрывает и удаляет журнал: правки сохранены в файл.
+
+        :param keep_scratch: Оставить файлы данных, чтобы журнал,
+        начатый заново, продолжил ссылаться на них.
+        :type keep_scratch: bool
+        """
+        self.close()
+        self.remove(keep_scratch)
+
+    def remove(self, keep_scratch: bool = False) -> None:
+        """
+        Удаляет файлы журнала и данных.
+
+        :param keep_scratch: Оставить файлы данных.
+        :type keep_scratch: bool
+        """
+        paths = [self.path]
+        if not keep_scratch:
+            paths += [self.scratch_path, self.add_path]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
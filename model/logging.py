@@ -1,93 +1,295 @@
-import copy
-from typing import Dict, List, Union
+from typing import Callable, List, Optional
+
+from model.history import HistoryFile
+from model.piece_table import (Piece, PieceTable, concat_pieces, iter_nodes,
+                               piece_size)
+
+RECORD_COST: int = 128
+PIECE_COST: int = 136
+
+
+def record_cost(node: Optional[Piece]) -> int:
+    """
+    Оценивает, сколько памяти занимает запись журнала с поддеревом
+    кусков.
+
+    :param node: Поддерево, которое хранит запись.
+    :type node: Optional[Piece]
+    :return: Оценка в байтах.
+    :rtype: int
+    """
+    return RECORD_COST + PIECE_COST * sum(1 for _ in iter_nodes(node))
 
 
 class LogRecord:
     """
-    Запись журнала изменений.
+    Запись журнала изменений. Хранит не копии данных, а поддеревья
+    кусков, вырезанные из таблицы и вставленные в неё.
 
-    :param index: Индекс, к которому
+    :param index: Логическое смещение, к которому
     относится изменение.
     :type index: int
-    :param old_extend: Старое значение для
-    расширения данных.
-    :type old_extend: bytearray
-    :param new_byte: Новый байт.
-    :type new_byte: bytes
-    :param shift: Сдвиг.
-    :type shift: int
-    :param is_insert: Флаг, указывающий на вставку
-    (True) или удаление (False).
-    :type is_insert: bool
+    :param removed: Вырезанные куски.
+    :type removed: Optional[Piece]
+    :param inserted_size: Количество вставленных байтов.
+    :type inserted_size: int
     """
 
+    __slots__ = ('index', 'removed', 'inserted',
+                 'removed_size', 'inserted_size', 'cost')
+
     def __init__(self, index: int,
-                 old_extend: Union[bytearray, None],
-                 new_byte: bytes,
-                 shift: int,
-                 is_insert: bool) -> None:
+                 removed: Optional[Piece],
+                 inserted_size: int) -> None:
         self.index: int = index
-        self.old_extend: bytearray = copy.copy(old_extend)
-        self.new_byte: bytes = new_byte
-        self.shift: int = shift
-        self.is_insert: bool = is_insert
+        self.removed: Optional[Piece] = removed
+        self.inserted: Optional[Piece] = None
+        self.removed_size: int = piece_size(removed)
+        self.inserted_size: int = inserted_size
+        self.cost: int = RECORD_COST
+
+    def kind(self) -> int:
+        """
+        Возвращает вид изменения: 1 - вставка, -1 - удаление,
+        0 - замена.
+
+        :return: Вид изменения.
+        :rtype: int
+        """
+        if not self.removed_size:
+            return 1
+        if not self.inserted_size:
+            return -1
+        return 0
+
+    def absorb(self, log_record: 'LogRecord') -> bool:
+        """
+        Поглощает следующую запись, если она касается диапазона,
+        вставленного этой записью (правка внутри него, сразу после него
+        или непосредственно перед ним), и объединённая запись остаётся
+        того же вида.
+
+        :param log_record: Следующая запись.
+        :type log_record: LogRecord
+        :return: True, если запись поглощена.
+        :rtype: bool
+        """
+        end = self.index + self.inserted_size
+        other_end = log_record.index + log_record.removed_size
+        inserted_size = self.inserted_size + log_record.inserted_size
+        if self.index <= log_record.index and other_end <= end:
+            index, removed = self.index, None
+            removed_size = self.removed_size
+            inserted_size -= log_record.removed_size
+        elif log_record.index == end or other_end == self.index:
+            index = min(self.index, log_record.index)
+            removed = log_record.removed
+            removed_size = self.removed_size + log_record.removed_size
+        else:
+            return False
+        kind = 1 if not removed_size else -1 if not inserted_size else 0
+        if kind != self.kind():
+            return False
+        if removed is None:
+            removed = self.removed
+        elif log_record.index == end:
+            removed = concat_pieces(self.removed, removed)
+            self.cost += log_record.cost - RECORD_COST
+        else:
+            removed = concat_pieces(removed, self.removed)
+            self.cost += log_record.cost - RECORD_COST
+        self.index = index
+        self.removed = removed
+        self.removed_size = removed_size
+        self.inserted_size = inserted_size
+        return True
 
 
 class Logger:
     """
-    Журнал изменений.
+    Журнал изменений. Подписчики из listeners вызываются после каждого
+    изменения с аргументами (смещение, удалено байтов, вставлено
+    байтов).
+
+    Идущие подряд соседние правки одного вида (набор, замена байтов,
+    удаление) сливаются в одну запись, которая отменяется целиком.
 
-    :param extended_bytes: Расширенные байты.
-    :type extended_bytes: Dict[int, bytearray]
+    Если записи обоих стеков занимают больше memory_budget байтов,
+    старые записи вытесняются в файл истории и читаются обратно, когда
+    отмена или повтор до них доходят.
+
+    :param pieces: Таблица кусков буфера.
+    :type pieces: PieceTable
+    :param memory_budget: Наибольший объём записей в памяти (None - без
+    ограничения).
+    :type memory_budget: Optional[int]
+    :param history_directory: Каталог для файла истории.
+    :type history_directory: Optional[str]
     """
 
-    def __init__(self, extended_bytes: Dict[int, bytearray]) -> None:
-        self.extended_bytes: Dict[int, bytearray] = extended_bytes
+    def __init__(self, pieces: PieceTable,
+                 memory_budget: Optional[int] = None,
+                 history_directory: Optional[str] = None) -> None:
+        self.pieces: PieceTable = pieces
         self.undo_stack: List[LogRecord] = []
         self.redo_stack: List[LogRecord] = []
+        self.listeners: List[Callable[[int, int, int], None]] = []
+        self.sealed: bool = True
+        self.memory_budget: Optional[int] = memory_budget
+        self.resident: int = 0
+        self.history: HistoryFile = HistoryFile(history_directory)
+        self.spilled_undo: List[int] = []
+        self.spilled_redo: List[int] = []
+
+    def notify(self, index: int, removed: int, inserted: int) -> None:
+        """
+        Сообщает подписчикам об изменении.
+
+        :param index: Логическое смещение изменения.
+        :type index: int
+        :param removed: Количество удалённых байтов.
+        :type removed: int
+        :param inserted: Количество вставленных байтов.
+        :type inserted: int
+        """
+        for listener in self.listeners:
+            listener(index, removed, inserted)
+
+    def seal(self) -> None:
+        """
+        Завершает текущую группу правок: следующая запись не будет
+        слита с последней.
+        """
+        self.sealed = True
 
-    def add(self, log_record: LogRecord) -> None:
+    def add(self, log_record: LogRecord, merge: bool = True) -> None:
         """
         Добавляет запись в журнал.
 
         :param log_record: Запись журнала.
         :type log_record: LogRecord
+        :param merge: Разрешить слияние с последней записью.
+        :type merge: bool
         """
-        self.undo_stack.append(log_record)
-        self.redo_stack.clear()
+        log_record.cost = record_cost(log_record.removed)
+        top = self.undo_stack[-1] if self.undo_stack else None
+        cost = top.cost if top is not None else 0
+        if merge and not self.sealed and top is not None \
+                and top.absorb(log_record):
+            self.resident += top.cost - cost
+        else:
+            self.undo_stack.append(log_record)
+            self.resident += log_record.cost
+        self.sealed = not merge
+        self.clear_redo()
+        self.trim()
+        self.notify(log_record.index, log_record.removed_size,
+                    log_record.inserted_size)
 
     def undo(self) -> None:
         """Отменяет последнее действие."""
+        if not self.undo_stack:
+            self.page_in(True)
         if not self.undo_stack:
             return
+        self.sealed = True
         log: LogRecord = self.undo_stack.pop()
-        if log.is_insert:
-            if log.index in self.extended_bytes:
-                self.extended_bytes[log.index].pop(log.shift)
-                if not self.extended_bytes[log.index]:
-                    del self.extended_bytes[log.index]
-        else:
-            if log.index in self.extended_bytes:
-                (self.extended_bytes[log.index].
-                 insert(log.shift, log.old_extend[log.shift]))
-            else:
-                self.extended_bytes[log.index] = (
-                    bytearray([log.old_extend[log.shift]]))
+        self.resident -= log.cost
+        log.inserted = self.pieces.cut(log.index, log.inserted_size)
+        self.pieces.paste(log.index, log.removed)
+        log.removed = None
+        log.cost = record_cost(log.inserted)
         self.redo_stack.append(log)
+        self.resident += log.cost
+        self.trim()
+        self.notify(log.index, log.inserted_size, log.removed_size)
 
     def redo(self) -> None:
         """Повторяет отмененное действие."""
+        if not self.redo_stack:
+            self.page_in(False)
         if not self.redo_stack:
             return
+        self.sealed = True
         log: LogRecord = self.redo_stack.pop()
-        if log.is_insert:
-            if log.index in self.extended_bytes:
-                self.extended_bytes[log.index].insert(log.shift,
-                                                      log.new_byte[0])
-            else:
-                self.extended_bytes[log.index] = bytearray([log.new_byte[0]])
-        else:
-            self.extended_bytes[log.index].pop(log.shift)
-            if not self.extended_bytes[log.index]:
-                del self.extended_bytes[log.index]
+        self.resident -= log.cost
+        log.removed = self.pieces.cut(log.index, log.removed_size)
+        self.pieces.paste(log.index, log.inserted)
+        log.inserted = None
+        log.cost = record_cost(log.removed)
         self.undo_stack.append(log)
+        self.resident += log.cost
+        self.trim()
+        self.notify(log.index, log.removed_size, log.inserted_size)
+
+    def trim(self) -> None:
+        """
+        Вытесняет старшую половину записей большего стека в файл
+        истории, пока записи не уложатся в бюджет. Последняя запись
+        каждого стека остаётся в памяти.
+        """
+        if self.memory_budget is None:
+            return
+        while self.resident > self.memory_budget:
+            is_undo = len(self.undo_stack) >= len(self.redo_stack)
+            stack = self.undo_stack if is_undo else self.redo_stack
+            if len(stack) < 2:
+                return
+            count = len(stack) // 2
+            records = stack[:count]
+            del stack[:count]
+            offset = self.history.write_block(
+                [(log.index, log.removed_size, log.inserted_size,
+                  log.removed if is_undo else log.inserted)
+                 for log in records])
+            (self.spilled_undo if is_undo
+             else self.spilled_redo).append(offset)
+            self.resident -= sum(log.cost for log in records)
+
+    def page_in(self, is_undo: bool) -> None:
+        """
+        Читает из файла истории последний вытесненный блок стека.
+
+        :param is_undo: Стек отмены (True) или повтора (False).
+        :type is_undo: bool
+        """
+        spilled = self.spilled_undo if is_undo else self.spilled_redo
+        if not spilled:
+            return
+        offset = spilled.pop()
+        records: List[LogRecord] = []
+        for index, removed_size, inserted_size, node in \
+                self.history.read_block(offset):
+            log = LogRecord(index, node if is_undo else None, inserted_size)
+            log.removed_size = removed_size
+            if not is_undo:
+                log.inserted = node
+            log.cost = record_cost(node)
+            records.append(log)
+            self.resident += log.cost
+        if is_undo:
+            self.undo_stack[:0] = records
+        else:
+            self.redo_stack[:0] = records
+
+    def clear_redo(self) -> None:
+        """
+        Очищает стек повтора вместе с вытесненными записями.
+        """
+        for offset in self.spilled_redo:
+            self.history.drop_block(offset)
+        self.spilled_redo.clear()
+        self.resident -= sum(log.cost for log in self.redo_stack)
+        self.redo_stack.clear()
+
+    def clear(self) -> None:
+        """
+        Очищает журнал и удаляет файл истории.
+        """
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.spilled_undo.clear()
+        self.spilled_redo.clear()
+        self.history.clear()
+        self.resident = 0
+        self.sealed = True
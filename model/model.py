@@ -1,8 +1,38 @@
+import bisect
+import functools
 import sys
 import os
-from typing import Dict, List
+import shutil
+import tempfile
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 
+from model.journal import Journal
 from model.logging import Logger, LogRecord
+from model.piece_table import ADD, Piece, PieceTable
+from model.render_cache import RowCache
+from model.saving import (WriteStats, file_descriptor, kernel_copy,
+                          write_at)
+
+
+@functools.lru_cache(maxsize=None)
+def text_table(encoding: str) -> bytes:
+    """
+    Строит таблицу для bytes.translate: байты, которые не выводятся
+    как отдельный символ в данной кодировке, заменяются точкой.
+
+    :param encoding: Кодировка.
+    :type encoding: str
+    :return: Таблица из 256 байтов.
+    :rtype: bytes
+    """
+    table = bytearray(range(256))
+    for byte in range(256):
+        try:
+            if byte < 20 or len(bytes([byte]).decode(encoding)) != 1:
+                table[byte] = ord('.')
+        except UnicodeDecodeError:
+            table[byte] = ord('.')
+    return bytes(table)
 
 
 class Buffer:
@@ -11,11 +41,16 @@ class Buffer:
 
     :param file_name: Имя файла для работы с буфером.
     :type file_name: str
+    :param journal: Вести журнал правок рядом с файлом и восстановить
+    правки из него при открытии. В каталог только для чтения журнал не
+    пишется.
+    :type journal: bool
     """
 
-    def __init__(self, file_name: str) -> None:
+    def __init__(self, file_name: str, journal: bool = False) -> None:
         self.row_count: int = 30
         self.chunk_size: int = 4194304
+        self.undo_budget: int = 67108864
         self.len_byte = 3
         self.len_ascii_char = 16
         self.len_ascii_line = 17
@@ -25,11 +60,41 @@ class Buffer:
         self.file_name: str = file_name
         self.file = open(file_name, 'br')
         self.file_size: int = os.path.getsize(file_name)
-        self.extended_bytes: Dict[int, bytearray] = {}
-        self.logger: Logger = Logger(self.extended_bytes)
+        self.pieces: PieceTable = PieceTable(self.file, self.file_size)
+        self.journal: Optional[Journal] = None
+        self.recovered: int = 0
+        directory: Optional[str] = os.path.dirname(
+            os.path.abspath(file_name))
+        if not os.access(directory, os.W_OK):
+            directory = None
+        if journal and directory is not None:
+            self.journal = Journal(Journal.path_for(file_name))
+            self.recovered = self.journal.replay(self.pieces, file_name)
+            self.journal.start(self.pieces, file_name, self.recovered > 0)
+        self.logger: Logger = Logger(self.pieces, self.undo_budget,
+                                     directory)
+        self.row_cache: RowCache = RowCache()
+        self._overlay: Dict[int, bytearray] = {}
+        self._overlay_version: int = -1
+        self.logger.listeners.append(self.invalidate_rows)
         self.update_data(0)
         self.cursors: List[int] = []
-        self.cursor_is_busy: bool = False
+
+    @property
+    def extended_bytes(self) -> Dict[int, bytearray]:
+        """
+        Словарь изменений относительно исходного файла, построенный по
+        таблице кусков. Словарь перестраивается, только когда меняется
+        версия таблицы.
+
+        :return: Словарь изменений.
+        :rtype: Dict[int, bytearray]
+        """
+        with self.pieces.lock:
+            if self._overlay_version != self.pieces.version:
+                self._overlay = self.pieces.overlay()
+                self._overlay_version = self.pieces.version
+            return self._overlay
 
     def get_size(self) -> int:
         """
@@ -38,34 +103,166 @@ class Buffer:
         :return: Размер буфера в байтах.
         :rtype: int
         """
-        res: int = self.file_size
-        for bytes_ in self.extended_bytes.values():
-            res += len(bytes_) - 1
-        return res
+        return self.pieces.size
 
-    def write_data(self, file) -> None:
+    def write_data(self, file,
+                   chunk_size: Optional[int] = None) -> WriteStats:
         """
-        Записывает данные буфера в файл.
+        Записывает данные буфера в файл. Неизменённые участки исходного
+        файла и данные из файла подкачки копируются ядром, когда это
+        возможно, остальные данные
+        пишутся порциями не больше chunk_size байтов.
 
         :param file: Файл для записи данных.
         :type file: file
-        """
-        self.file.seek(0)
-        current_pos = 0
-        extended_positions = sorted(self.extended_bytes.keys())
-
-        for pos in extended_positions:
-            if current_pos < pos:
-                chunk_size = pos - current_pos
-                file.write(self.file.read(chunk_size))
-                current_pos += chunk_size
-
-            file.write(self.extended_bytes[pos])
-            current_pos += len(self.extended_bytes[pos])
-            self.file.seek(current_pos)
-
-        remaining_data = self.file.read()
-        file.write(remaining_data)
+        :param chunk_size: Наибольший размер порции (по умолчанию
+        self.chunk_size).
+        :type chunk_size: Optional[int]
+        :return: Статистика записи.
+        :rtype: WriteStats
+        """
+        chunk_size = chunk_size or self.chunk_size
+        stats = WriteStats()
+        target_fd = file_descriptor(file)
+        for source, start, length in self.pieces.iter_pieces():
+            stats.bytes_written += length
+            source_fd = self.pieces.source_descriptor(source)
+            if source_fd is not None and target_fd is not None:
+                file.flush()
+                position = file.tell()
+                copied = kernel_copy(source_fd, target_fd, start, length)
+                file.seek(position + copied)
+                stats.bytes_copied += copied
+                start += copied
+                length -= copied
+            for shift in range(0, length, chunk_size):
+                file.write(self.pieces.read_source(
+                    source, start + shift, min(chunk_size, length - shift)))
+        file.flush()
+        return stats.finish()
+
+    def iter_range(self, offset: int, length: int,
+                   chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Перебирает логический диапазон порциями ровно по chunk_size
+        байтов (последняя может быть короче), не загружая его целиком.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param length: Длина диапазона.
+        :type length: int
+        :param chunk_size: Размер порции (по умолчанию self.chunk_size).
+        :type chunk_size: Optional[int]
+        :return: Итератор порций.
+        :rtype: Iterator[bytes]
+        """
+        chunk_size = chunk_size or self.chunk_size
+        end = min(offset + length, self.pieces.size)
+        for start in range(offset, end, chunk_size):
+            yield self.pieces.read(start, min(chunk_size, end - start))
+
+    def save(self, file_name: str) -> WriteStats:
+        """
+        Сохраняет буфер в файл. Если файл - исходный, а все изменения
+        являются заменами байтов без сдвига, в него дописываются только
+        изменённые диапазоны. Иначе данные пишутся во временный файл
+        рядом с целевым, который затем атомарно его заменяет; если
+        заменён исходный файл, буфер открывает его заново.
+
+        :param file_name: Имя целевого файла.
+        :type file_name: str
+        :return: Статистика записи.
+        :rtype: WriteStats
+        """
+        is_source = (os.path.exists(file_name)
+                     and os.path.samefile(file_name, self.file_name))
+        if is_source:
+            ranges = self.pieces.overwritten_ranges()
+            if ranges is not None:
+                stats = self.patch_data(ranges)
+                self.reset_journal()
+                return stats
+        directory = os.path.dirname(os.path.abspath(file_name))
+        fd, temp_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                stats = self.write_data(file)
+                os.fsync(file.fileno())
+            shutil.copymode(file_name if os.path.exists(file_name)
+                            else self.file_name, temp_name)
+            os.replace(temp_name, file_name)
+        except BaseException:
+            os.remove(temp_name)
+            raise
+        if is_source:
+            self.reopen()
+        return stats
+
+    def reopen(self) -> None:
+        """
+        Открывает заново исходный файл, заменённый сохранением, и
+        переводит на него таблицу кусков: прежние куски ссылаются на
+        старую версию файла. История изменений очищается по той же
+        причине, а журнал начинается заново относительно новой версии.
+        """
+        file = open(self.file_name, 'br')
+        if self.journal is not None:
+            self.journal.discard()
+        self.logger.clear()
+        self.file.close()
+        self.file = file
+        self.file_size = os.fstat(file.fileno()).st_size
+        self.pieces.rebase(file, self.file_size)
+        if self.journal is not None:
+            self.journal.start(self.pieces, self.file_name)
+
+    def reset_journal(self) -> None:
+        """
+        Начинает журнал заново после того, как исходный файл был дописан
+        на месте: правки уже в файле. Файлы данных остаются, так как
+        куски по-прежнему ссылаются на них.
+        """
+        if self.journal is None:
+            return
+        self.journal.discard(True)
+        self.journal.start(self.pieces, self.file_name)
+
+    def patch_data(self, ranges: List[Tuple[int, int, int]]) -> WriteStats:
+        """
+        Записывает изменённые диапазоны прямо в исходный файл. История
+        изменений после этого очищается, так как её записи ссылаются на
+        перезаписанные байты.
+
+        :param ranges: Диапазоны из PieceTable.overwritten_ranges.
+        :type ranges: List[Tuple[int, int, int]]
+        :return: Статистика записи.
+        :rtype: WriteStats
+        """
+        stats = WriteStats()
+        fd = os.open(self.file_name, os.O_WRONLY)
+        try:
+            for offset, start, length in ranges:
+                for shift in range(0, length, self.chunk_size):
+                    count = min(self.chunk_size, length - shift)
+                    write_at(fd, self.pieces.read_source(
+                        ADD, start + shift, count), offset + shift)
+                stats.bytes_written += length
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.logger.clear()
+        return stats.finish()
+
+    def close(self) -> None:
+        """
+        Закрывает исходный файл и удаляет файл истории изменений. Журнал
+        правок сбрасывается на диск и остаётся до следующего открытия.
+        """
+        if self.journal is not None:
+            self.journal.close()
+        self.logger.clear()
+        self.pieces.close()
+        self.file.close()
 
     def update_data(self, shift: int) -> None:
         """
@@ -75,75 +272,107 @@ class Buffer:
         :type shift: int
         """
         self.tens_offset = shift
+        self.shown = bytearray(
+            self.pieces.read(shift * self.len_ascii_char,
+                             self.row_count * self.len_ascii_char))
+        self.rendered: Optional[List[Tuple[str, str]]] = None
+
+    def invalidate_rows(self, offset: int, removed: int,
+                        inserted: int) -> None:
+        """
+        Отмечает в кэше строк строки, затронутые изменением. Замена без
+        изменения длины затрагивает только свои строки, остальные
+        изменения сдвигают все строки до конца буфера.
+
+        :param offset: Логическое смещение изменения.
+        :type offset: int
+        :param removed: Количество удалённых байтов.
+        :type removed: int
+        :param inserted: Количество вставленных байтов.
+        :type inserted: int
+        """
+        first = offset // self.len_ascii_char
+        if removed == inserted:
+            self.row_cache.invalidate(
+                first, (offset + max(inserted, 1) - 1) // self.len_ascii_char)
+        else:
+            self.row_cache.invalidate(first)
 
-        start = shift * self.len_ascii_char
-        iter = 0
-        self.shown = bytearray()
-        self.byte_index = {}
-
-        for i in sorted(self.extended_bytes.keys()):
-            if i < start:
-                if i + len(self.extended_bytes[i]) < start:
-                    if len(self.extended_bytes[i]) == 0:
-                        start += 1
-                    elif len(self.extended_bytes[i]) > 1:
-                        start -= len(self.extended_bytes[i]) - 1
-                    self.byte_index[-1] = start - 1
-                else:
-                    shift = start - i
-                    start = i + 1
-                    for _ in self.extended_bytes[i][:shift]:
-                        iter -= 1
-                        self.byte_index[iter] = i
-                    iter = 0
-                    for byte in self.extended_bytes[i][shift:]:
-                        self.byte_index[iter] = i
-                        iter += 1
-                        self.shown.append(byte)
-                    break
-            else:
-                break
+    def render_rows(self) -> List[Tuple[str, str]]:
+        """
+        Возвращает шестнадцатеричное и текстовое представления видимых
+        строк, беря неизменённые строки из кэша.
+
+        :return: Список пар строк.
+        :rtype: List[Tuple[str, str]]
+        """
+        if self.rendered is not None:
+            return self.rendered
+        self.rendered = []
+        for start in range(0, len(self.shown), self.len_ascii_char):
+            row = self.tens_offset + start // self.len_ascii_char
+            cached = self.row_cache.get(row)
+            if cached is None:
+                cached = self.render_row(
+                    self.shown[start:start + self.len_ascii_char])
+                self.row_cache.put(row, *cached)
+            self.rendered.append(cached)
+        return self.rendered
+
+    def render_row(self, data: bytes) -> Tuple[str, str]:
+        """
+        Строит шестнадцатеричное и текстовое представления строки.
 
-        self.file.seek(start)
-        if self.file.tell() != 0:
-            self.byte_index[-1] = self.file.tell() - 1
+        :param data: Байты строки.
+        :type data: bytes
+        :return: Пара строк.
+        :rtype: Tuple[str, str]
+        """
+        table = text_table(self.encoding)
+        return (data.hex(' '),
+                data.translate(table).decode(self.encoding, 'replace'))
 
-        while len(self.shown) < self.row_count * self.len_ascii_char:
-            pos = self.file.tell()
-            byte = self.file.read(1)
-            if byte == b'':
+    def prefetch_rows(self, first_row: int, count: int) -> int:
+        """
+        Заранее строит строки, которых нет в кэше, чтобы при прокрутке
+        к ним они уже были готовы.
+
+        :param first_row: Первая строка.
+        :type first_row: int
+        :param count: Количество строк.
+        :type count: int
+        :return: Сколько строк было построено.
+        :rtype: int
+        """
+        first_row = max(0, first_row)
+        rows = [row for row in range(first_row, first_row + count)
+                if row not in self.row_cache]
+        if not rows:
+            return 0
+        data = self.pieces.read(rows[0] * self.len_ascii_char,
+                                (rows[-1] - rows[0] + 1) * self.len_ascii_char)
+        built = 0
+        for row in rows:
+            start = (row - rows[0]) * self.len_ascii_char
+            line = data[start:start + self.len_ascii_char]
+            if not line:
                 break
-            if pos in self.extended_bytes:
-                for byte in self.extended_bytes[pos]:
-                    self.byte_index[iter] = pos
-                    iter += 1
-                    self.shown.append(byte)
-            else:
-                self.byte_index[iter] = pos
-                iter += 1
-                self.shown.append(byte[0])
+            self.row_cache.put(row, *self.render_row(line))
+            built += 1
+        return built
 
     def get_position(self, index: int, shift: int) -> int:
         """
-        Возвращает позицию байта в данных.
+        Возвращает логическую позицию байта исходного файла.
 
-        :param index: Индекс байта.
+        :param index: Смещение байта в исходном файле.
         :type index: int
         :param shift: Сдвиг.
         :type shift: int
         :return: Позиция байта.
         :rtype: int
         """
-        pos = 0
-        for i in range(index):
-            if i in self.extended_bytes:
-                for j in self.extended_bytes[i]:
-                    pos += 1
-            else:
-                pos += 1
-        for i in range(shift):
-            pos += 1
-        return pos
+        return self.pieces.to_logical(index) + shift
 
     def update_from_hex_position(self, position: int,
                                  char: str, is_insert: bool) -> int:
@@ -159,6 +388,8 @@ class Buffer:
         :return: Новая позиция.
         :rtype: int
         """
+        if char in self._16_base and self.cursors:
+            return self.type_at_cursors(position, char, is_insert)
         if char in self._16_base:
             index = position // self.len_byte
             if position % self.len_byte == 0:
@@ -174,7 +405,6 @@ class Buffer:
                 new += char
                 self.add_byte(index, bytes.fromhex(new), True)
                 position += 2
-            position = self.handle_multicursor(position, char, is_insert)
         return position
 
     def add_byte(self, index: int, byte: bytes, is_insert: bool) -> None:
@@ -188,50 +418,146 @@ class Buffer:
         :param is_insert: Флаг вставки.
         :type is_insert: bool
         """
-        if not is_insert:
-            index -= 1
-        try:
-            if self.byte_index[index] in self.extended_bytes:
-                shift = 0
-                try:
-                    while (self.byte_index[index - shift - 1]
-                           == self.byte_index[index]):
-                        shift += 1
-                except KeyError:
-                    pass
-                log = LogRecord(self.byte_index[index],
-                                self.extended_bytes[self.byte_index[index]],
-                                byte, shift,
-                                is_insert)
-                if is_insert:
-                    self.extended_bytes[self.byte_index[index]][shift] \
-                        = byte[0]
-                else:
-                    (self.extended_bytes[self.byte_index[index]].
-                     insert(shift + 1, byte[0]))
-            else:
-                new = bytearray()
-                if is_insert:
-                    log = LogRecord(self.byte_index[index],
-                                    None, byte, 0, is_insert)
-                elif index != -1:
-                    new = bytearray(self.shown[index: index + 1])
-                    log = LogRecord(self.byte_index[index],
-                                    None, byte, 1, is_insert)
-                else:
-                    self.file.seek(self.byte_index[index])
-                    new = bytearray(self.file.read(1))
-                    log = LogRecord(self.byte_index[index],
-                                    None, byte, 1, is_insert)
-                new.append(byte[0])
-                self.extended_bytes[self.byte_index[index]] = new
-        except KeyError:
-            if 0 not in self.extended_bytes:
-                self.extended_bytes[0] = self.shown[0:1]
-            log = LogRecord(0, self.extended_bytes[0], byte,
-                            1, is_insert)
-            self.extended_bytes[0].insert(0, byte[0])
-        self.logger.add(log)
+        position = self.tens_offset * self.len_ascii_char + index
+        length = 1 if is_insert and position < self.pieces.size else 0
+        removed = self.pieces.replace(position, length, byte[:1])
+        self.logger.add(LogRecord(position, removed, 1))
+        self.update_data(self.tens_offset)
+
+    def replace_ranges(self, offsets: List[int], length: int,
+                       data: bytes) -> None:
+        """
+        Заменяет диапазоны одинаковой длины одними и теми же байтами
+        одним действием, которое отменяется целиком.
+
+        :param offsets: Отсортированные непересекающиеся логические
+        смещения.
+        :type offsets: List[int]
+        :param length: Длина каждого заменяемого диапазона.
+        :type length: int
+        :param data: Новые байты.
+        :type data: bytes
+        """
+        if not offsets:
+            return
+        removed = self.pieces.replace_ranges(offsets, length, data)
+        span = offsets[-1] + length - offsets[0]
+        inserted = span + len(offsets) * (len(data) - length)
+        self.logger.add(LogRecord(offsets[0], removed, inserted), False)
+        self.update_data(self.tens_offset)
+
+    def replace_each(self, edits: List[Tuple[int, int, bytes]]) -> None:
+        """
+        Выполняет несколько замен с разными данными одним действием,
+        которое отменяется целиком.
+
+        :param edits: Отсортированные непересекающиеся замены
+        (логическое смещение, длина заменяемого диапазона, новые байты).
+        :type edits: List[Tuple[int, int, bytes]]
+        """
+        if not edits:
+            return
+        removed = self.pieces.replace_each(edits)
+        span = edits[-1][0] + edits[-1][1] - edits[0][0]
+        inserted = span + sum(len(data) - length
+                              for _, length, data in edits)
+        self.logger.add(LogRecord(edits[0][0], removed, inserted), False)
+        self.update_data(self.tens_offset)
+
+    def insert_range(self, offset: int,
+                     data: Union[bytes, memoryview, BinaryIO],
+                     size: Optional[int] = None) -> int:
+        """
+        Вставляет байты или содержимое потока одним действием, которое
+        отменяется целиком. Поток читается порциями в файл подкачки и
+        в память целиком не загружается.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param data: Байты либо поток, открытый на чтение.
+        :type data: Union[bytes, memoryview, BinaryIO]
+        :param size: Сколько байтов прочитать из потока (по умолчанию до
+        конца).
+        :type size: Optional[int]
+        :return: Количество вставленных байтов.
+        :rtype: int
+        """
+        offset = min(offset, self.pieces.size)
+        removed, inserted = self.pieces.replace_from(offset, 0, data, size)
+        self.log_range(offset, removed, inserted)
+        return inserted
+
+    def delete_range(self, offset: int, length: int) -> None:
+        """
+        Удаляет диапазон одним действием, которое отменяется целиком.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param length: Длина диапазона.
+        :type length: int
+        """
+        removed = self.pieces.cut(offset, length)
+        self.log_range(offset, removed, 0)
+
+    def overwrite_range(self, offset: int,
+                        data: Union[bytes, memoryview, BinaryIO],
+                        size: Optional[int] = None) -> int:
+        """
+        Заменяет байты, начиная со смещения, байтами или содержимым
+        потока той же длины. Запись за конец буфера расширяет его.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param data: Байты либо поток, открытый на чтение.
+        :type data: Union[bytes, memoryview, BinaryIO]
+        :param size: Сколько байтов прочитать из потока (по умолчанию до
+        конца).
+        :type size: Optional[int]
+        :return: Количество записанных байтов.
+        :rtype: int
+        """
+        offset = min(offset, self.pieces.size)
+        removed, inserted = self.pieces.replace_from(offset, None, data,
+                                                     size)
+        self.log_range(offset, removed, inserted)
+        return inserted
+
+    def fill_range(self, offset: int, length: int,
+                   pattern: bytes = b'\x00') -> None:
+        """
+        Заполняет диапазон повторяющимся образцом. Память расходуется
+        на один блок образца, а не на весь диапазон.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param length: Длина диапазона.
+        :type length: int
+        :param pattern: Непустой образец.
+        :type pattern: bytes
+        """
+        if not pattern:
+            raise ValueError('Образец заполнения пуст')
+        offset = min(offset, self.pieces.size)
+        removed = self.pieces.fill(offset, length, length, pattern)
+        self.log_range(offset, removed, length)
+
+    def log_range(self, offset: int, removed: Optional[Piece],
+                  inserted: int) -> None:
+        """
+        Записывает изменение диапазона в журнал отдельной записью, не
+        объединяя его с предыдущими, и обновляет показываемые данные.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param removed: Поддерево вырезанных кусков.
+        :type removed: Optional[Piece]
+        :param inserted: Количество вставленных байтов.
+        :type inserted: int
+        """
+        if removed is None and not inserted:
+            return
+        self.logger.add(LogRecord(offset, removed, inserted), False)
+        self.update_data(self.tens_offset)
 
     def update_from_text_position(self, position: int,
                                   char: str, is_insert: bool) -> int:
@@ -268,26 +594,12 @@ class Buffer:
         :param index: Индекс байта.
         :type index: int
         """
-        if self.byte_index[index] in self.extended_bytes:
-            shift = 0
-            try:
-                while (self.byte_index[index - 1 - shift]
-                       == self.byte_index[index]):
-                    shift += 1
-            except KeyError:
-                pass
-            log = LogRecord(self.byte_index[index],
-                            self.extended_bytes[self.byte_index[index]],
-                            b'', shift, True)
-            try:
-                self.extended_bytes[self.byte_index[index]].pop(shift)
-            except IndexError:
-                pass
-        else:
-            log = LogRecord(self.byte_index[index], None,
-                            b'', 0, True)
-            self.extended_bytes[self.byte_index[index]] = bytearray()
-        self.logger.add(log)
+        position = self.tens_offset * self.len_ascii_char + index
+        if not 0 <= position < self.pieces.size:
+            return
+        removed = self.pieces.cut(position, 1)
+        self.logger.add(LogRecord(position, removed, 0))
+        self.update_data(self.tens_offset)
 
     def backspace_event_from_text(self, position: int) -> int:
         """
@@ -317,16 +629,12 @@ class Buffer:
         :return: Новая позиция.
         :rtype: int
         """
+        if self.cursors:
+            return self.backspace_at_cursors(position)
         if position % self.len_byte == 0 and position != 0:
             index = position // self.len_byte - 1
             self.delete_byte(index)
             position -= self.len_byte
-            position = self.handle_multicursor(position, '',
-                                               True)
-        else:
-            position = self.handle_multicursor(position, '',
-                                               False)
-
         return position
 
     def tens_count(self) -> str:
@@ -337,8 +645,7 @@ class Buffer:
         :rtype: str
         """
         end = self.tens_offset + len(self.shown) // self.len_ascii_char + 1
-        return ''.join([str(hex(x))[2:].zfill(7) +
-                        '0\n' for x in range(self.tens_offset, end)])
+        return ''.join([f'{x:07x}0\n' for x in range(self.tens_offset, end)])
 
     def units_count(self) -> str:
         """
@@ -356,37 +663,21 @@ class Buffer:
         :return: Данные в шестнадцатеричном формате.
         :rtype: str
         """
-        _hex = self.shown.hex()
-        hex_list = [_hex[i:i + 2] for i in range(0, len(_hex), 2)]
-
-        if len(hex_list) % self.len_ascii_char != 0:
-            for i in range(0, self.len_ascii_char -
-                              len(hex_list) % self.len_ascii_char):
-                hex_list.append('')
-
-        return ('\n'.join(
-            [' '.join([hex_list[j] for j in
-                       range(i, i + self.len_ascii_char)])
-             for i in range(0, len(hex_list),
-                            self.len_ascii_char)]).rstrip() + ' ')
+        return '\n'.join([row[0] for row in self.render_rows()]) + ' '
 
     def to_text(self) -> str:
         """
-        Возвращает данные в текстовом формате.
+        Возвращает данные в текстовом формате. Байты переводятся в
+        символы через таблицу bytes.translate (см. text_table).
 
         :return: Данные в текстовом формате.
         :rtype: str
         """
-        text = ''.join([self.char_decrypt(i)
-                        for i in range(len(self.shown))])
-
-        res = '\n'.join([text[i:i + self.len_ascii_char] for i
-                         in range(0, len(text) - len(text)
-                                  % self.len_ascii_char,
-                                  self.len_ascii_char)])
-
-        return (res + f'\n{text[len(text) - len(text) 
-                                % self.len_ascii_char:]}').lstrip('\n')
+        rows = self.render_rows()
+        res = '\n'.join([row[1] for row in rows])
+        if rows and len(rows[-1][1]) == self.len_ascii_char:
+            res += '\n'
+        return res
 
     def char_decrypt(self, index: int) -> str:
         """
@@ -408,53 +699,106 @@ class Buffer:
                     res += '.'
         return res
 
-    def handle_multicursor(self, position: int,
-                           char: str, is_insert_or_is_deleted: bool) -> int:
+    def add_cursor(self, position: int) -> None:
         """
-        Управляет несколькими курсорами.
+        Добавляет курсор, сохраняя список курсоров упорядоченным и без
+        повторов.
 
-        :param position: Текущая позиция.
+        :param position: Позиция в шестнадцатеричном формате.
         :type position: int
-        :param char: Символ для обновления.
+        """
+        index = bisect.bisect_left(self.cursors, position)
+        if index == len(self.cursors) or self.cursors[index] != position:
+            self.cursors.insert(index, position)
+
+    def with_cursors(self, position: int) -> List[int]:
+        """
+        Возвращает упорядоченные позиции всех курсоров вместе с
+        основным.
+
+        :param position: Позиция основного курсора.
+        :type position: int
+        :return: Позиции без повторов.
+        :rtype: List[int]
+        """
+        positions = list(self.cursors)
+        index = bisect.bisect_left(positions, position)
+        if index == len(positions) or positions[index] != position:
+            positions.insert(index, position)
+        return positions
+
+    def type_at_cursors(self, position: int, char: str,
+                        is_insert: bool) -> int:
+        """
+        Вводит шестнадцатеричную цифру во всех курсорах одним действием:
+        правки собираются за один проход по упорядоченным курсорам,
+        применяются одной заменой, а сдвиг курсоров от вставленных
+        байтов накапливается по ходу прохода.
+
+        :param position: Позиция основного курсора.
+        :type position: int
+        :param char: Цифра.
         :type char: str
-        :param is_insert_or_is_deleted: Флаг вставки или удаления.
-        :type is_insert_or_is_deleted: bool
-        :return: Новая позиция.
+        :param is_insert: Флаг замены (False - вставка нового байта).
+        :type is_insert: bool
+        :return: Новая позиция основного курсора.
         :rtype: int
         """
-        if not self.cursor_is_busy:
-            self.cursor_is_busy = True
-            self.cursors = list(set(self.cursors))
-            self.cursors.sort()
-            if char == '':
-                if position % self.len_byte == 0 and is_insert_or_is_deleted:
-                    for i in range(len(self.cursors)):
-                        if self.cursors[i] > position + self.len_byte:
-                            self.cursors[i] -= self.len_byte
-                for i in range(len(self.cursors) - 1, -1, -1):
-                    if self.cursors[i] % self.len_byte == 0:
-                        if (position + self.len_byte > self.cursors[i] != 0
-                                and self.cursors != 0):
-                            position -= self.len_byte
-                        self.cursors[i] = (
-                            self.backspace_event_from_hex(self.cursors[i]))
+        base = self.tens_offset * self.len_ascii_char
+        edits: List[Tuple[int, int, bytes]] = []
+        moved: List[int] = []
+        main = position
+        shift = 0
+        for cursor in self.with_cursors(position):
+            index = cursor // self.len_byte
+            if index > len(self.shown):
+                continue
+            offset = base + index
+            old = self.shown[index:index + 1]
+            if edits and edits[-1][0] == offset and edits[-1][1] == 1:
+                old = edits.pop()[2]
+            if cursor % self.len_byte == 0 and not (is_insert and old):
+                edits.append((offset, 0, bytes.fromhex(f'{char}0')))
+                new = cursor + shift + 1
+                shift += self.len_byte
+            elif cursor % self.len_byte == 0:
+                edits.append((offset, 1, bytes.fromhex(char + old.hex()[1])))
+                new = cursor + shift + 1
+            elif old:
+                edits.append((offset, 1, bytes.fromhex(old.hex()[0] + char)))
+                new = cursor + shift + 2
             else:
-                if (not is_insert_or_is_deleted
-                        and (position - 1) % self.len_byte == 0):
-                    for i in range(len(self.cursors)):
-                        if self.cursors[i] > position - self.len_byte:
-                            self.cursors[i] += self.len_byte
-                offset = 0
-                for i in range(len(self.cursors)):
-                    self.cursors[i] = (offset +
-                                       self.update_from_hex_position(
-                                           self.cursors[i],
-                                           char,
-                                           is_insert_or_is_deleted))
-                    if (not is_insert_or_is_deleted and (self.cursors[i] - 1)
-                            % self.len_byte == 0):
-                        offset += self.len_byte
-                        if self.cursors[i] < position - self.len_byte:
-                            position += self.len_byte
-            self.cursor_is_busy = False
-        return position
+                continue
+            moved.append(new)
+            if cursor == position:
+                main = new
+        self.replace_each(edits)
+        self.cursors = [cursor for cursor in moved if cursor != main]
+        return main
+
+    def backspace_at_cursors(self, position: int) -> int:
+        """
+        Удаляет байт перед каждым курсором, стоящим на границе байта,
+        одним действием. Новые позиции курсоров вычисляются двоичным
+        поиском по упорядоченному списку удалённых байтов.
+
+        :param position: Позиция основного курсора.
+        :type position: int
+        :return: Новая позиция основного курсора.
+        :rtype: int
+        """
+        base = self.tens_offset * self.len_ascii_char
+        positions = self.with_cursors(position)
+        deleted = sorted({cursor // self.len_byte - 1 for cursor in positions
+                          if cursor % self.len_byte == 0
+                          and 0 < cursor // self.len_byte <= len(self.shown)})
+        self.replace_each([(base + index, 1, b'') for index in deleted])
+
+        def move(cursor: int) -> int:
+            count = bisect.bisect_left(deleted, cursor // self.len_byte)
+            return cursor - count * self.len_byte
+
+        main = move(position)
+        self.cursors = sorted({move(cursor) for cursor in self.cursors}
+                              - {main})
+        return main
@@ -0,0 +1,192 @@
+from typing import BinaryIO, Iterator, List, Tuple
+
+from model.model import Buffer
+from model.piece_table import ORIGINAL, SCRATCH, Piece, build_tree
+
+MAGIC = b'HXP1'
+SOURCE_READ = 0
+TARGET_READ = 1
+SOURCE_COPY = 2
+
+Action = Tuple[int, int, int, List[Tuple[int, int, int]]]
+
+
+def encode_number(number: int) -> bytes:
+    """
+    Кодирует неотрицательное число переменной длиной, как в формате BPS.
+
+    :param number: Число.
+    :type number: int
+    :return: Байты числа.
+    :rtype: bytes
+    """
+    data = bytearray()
+    while True:
+        low = number & 0x7f
+        number >>= 7
+        if number == 0:
+            data.append(0x80 | low)
+            return bytes(data)
+        data.append(low)
+        number -= 1
+
+
+def read_number(stream: BinaryIO) -> int:
+    """
+    Читает число, записанное encode_number.
+
+    :param stream: Поток патча.
+    :type stream: BinaryIO
+    :return: Число.
+    :rtype: int
+    :raises ValueError: Если поток оборвался.
+    """
+    number = 0
+    shift = 1
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            raise ValueError('Патч оборван')
+        number += (byte[0] & 0x7f) * shift
+        if byte[0] & 0x80:
+            return number
+        shift <<= 7
+        number += shift
+
+
+def patch_actions(buffer: Buffer) -> Iterator[Action]:
+    """
+    Перебирает действия патча по кускам буфера. Кусок исходного файла
+    на своём месте становится чтением из исходника, смещённый -
+    копированием из исходника, а добавленные байты - данными патча.
+    Соседние действия одного вида объединяются.
+
+    :param buffer: Буфер.
+    :type buffer: Buffer
+    :return: Итератор кортежей (действие, длина, начало в исходнике,
+    куски с данными патча).
+    :rtype: Iterator[Action]
+    """
+    action, length, start, segments = -1, 0, 0, []
+    offset = 0
+    for source, piece_start, piece_length in buffer.pieces.iter_pieces():
+        if source != ORIGINAL:
+            kind = TARGET_READ
+        elif piece_start == offset:
+            kind = SOURCE_READ
+        else:
+            kind = SOURCE_COPY
+        offset += piece_length
+        if kind == action and (kind != SOURCE_COPY
+                               or start + length == piece_start):
+            length += piece_length
+        else:
+            if length:
+                yield action, length, start, segments
+            action, length, start, segments = (kind, piece_length,
+                                               piece_start, [])
+        if kind == TARGET_READ:
+            segments.append((source, piece_start, piece_length))
+    if length:
+        yield action, length, start, segments
+
+
+def export_patch(buffer: Buffer, target: BinaryIO,
+                 chunk_size: int = 4194304) -> int:
+    """
+    Записывает патч от исходного файла буфера к его текущему
+    содержимому. Действия строятся по таблице кусков, поэтому время
+    зависит от количества правок, а не от размера файла: неизменённые
+    байты не читаются, а данные правок пишутся порциями.
+
+    Формат: MAGIC, размер исходника, размер результата, затем действия.
+    Действие - число (длина - 1) * 4 + вид; у чтения из патча за ним
+    идут данные, у копирования - сдвиг начала в исходнике относительно
+    конца прошлого копирования (модуль * 2 + знак).
+
+    :param buffer: Буфер.
+    :type buffer: Buffer
+    :param target: Поток, открытый на запись.
+    :type target: BinaryIO
+    :param chunk_size: Размер порции данных.
+    :type chunk_size: int
+    :return: Количество действий.
+    :rtype: int
+    """
+    pieces = buffer.pieces
+    target.write(MAGIC + encode_number(buffer.file_size)
+                 + encode_number(pieces.size))
+    count = 0
+    copy_offset = 0
+    with pieces.lock:
+        for action, length, start, segments in patch_actions(buffer):
+            target.write(encode_number((length - 1) << 2 | action))
+            if action == SOURCE_COPY:
+                shift = start - copy_offset
+                target.write(encode_number(abs(shift) << 1 | (shift < 0)))
+                copy_offset = start + length
+            for source, segment_start, segment_length in segments:
+                for shift in range(0, segment_length, chunk_size):
+                    target.write(pieces.read_source(
+                        source, segment_start + shift,
+                        min(chunk_size, segment_length - shift)))
+            count += 1
+    target.flush()
+    return count
+
+
+def import_patch(buffer: Buffer, stream: BinaryIO) -> int:
+    """
+    Применяет патч к исходному файлу буфера и заменяет им содержимое
+    буфера одним действием, которое отменяется целиком. Данные патча
+    копируются потоком в файл подкачки, поэтому память расходуется
+    только на список действий.
+
+    :param buffer: Буфер, открытый на исходном файле патча.
+    :type buffer: Buffer
+    :param stream: Поток патча, открытый на чтение.
+    :type stream: BinaryIO
+    :return: Размер результата.
+    :rtype: int
+    :raises ValueError: Если патч повреждён или создан для файла
+    другого размера.
+    """
+    pieces = buffer.pieces
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError('Неизвестный формат патча')
+    if read_number(stream) != buffer.file_size:
+        raise ValueError('Патч создан для файла другого размера')
+    target_size = read_number(stream)
+    nodes: List[Piece] = []
+    offset = 0
+    copy_offset = 0
+    while offset < target_size:
+        number = read_number(stream)
+        action, length = number & 3, (number >> 2) + 1
+        if action == SOURCE_READ:
+            start = offset
+        elif action == SOURCE_COPY:
+            shift = read_number(stream)
+            start = copy_offset + (-(shift >> 1) if shift & 1
+                                   else shift >> 1)
+            copy_offset = start + length
+        elif action == TARGET_READ:
+            start, count = pieces.append_stream(stream, length)
+            if count != length:
+                raise ValueError('Патч оборван')
+            nodes.append(Piece(SCRATCH, start, length))
+            offset += length
+            continue
+        else:
+            raise ValueError('Неизвестное действие патча')
+        if start < 0 or start + length > buffer.file_size:
+            raise ValueError('Патч ссылается за пределы файла')
+        nodes.append(Piece(ORIGINAL, start, length))
+        offset += length
+    if offset != target_size:
+        raise ValueError('Длина действий не совпадает с размером')
+    with pieces.lock:
+        removed = pieces.cut(0, pieces.size)
+        pieces.paste(0, build_tree(nodes))
+    buffer.log_range(0, removed, target_size)
+    return target_size
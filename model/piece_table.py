@@ -0,0 +1,840 @@
+import mmap
+import os
+import random
+import stat
+import tempfile
+import threading
+from typing import (TYPE_CHECKING, BinaryIO, Dict, Iterator, List, Optional,
+                    Tuple, Union)
+
+from model.saving import file_descriptor, kernel_copy, read_at, write_at
+
+if TYPE_CHECKING:
+    from model.journal import Journal
+
+ORIGINAL: int = 0
+ADD: int = 1
+SCRATCH: int = 2
+FILL_BLOCK: int = 65536
+NO_ORIGIN: int = 1 << 63
+
+
+class Piece:
+    """
+    Кусок таблицы: непрерывный диапазон байтов исходного файла,
+    буфера добавлений или файла подкачки. Куски хранятся в декартовом
+    дереве по неявному ключу, поэтому каждый узел также хранит
+    суммарную длину поддерева и наименьшее смещение исходного файла
+    среди своих кусков.
+
+    :param source: Источник данных (ORIGINAL, ADD или SCRATCH).
+    :type source: int
+    :param start: Смещение куска в источнике.
+    :type start: int
+    :param length: Длина куска в байтах.
+    :type length: int
+    """
+
+    __slots__ = ('source', 'start', 'length', 'priority',
+                 'size', 'origin_start', 'left', 'right')
+
+    def __init__(self, source: int, start: int, length: int) -> None:
+        self.source: int = source
+        self.start: int = start
+        self.length: int = length
+        self.priority: float = random.random()
+        self.size: int = length
+        self.origin_start: int = start if source == ORIGINAL else NO_ORIGIN
+        self.left: Optional[Piece] = None
+        self.right: Optional[Piece] = None
+
+
+def piece_size(node: Optional[Piece]) -> int:
+    """
+    Возвращает суммарную длину поддерева кусков.
+
+    :param node: Корень поддерева.
+    :type node: Optional[Piece]
+    :return: Длина в байтах.
+    :rtype: int
+    """
+    return node.size if node is not None else 0
+
+
+def _update(node: Piece) -> None:
+    node.size = node.length
+    node.origin_start = node.start if node.source == ORIGINAL else NO_ORIGIN
+    if node.left is not None:
+        node.size += node.left.size
+        node.origin_start = min(node.origin_start, node.left.origin_start)
+    if node.right is not None:
+        node.size += node.right.size
+        node.origin_start = min(node.origin_start, node.right.origin_start)
+
+
+def _clone(node: Piece) -> Piece:
+    clone = Piece.__new__(Piece)
+    clone.source = node.source
+    clone.start = node.start
+    clone.length = node.length
+    clone.priority = node.priority
+    clone.size = node.size
+    clone.origin_start = node.origin_start
+    clone.left = node.left
+    clone.right = node.right
+    return clone
+
+
+def _merge(left: Optional[Piece], right: Optional[Piece],
+           copy: bool = False) -> Optional[Piece]:
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        if copy:
+            left = _clone(left)
+        left.right = _merge(left.right, right, copy)
+        _update(left)
+        return left
+    if copy:
+        right = _clone(right)
+    right.left = _merge(left, right.left, copy)
+    _update(right)
+    return right
+
+
+def _split(node: Optional[Piece], offset: int,
+           copy: bool = False) -> Tuple[Optional[Piece], Optional[Piece]]:
+    if node is None:
+        return None, None
+    if copy:
+        node = _clone(node)
+    left_size = piece_size(node.left)
+    if offset <= left_size:
+        left, node.left = _split(node.left, offset, copy)
+        _update(node)
+        return left, node
+    if offset >= left_size + node.length:
+        node.right, right = _split(node.right,
+                                   offset - left_size - node.length, copy)
+        _update(node)
+        return node, right
+    inner = offset - left_size
+    tail = Piece(node.source, node.start + inner, node.length - inner)
+    right = _merge(tail, node.right, copy)
+    node.length = inner
+    node.right = None
+    _update(node)
+    return node, right
+
+
+def concat_pieces(left: Optional[Piece],
+                  right: Optional[Piece]) -> Optional[Piece]:
+    """
+    Склеивает два поддерева кусков: сначала левое, затем правое.
+
+    :param left: Левое поддерево.
+    :type left: Optional[Piece]
+    :param right: Правое поддерево.
+    :type right: Optional[Piece]
+    :return: Корень склеенного дерева.
+    :rtype: Optional[Piece]
+    """
+    return _merge(left, right)
+
+
+def build_tree(nodes: List[Piece]) -> Optional[Piece]:
+    """
+    Строит дерево из кусков, заданных в логическом порядке, за
+    линейное время.
+
+    :param nodes: Куски без потомков.
+    :type nodes: List[Piece]
+    :return: Корень дерева.
+    :rtype: Optional[Piece]
+    """
+    stack: List[Piece] = []
+    last: Optional[Piece] = None
+    for node in nodes:
+        last = None
+        while stack and stack[-1].priority < node.priority:
+            last = stack.pop()
+            _update(last)
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    while stack:
+        last = stack.pop()
+        _update(last)
+    return last
+
+
+def iter_nodes(node: Optional[Piece]) -> Iterator[Piece]:
+    """
+    Обходит куски поддерева в логическом порядке.
+
+    :param node: Корень поддерева.
+    :type node: Optional[Piece]
+    :return: Итератор по кускам.
+    :rtype: Iterator[Piece]
+    """
+    stack: List[Piece] = []
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        yield node
+        node = node.right
+
+
+def map_file(file: BinaryIO) -> Optional[mmap.mmap]:
+    """
+    Отображает обычный непустой файл в память только для чтения.
+
+    :param file: Файл, открытый в двоичном режиме.
+    :type file: BinaryIO
+    :return: Отображение либо None, если файл нельзя отобразить.
+    :rtype: Optional[mmap.mmap]
+    """
+    try:
+        fileno = file.fileno()
+        info = os.fstat(fileno)
+        if not stat.S_ISREG(info.st_mode) or info.st_size == 0:
+            return None
+        return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class PieceTable:
+    """
+    Таблица кусков: логическое содержимое буфера описывается
+    последовательностью ссылок на исходный файл и на буфер добавлений,
+    который только дописывается. Вставка, удаление, замена и поиск по
+    логическому смещению выполняются за O(log кусков). Обычные файлы
+    читаются через отображение в память без копирования, остальные -
+    буферизованным чтением. Чтение и изменение защищены блокировкой,
+    а счётчик version растёт при каждом изменении, что позволяет
+    фоновым потокам читать таблицу. Если подключён журнал, он
+    получает каждую операцию. Пока взят снимок (snapshot), изменения
+    копируют узлы на пути от корня вместо изменения на месте, поэтому
+    дерево снимка можно обходить без блокировки.
+
+    :param file: Исходный файл, открытый в двоичном режиме.
+    :type file: BinaryIO
+    :param file_size: Размер исходного файла.
+    :type file_size: int
+    """
+
+    def __init__(self, file: BinaryIO, file_size: int) -> None:
+        self.file: BinaryIO = file
+        self.file_size: int = file_size
+        self.mapping: Optional[mmap.mmap] = map_file(file)
+        self.view: Optional[memoryview] = None
+        if self.mapping is not None:
+            self.view = memoryview(self.mapping)
+        self.add_buffer: bytearray = bytearray()
+        self.root: Optional[Piece] = None
+        if file_size:
+            self.root = Piece(ORIGINAL, 0, file_size)
+        self.scratch: Optional[BinaryIO] = None
+        self.scratch_path: Optional[str] = None
+        self.scratch_size: int = 0
+        self.lock: threading.RLock = threading.RLock()
+        self.version: int = 0
+        self.snapshots: int = 0
+        self.snapshot_lock: threading.Lock = threading.Lock()
+        self.journal: Optional['Journal'] = None
+
+    @property
+    def size(self) -> int:
+        """
+        Логический размер содержимого.
+
+        :return: Размер в байтах.
+        :rtype: int
+        """
+        return piece_size(self.root)
+
+    def close(self) -> None:
+        """
+        Освобождает отображение исходного файла.
+        """
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self.mapping is not None:
+            self.mapping.close()
+            self.mapping = None
+        if self.scratch is not None:
+            self.scratch.close()
+            self.scratch = None
+
+    def rebase(self, file: BinaryIO, file_size: int) -> None:
+        """
+        Переводит таблицу на новый исходный файл с тем же логическим
+        содержимым, например после сохранения через замену файла.
+        Таблица становится одним куском нового файла, а буфер добавлений
+        и файл подкачки освобождаются, поэтому журнал к этому моменту
+        должен быть отключён.
+
+        :param file: Новый исходный файл, открытый в двоичном режиме.
+        :type file: BinaryIO
+        :param file_size: Размер нового исходного файла.
+        :type file_size: int
+        """
+        with self.lock:
+            self.close()
+            self.file = file
+            self.file_size = file_size
+            self.mapping = map_file(file)
+            if self.mapping is not None:
+                self.view = memoryview(self.mapping)
+            self.add_buffer = bytearray()
+            self.root = None
+            if file_size:
+                self.root = Piece(ORIGINAL, 0, file_size)
+            self.scratch_path = None
+            self.scratch_size = 0
+            self.version += 1
+
+    def snapshot(self) -> Optional[Piece]:
+        """
+        Берёт снимок таблицы за O(1): до вызова release_snapshot узлы
+        возвращённого дерева не изменяются.
+
+        :return: Корень дерева кусков.
+        :rtype: Optional[Piece]
+        """
+        with self.lock, self.snapshot_lock:
+            self.snapshots += 1
+            return self.root
+
+    def release_snapshot(self) -> None:
+        """
+        Освобождает снимок, взятый snapshot. Блокировка таблицы не
+        берётся, поэтому снимок можно освободить из фонового потока,
+        которого дожидается поток правки.
+        """
+        with self.snapshot_lock:
+            self.snapshots -= 1
+
+    def open_scratch(self) -> BinaryIO:
+        """
+        Открывает файл подкачки: файл по пути scratch_path, если он
+        задан (его ведёт журнал правок), иначе безымянный временный
+        файл.
+
+        :return: Файл подкачки.
+        :rtype: BinaryIO
+        """
+        with self.lock:
+            if self.scratch is None:
+                if self.scratch_path is None:
+                    self.scratch = tempfile.TemporaryFile(suffix='.scratch')
+                else:
+                    mode = 'r+b' if os.path.exists(self.scratch_path) \
+                        else 'w+b'
+                    self.scratch = open(self.scratch_path, mode)
+            return self.scratch
+
+    def source_descriptor(self, source: int) -> Optional[int]:
+        """
+        Возвращает дескриптор файла, в котором лежат данные источника.
+
+        :param source: Источник данных.
+        :type source: int
+        :return: Дескриптор либо None для буфера добавлений.
+        :rtype: Optional[int]
+        """
+        if source == SCRATCH:
+            return self.open_scratch().fileno()
+        if source == ORIGINAL:
+            return file_descriptor(self.file)
+        return None
+
+    def read_source(self, source: int, start: int,
+                    length: int) -> Union[bytes, memoryview]:
+        """
+        Читает диапазон из исходного файла, буфера добавлений или файла
+        подкачки. Для отображённого файла возвращается срез без
+        копирования.
+
+        :param source: Источник данных.
+        :type source: int
+        :param start: Смещение в источнике.
+        :type start: int
+        :param length: Количество байтов.
+        :type length: int
+        :return: Прочитанные байты.
+        :rtype: Union[bytes, memoryview]
+        """
+        with self.lock:
+            if source == ADD:
+                return bytes(self.add_buffer[start:start + length])
+            if source == SCRATCH:
+                return read_at(self.open_scratch().fileno(), start, length)
+            if self.view is not None:
+                return self.view[start:start + length]
+            self.file.seek(start)
+            return self.file.read(length)
+
+    def iter_pieces(self, offset: int = 0, length: Optional[int] = None
+                    ) -> Iterator[Tuple[int, int, int]]:
+        """
+        Перебирает куски, покрывающие логический диапазон. Крайние
+        куски обрезаются по границам диапазона.
+
+        :param offset: Логическое смещение начала.
+        :type offset: int
+        :param length: Длина диапазона (по умолчанию до конца).
+        :type length: Optional[int]
+        :return: Итератор кортежей (источник, начало, длина).
+        :rtype: Iterator[Tuple[int, int, int]]
+        """
+        remaining = self.size - offset
+        if length is not None:
+            remaining = min(remaining, length)
+        stack: List[Piece] = []
+        node = self.root
+        skip = offset
+        while node is not None:
+            left_size = piece_size(node.left)
+            if skip < left_size:
+                stack.append(node)
+                node = node.left
+            elif skip < left_size + node.length:
+                stack.append(node)
+                skip -= left_size
+                break
+            else:
+                skip -= left_size + node.length
+                node = node.right
+        while stack and remaining > 0:
+            node = stack.pop()
+            count = min(node.length - skip, remaining)
+            yield node.source, node.start + skip, count
+            remaining -= count
+            skip = 0
+            child = node.right
+            while child is not None:
+                stack.append(child)
+                child = child.left
+
+    def to_physical(self, offset: int) -> Tuple[int, int]:
+        """
+        Переводит логическое смещение в источник и смещение в нём.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :return: Кортеж (источник, смещение в источнике).
+        :rtype: Tuple[int, int]
+        """
+        node = self.root
+        while node is not None:
+            left_size = piece_size(node.left)
+            if offset < left_size:
+                node = node.left
+            elif offset < left_size + node.length:
+                return node.source, node.start + offset - left_size
+            else:
+                offset -= left_size + node.length
+                node = node.right
+        raise IndexError(offset)
+
+    def to_logical(self, physical: int) -> int:
+        """
+        Переводит смещение исходного файла в логическое. Для удалённого
+        байта возвращается смещение, на котором он находился бы.
+
+        :param physical: Смещение в исходном файле.
+        :type physical: int
+        :return: Логическое смещение.
+        :rtype: int
+        """
+        node = self.root
+        offset = 0
+        while node is not None:
+            right = node.right
+            if right is not None and right.origin_start <= physical:
+                offset += piece_size(node.left) + node.length
+                node = right
+            elif node.source == ORIGINAL and node.start <= physical:
+                return (offset + piece_size(node.left)
+                        + min(physical - node.start, node.length))
+            else:
+                node = node.left
+        return 0
+
+    def read(self, offset: int, length: int) -> bytes:
+        """
+        Читает логический диапазон.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param length: Количество байтов.
+        :type length: int
+        :return: Прочитанные байты.
+        :rtype: bytes
+        """
+        with self.lock:
+            return b''.join(self.read_source(source, start, count)
+                            for source, start, count
+                            in self.iter_pieces(offset, length))
+
+    def cut(self, offset: int, length: int) -> Optional[Piece]:
+        """
+        Вырезает логический диапазон и возвращает его поддерево.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param length: Длина диапазона.
+        :type length: int
+        :return: Поддерево вырезанных кусков.
+        :rtype: Optional[Piece]
+        """
+        if length <= 0:
+            return None
+        with self.lock:
+            if self.journal is not None:
+                self.journal.cut(offset, length)
+            copy = self.snapshots > 0
+            left, rest = _split(self.root, offset, copy)
+            middle, right = _split(rest, length, copy)
+            self.root = _merge(left, right, copy)
+            self.version += 1
+        return middle
+
+    def paste(self, offset: int, node: Optional[Piece]) -> None:
+        """
+        Вставляет поддерево кусков по логическому смещению.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param node: Поддерево кусков.
+        :type node: Optional[Piece]
+        """
+        if node is None:
+            return
+        with self.lock:
+            if self.journal is not None:
+                self.journal.paste(offset, node)
+            copy = self.snapshots > 0
+            left, right = _split(self.root, offset, copy)
+            self.root = _merge(_merge(left, node, copy), right, copy)
+            self.version += 1
+
+    def insert(self, offset: int, data: bytes) -> Optional[Piece]:
+        """
+        Вставляет байты по логическому смещению, дописывая их в буфер
+        добавлений.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param data: Вставляемые байты.
+        :type data: bytes
+        :return: Новый кусок.
+        :rtype: Optional[Piece]
+        """
+        if not data:
+            return None
+        with self.lock:
+            node = Piece(ADD, self.append(data), len(data))
+            self.paste(offset, node)
+        return node
+
+    def append(self, data: bytes) -> int:
+        """
+        Дописывает байты в буфер добавлений.
+
+        :param data: Байты.
+        :type data: bytes
+        :return: Смещение дописанных байтов в буфере.
+        :rtype: int
+        """
+        with self.lock:
+            if self.journal is not None:
+                self.journal.append_data(data)
+            start = len(self.add_buffer)
+            self.add_buffer.extend(data)
+        return start
+
+    def append_stream(self, stream: BinaryIO, length: Optional[int] = None,
+                      chunk_size: int = 4194304) -> Tuple[int, int]:
+        """
+        Дописывает содержимое потока в файл подкачки порциями не больше
+        chunk_size байтов, не загружая его в память целиком. Из файла с
+        дескриптором данные копируются ядром.
+
+        :param stream: Поток, открытый на чтение в двоичном режиме.
+        :type stream: BinaryIO
+        :param length: Сколько байтов прочитать (по умолчанию до конца
+        потока).
+        :type length: Optional[int]
+        :param chunk_size: Наибольший размер порции.
+        :type chunk_size: int
+        :return: Кортеж (смещение в файле подкачки, длина).
+        :rtype: Tuple[int, int]
+        """
+        with self.lock:
+            fd = self.open_scratch().fileno()
+            start = self.scratch_size
+            copied = 0
+            source_fd = file_descriptor(stream)
+            if (source_fd is not None and length is not None
+                    and stream.seekable()):
+                position = stream.tell()
+                os.lseek(fd, start, os.SEEK_SET)
+                copied = kernel_copy(source_fd, fd, position, length)
+                stream.seek(position + copied)
+            while length is None or copied < length:
+                count = chunk_size if length is None \
+                    else min(chunk_size, length - copied)
+                chunk = stream.read(count)
+                if not chunk:
+                    break
+                write_at(fd, chunk, start + copied)
+                copied += len(chunk)
+            if self.journal is not None and copied:
+                self.journal.append_scratch(copied)
+            self.scratch_size += copied
+        return start, copied
+
+    def replace_from(self, offset: int, length: Optional[int],
+                     data: Union[bytes, memoryview, BinaryIO],
+                     size: Optional[int] = None
+                     ) -> Tuple[Optional[Piece], int]:
+        """
+        Заменяет логический диапазон байтами или содержимым потока.
+        Байты дописываются в буфер добавлений, поток - в файл подкачки,
+        а в дерево вставляется один кусок.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param length: Длина заменяемого диапазона (None - столько же,
+        сколько вставлено).
+        :type length: Optional[int]
+        :param data: Новые байты либо поток, открытый на чтение.
+        :type data: Union[bytes, memoryview, BinaryIO]
+        :param size: Сколько байтов прочитать из потока (по умолчанию до
+        конца).
+        :type size: Optional[int]
+        :return: Кортеж (поддерево вырезанных кусков, вставлено байтов).
+        :rtype: Tuple[Optional[Piece], int]
+        """
+        with self.lock:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                node = Piece(ADD, self.append(data), len(data)) \
+                    if len(data) else None
+            else:
+                start, count = self.append_stream(data, size)
+                node = Piece(SCRATCH, start, count) if count else None
+            inserted = piece_size(node)
+            removed = self.cut(offset, inserted if length is None
+                               else length)
+            self.paste(offset, node)
+        return removed, inserted
+
+    def fill(self, offset: int, length: int, count: int,
+             pattern: bytes) -> Optional[Piece]:
+        """
+        Заменяет логический диапазон повторяющимся образцом. В буфер
+        добавлений дописывается один блок образца (около FILL_BLOCK
+        байтов), а вставляемые куски ссылаются на него повторно.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param length: Длина заменяемого диапазона.
+        :type length: int
+        :param count: Длина заполнения в байтах.
+        :type count: int
+        :param pattern: Непустой образец.
+        :type pattern: bytes
+        :return: Поддерево вырезанных кусков.
+        :rtype: Optional[Piece]
+        """
+        block_size = len(pattern) * max(1, FILL_BLOCK // len(pattern))
+        if block_size > count:
+            block_size = count
+        repeats = -(-block_size // len(pattern)) if block_size else 0
+        with self.lock:
+            nodes: List[Piece] = []
+            if count:
+                start = self.append((pattern * repeats)[:block_size])
+                nodes = [Piece(ADD, start, block_size)
+                         for _ in range(count // block_size)]
+                if count % block_size:
+                    nodes.append(Piece(ADD, start, count % block_size))
+            removed = self.cut(offset, length)
+            self.paste(offset, build_tree(nodes))
+        return removed
+
+    def replace(self, offset: int, length: int,
+                data: bytes) -> Optional[Piece]:
+        """
+        Заменяет логический диапазон новыми байтами.
+
+        :param offset: Логическое смещение.
+        :type offset: int
+        :param length: Длина заменяемого диапазона.
+        :type length: int
+        :param data: Новые байты.
+        :type data: bytes
+        :return: Поддерево вырезанных кусков.
+        :rtype: Optional[Piece]
+        """
+        removed = self.cut(offset, length)
+        self.insert(offset, data)
+        return removed
+
+    def replace_ranges(self, offsets: List[int], length: int,
+                       data: bytes) -> Optional[Piece]:
+        """
+        Заменяет несколько диапазонов одинаковой длины одними и теми же
+        байтами за один проход. Новые байты дописываются в буфер
+        добавлений один раз, а весь затронутый участок перестраивается
+        целиком, поэтому его можно отменить одной записью журнала.
+
+        :param offsets: Отсортированные непересекающиеся смещения.
+        :type offsets: List[int]
+        :param length: Длина каждого заменяемого диапазона.
+        :type length: int
+        :param data: Новые байты.
+        :type data: bytes
+        :return: Поддерево вырезанного участка от первого смещения до
+        конца последнего диапазона.
+        :rtype: Optional[Piece]
+        """
+        if not offsets:
+            return None
+        with self.lock:
+            added = self.append(data)
+            return self._rebuild([(offset, length, added, len(data))
+                                  for offset in offsets])
+
+    def replace_each(self, edits: List[Tuple[int, int, bytes]]
+                     ) -> Optional[Piece]:
+        """
+        Выполняет несколько замен с разными данными за один проход.
+        Смещения относятся к содержимому до замен.
+
+        :param edits: Отсортированные непересекающиеся замены (смещение,
+        длина заменяемого диапазона, новые байты). Вставка (длина 0)
+        может стоять перед заменой с тем же смещением.
+        :type edits: List[Tuple[int, int, bytes]]
+        :return: Поддерево вырезанного участка от первого смещения до
+        конца последней замены.
+        :rtype: Optional[Piece]
+        """
+        if not edits:
+            return None
+        with self.lock:
+            added = self.append(b''.join(data for _, _, data in edits))
+            ranges = []
+            for offset, length, data in edits:
+                ranges.append((offset, length, added, len(data)))
+                added += len(data)
+            return self._rebuild(ranges)
+
+    def _rebuild(self, edits: List[Tuple[int, int, int, int]]
+                 ) -> Optional[Piece]:
+        first = edits[0][0]
+        removed = self.cut(first, edits[-1][0] + edits[-1][1] - first)
+        old = [(node.source, node.start, node.length)
+               for node in iter_nodes(removed)]
+        nodes: List[Piece] = []
+        index = 0
+        inner = 0
+
+        def take(count: int, keep: bool) -> None:
+            nonlocal index, inner
+            while count > 0:
+                source, start, size = old[index]
+                step = min(count, size - inner)
+                if keep:
+                    nodes.append(Piece(source, start + inner, step))
+                inner += step
+                count -= step
+                if inner == size:
+                    index += 1
+                    inner = 0
+
+        position = first
+        for offset, length, start, count in edits:
+            take(offset - position, True)
+            take(length, False)
+            if count:
+                nodes.append(Piece(ADD, start, count))
+            position = offset + length
+        self.paste(first, build_tree(nodes))
+        return removed
+
+    def overwritten_ranges(self) -> Optional[List[Tuple[int, int, int]]]:
+        """
+        Если все изменения - замены байтов без сдвига содержимого,
+        возвращает изменённые диапазоны.
+
+        :return: Список кортежей (смещение в файле, начало в буфере
+        добавлений, длина) либо None, если размер или смещения
+        исходных байтов изменились или часть данных лежит в файле
+        подкачки.
+        :rtype: Optional[List[Tuple[int, int, int]]]
+        """
+        if self.size != self.file_size:
+            return None
+        ranges: List[Tuple[int, int, int]] = []
+        offset = 0
+        for source, start, length in self.iter_pieces():
+            if source == SCRATCH:
+                return None
+            if source == ADD:
+                ranges.append((offset, start, length))
+            elif start != offset:
+                return None
+            offset += length
+        return ranges
+
+    def overlay(self) -> Dict[int, bytearray]:
+        """
+        Строит словарь изменений относительно исходного файла: ключ -
+        смещение исходного байта, значение - байты, показываемые на его
+        месте (пустые, если байт удалён).
+
+        :return: Словарь изменений.
+        :rtype: Dict[int, bytearray]
+        """
+        result: Dict[int, bytearray] = {}
+        expected = 0
+        pending = bytearray()
+        for source, start, length in self.iter_pieces():
+            if source != ORIGINAL:
+                pending += self.read_source(source, start, length)
+                continue
+            self._attach(result, expected, start, pending)
+            pending = bytearray()
+            expected = start + length
+        self._attach(result, expected, self.file_size, pending)
+        return result
+
+    def _attach(self, result: Dict[int, bytearray], expected: int,
+                start: int, pending: bytearray) -> None:
+        if start > expected:
+            for i in range(expected, start):
+                shift = i - expected
+                result[i] = pending[shift:shift + 1]
+            result[start - 1] += pending[start - expected:]
+        elif pending:
+            if expected > 0:
+                slot = expected - 1
+                result[slot] = (result.get(slot)
+                                or bytearray(self.read_source(ORIGINAL,
+                                                              slot, 1)))
+                result[slot] += pending
+            else:
+                first = b''
+                if self.file_size:
+                    first = self.read_source(ORIGINAL, 0, 1)
+                result[0] = pending + first
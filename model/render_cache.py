@@ -0,0 +1,109 @@
+import bisect
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+
+class RowCache:
+    """
+    LRU-кэш отрисованных строк. Ключ - логический номер строки, каждая
+    запись помнит поколение правок, при котором она построена. Правка
+    повышает поколение только для затронутого диапазона строк, поэтому
+    остальные строки продолжают браться из кэша.
+
+    :param capacity: Наибольшее количество строк в кэше.
+    :type capacity: int
+    """
+
+    def __init__(self, capacity: int = 4096) -> None:
+        self.capacity: int = capacity
+        self.rows: 'OrderedDict[int, Tuple[int, str, str]]' = OrderedDict()
+        self.generation: int = 0
+        self.starts: List[int] = []
+        self.generations: List[int] = []
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def row_generation(self, row: int) -> int:
+        """
+        Возвращает поколение последней правки, затронувшей строку.
+
+        :param row: Номер строки.
+        :type row: int
+        :return: Поколение.
+        :rtype: int
+        """
+        index = bisect.bisect_right(self.starts, row) - 1
+        return self.generations[index] if index >= 0 else 0
+
+    def invalidate(self, first: int, last: Optional[int] = None) -> None:
+        """
+        Отмечает строки как изменённые.
+
+        :param first: Первая изменённая строка.
+        :type first: int
+        :param last: Последняя изменённая строка (по умолчанию все
+        строки до конца).
+        :type last: Optional[int]
+        """
+        self.generation += 1
+        low = bisect.bisect_left(self.starts, first)
+        if last is None:
+            self.starts[low:] = [first]
+            self.generations[low:] = [self.generation]
+            return
+        after = self.row_generation(last + 1)
+        high = bisect.bisect_right(self.starts, last + 1)
+        self.starts[low:high] = [first, last + 1]
+        self.generations[low:high] = [self.generation, after]
+
+    def __contains__(self, row: int) -> bool:
+        """
+        Проверяет, есть ли в кэше актуальная строка, не меняя порядок
+        вытеснения и счётчики.
+
+        :param row: Номер строки.
+        :type row: int
+        :return: True, если строка актуальна.
+        :rtype: bool
+        """
+        entry = self.rows.get(row)
+        return entry is not None and entry[0] >= self.row_generation(row)
+
+    def get(self, row: int) -> Optional[Tuple[str, str]]:
+        """
+        Возвращает отрисованную строку, если она актуальна.
+
+        :param row: Номер строки.
+        :type row: int
+        :return: Шестнадцатеричное и текстовое представления строки.
+        :rtype: Optional[Tuple[str, str]]
+        """
+        entry = self.rows.get(row)
+        if entry is None or entry[0] < self.row_generation(row):
+            self.misses += 1
+            return None
+        self.rows.move_to_end(row)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, row: int, hex_row: str, text_row: str) -> None:
+        """
+        Сохраняет отрисованную строку.
+
+        :param row: Номер строки.
+        :type row: int
+        :param hex_row: Шестнадцатеричное представление.
+        :type hex_row: str
+        :param text_row: Текстовое представление.
+        :type text_row: str
+        """
+        self.rows[row] = (self.generation, hex_row, text_row)
+        self.rows.move_to_end(row)
+        if len(self.rows) > self.capacity:
+            self.rows.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Очищает кэш.
+        """
+        self.rows.clear()
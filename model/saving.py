@@ -0,0 +1,146 @@
+import os
+import time
+from typing import BinaryIO, Optional
+
+
+class WriteStats:
+    """
+    Статистика записи буфера в файл.
+
+    :ivar bytes_written: Всего записано байтов.
+    :ivar bytes_copied: Из них скопировано ядром без чтения в память.
+    :ivar elapsed: Время записи в секундах.
+    """
+
+    def __init__(self) -> None:
+        self.bytes_written: int = 0
+        self.bytes_copied: int = 0
+        self.elapsed: float = 0.0
+        self._started: float = time.perf_counter()
+
+    def finish(self) -> 'WriteStats':
+        """
+        Фиксирует время окончания записи.
+
+        :return: Эта же статистика.
+        :rtype: WriteStats
+        """
+        self.elapsed = time.perf_counter() - self._started
+        return self
+
+    @property
+    def throughput(self) -> float:
+        """
+        Скорость записи.
+
+        :return: Байтов в секунду.
+        :rtype: float
+        """
+        if self.elapsed <= 0:
+            return 0.0
+        return self.bytes_written / self.elapsed
+
+
+def file_descriptor(file: BinaryIO) -> Optional[int]:
+    """
+    Возвращает дескриптор файла, если он есть.
+
+    :param file: Файловый объект.
+    :type file: BinaryIO
+    :return: Дескриптор либо None.
+    :rtype: Optional[int]
+    """
+    try:
+        return file.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def kernel_copy(source_fd: int, target_fd: int,
+                offset: int, length: int) -> int:
+    """
+    Копирует диапазон между файлами средствами ядра
+    (copy_file_range или sendfile), не загружая данные в память.
+    Запись идёт с текущей позиции целевого дескриптора.
+
+    :param source_fd: Дескриптор исходного файла.
+    :type source_fd: int
+    :param target_fd: Дескриптор целевого файла.
+    :type target_fd: int
+    :param offset: Смещение в исходном файле.
+    :type offset: int
+    :param length: Количество байтов.
+    :type length: int
+    :return: Сколько байтов удалось скопировать.
+    :rtype: int
+    """
+    copied = 0
+    for name in ('copy_file_range', 'sendfile'):
+        function = getattr(os, name, None)
+        if function is None:
+            continue
+        try:
+            while copied < length:
+                if name == 'copy_file_range':
+                    count = function(source_fd, target_fd,
+                                     length - copied, offset + copied)
+                else:
+                    count = function(target_fd, source_fd,
+                                     offset + copied, length - copied)
+                if count == 0:
+                    break
+                copied += count
+        except OSError:
+            continue
+        break
+    return copied
+
+
+def read_at(fd: int, offset: int, length: int) -> bytes:
+    """
+    Читает диапазон по смещению, не меняя позицию дескриптора.
+
+    :param fd: Дескриптор файла, открытого на чтение.
+    :type fd: int
+    :param offset: Смещение в файле.
+    :type offset: int
+    :param length: Количество байтов.
+    :type length: int
+    :return: Прочитанные байты (меньше length у конца файла).
+    :rtype: bytes
+    """
+    chunks = []
+    while length > 0:
+        if hasattr(os, 'pread'):
+            chunk = os.pread(fd, length, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            chunk = os.read(fd, length)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        offset += len(chunk)
+        length -= len(chunk)
+    return b''.join(chunks)
+
+
+def write_at(fd: int, data: bytes, offset: int) -> None:
+    """
+    Записывает данные по смещению, не меняя остальной файл.
+
+    :param fd: Дескриптор файла, открытого на запись.
+    :type fd: int
+    :param data: Данные.
+    :type data: bytes
+    :param offset: Смещение в файле.
+    :type offset: int
+    """
+    view = memoryview(data)
+    while view:
+        if hasattr(os, 'pwrite'):
+            count = os.pwrite(fd, view, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            count = os.write(fd, view)
+        view = view[count:]
+        offset += count
@@ -0,0 +1,476 @@
+import bisect
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, List, Optional, Tuple
+
+from model.model import Buffer
+from model.piece_table import ORIGINAL, PieceTable, map_file
+
+
+def find_in(data: bytes, pattern: bytes, limit: int, base: int = 0
+            ) -> List[int]:
+    """
+    Ищет все вхождения образца, начинающиеся до limit.
+
+    :param data: Данные для поиска.
+    :type data: bytes
+    :param pattern: Искомые байты.
+    :type pattern: bytes
+    :param limit: Граница начала вхождения.
+    :type limit: int
+    :param base: Смещение, прибавляемое к результатам.
+    :type base: int
+    :return: Смещения вхождений.
+    :rtype: List[int]
+    """
+    found = []
+    index = data.find(pattern)
+    while index != -1 and index < limit:
+        found.append(base + index)
+        index = data.find(pattern, index + 1)
+    return found
+
+
+def scan_range(pieces: PieceTable, start: int, stop: int,
+               pattern: bytes) -> List[int]:
+    """
+    Ищет вхождения, начинающиеся в логическом диапазоне [start, stop).
+
+    :param pieces: Таблица кусков.
+    :type pieces: PieceTable
+    :param start: Начало диапазона.
+    :type start: int
+    :param stop: Конец диапазона.
+    :type stop: int
+    :param pattern: Искомые байты.
+    :type pattern: bytes
+    :return: Логические смещения вхождений.
+    :rtype: List[int]
+    """
+    data = pieces.read(start, stop - start + len(pattern) - 1)
+    return find_in(data, pattern, stop - start, start)
+
+
+def scan_file(file_name: str, start: int, stop: int, limit: int,
+              pattern: bytes) -> List[int]:
+    """
+    Ищет в файле вхождения, начинающиеся в [start, stop) и
+    заканчивающиеся не дальше limit. Выполняется в процессе пула: файл
+    отображается в память заново, страницы делятся между процессами
+    через файловый кэш.
+
+    :param file_name: Имя файла.
+    :type file_name: str
+    :param start: Начало диапазона.
+    :type start: int
+    :param stop: Конец диапазона.
+    :type stop: int
+    :param limit: Граница конца вхождения.
+    :type limit: int
+    :param pattern: Искомые байты.
+    :type pattern: bytes
+    :return: Смещения вхождений в файле.
+    :rtype: List[int]
+    """
+    end = min(stop + len(pattern) - 1, limit)
+    with open(file_name, 'rb') as file:
+        mapping = map_file(file)
+        if mapping is None:
+            file.seek(start)
+            return find_in(file.read(end - start), pattern,
+                           stop - start, start)
+        with mapping:
+            found = []
+            index = mapping.find(pattern, start, end)
+            while index != -1:
+                found.append(index)
+                index = mapping.find(pattern, index + 1, end)
+            return found
+
+
+def find_all(pieces: PieceTable, file_name: str, pattern: bytes,
+             chunk_size: int = 67108864,
+             workers: Optional[int] = None,
+             cancelled: Optional[threading.Event] = None) -> List[int]:
+    """
+    Находит все вхождения образца в логическом содержимом с помощью
+    пула процессов. Участки исходного файла внутри кусков делятся на
+    перекрывающиеся порции и просматриваются параллельно, а стыки
+    кусков и добавленные данные - в текущем процессе. Содержимое не
+    больше одной порции просматривается без пула. Отмена
+    проверяется между порциями: пул закрывается без ожидания, а
+    неначатые порции снимаются.
+
+    :param pieces: Таблица кусков.
+    :type pieces: PieceTable
+    :param file_name: Имя исходного файла.
+    :type file_name: str
+    :param pattern: Искомые байты.
+    :type pattern: bytes
+    :param chunk_size: Размер порции для одного процесса.
+    :type chunk_size: int
+    :param workers: Количество процессов (по умолчанию по числу
+    ядер).
+    :type workers: Optional[int]
+    :param cancelled: Событие отмены поиска.
+    :type cancelled: Optional[threading.Event]
+    :return: Отсортированные логические смещения (неполные, если поиск
+    отменён).
+    :rtype: List[int]
+    """
+    if not pattern:
+        return []
+    cancelled = cancelled or threading.Event()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or pieces.size <= chunk_size:
+        found = []
+        for start in range(0, pieces.size, chunk_size):
+            if cancelled.is_set():
+                break
+            found.extend(scan_range(pieces, start,
+                                    min(start + chunk_size, pieces.size),
+                                    pattern))
+        return found
+    size = len(pattern)
+    tasks: List[Tuple[str, int, int, int, bytes]] = []
+    shifts: List[int] = []
+    local: List[List[int]] = []
+    offset = 0
+    with pieces.lock:
+        layout = list(pieces.iter_pieces())
+    for source, start, length in layout:
+        if source == ORIGINAL and length >= size:
+            for chunk in range(start, start + length - size + 1,
+                               chunk_size):
+                tasks.append((file_name, chunk,
+                              min(chunk + chunk_size,
+                                  start + length - size + 1),
+                              start + length, pattern))
+                shifts.append(offset - start)
+            local.append([offset + length - size + 1, offset + length])
+        else:
+            local.append([offset - size + 1, offset + length])
+        offset += length
+
+    found: List[int] = []
+    for start, stop in Searcher.merge_ranges(
+            [[max(0, start), stop] for start, stop in local]):
+        if cancelled.is_set():
+            return found
+        found.extend(scan_range(pieces, start, stop, pattern))
+    if tasks and not cancelled.is_set():
+        context = multiprocessing.get_context('spawn')
+        executor = ProcessPoolExecutor(workers, mp_context=context)
+        try:
+            futures = {executor.submit(scan_file, *task): shift
+                       for task, shift in zip(tasks, shifts)}
+            while futures and not cancelled.is_set():
+                done, _ = wait(futures, 0.05, FIRST_COMPLETED)
+                for future in done:
+                    shift = futures.pop(future)
+                    found.extend(index + shift for index in future.result())
+        finally:
+            executor.shutdown(wait=not cancelled.is_set(),
+                              cancel_futures=True)
+    found.sort()
+    return found
+
+
+def replace_all(buffer: Buffer, pattern: bytes, replacement: bytes,
+                workers: Optional[int] = 1,
+                chunk_size: int = 67108864,
+                found: Optional[List[int]] = None) -> int:
+    """
+    Заменяет все непересекающиеся вхождения образца одним действием.
+    Сначала находятся все вхождения (см. find_all), если они не
+    переданы готовыми, затем они применяются к буферу пакетом с одной
+    записью в журнале.
+
+    :param buffer: Буфер.
+    :type buffer: Buffer
+    :param pattern: Искомые байты.
+    :type pattern: bytes
+    :param replacement: Новые байты.
+    :type replacement: bytes
+    :param workers: Количество процессов для поиска.
+    :type workers: Optional[int]
+    :param chunk_size: Размер порции поиска.
+    :type chunk_size: int
+    :param found: Отсортированные смещения всех вхождений, например
+    результаты завершённого Searcher.
+    :type found: Optional[List[int]]
+    :return: Количество замен.
+    :rtype: int
+    """
+    if found is None:
+        found = find_all(buffer.pieces, buffer.file_name, pattern,
+                         chunk_size, workers)
+    offsets = []
+    end = 0
+    for offset in found:
+        if offset >= end:
+            offsets.append(offset)
+            end = offset + len(pattern)
+    buffer.replace_ranges(offsets, len(pattern), replacement)
+    return len(offsets)
+
+
+class Searcher:
+    """
+    Фоновый поиск образца по логическому содержимому буфера.
+
+    Поиск идёт в отдельном потоке порциями по chunk_size байтов и
+    может быть отменён. Найденные смещения хранятся отсортированными,
+    после каждой порции вызывается on_found. При изменении буфера
+    результаты сдвигаются, а заново просматривается только окрестность
+    изменённого диапазона. Первый полный просмотр большого буфера
+    выполняется пулом из workers процессов (см. find_all).
+
+    :param buffer: Буфер для поиска.
+    :type buffer: Buffer
+    :param on_found: Функция, вызываемая из потока поиска со списком
+    новых смещений.
+    :type on_found: Optional[Callable[[List[int]], None]]
+    :param chunk_size: Размер порции чтения.
+    :type chunk_size: int
+    :param workers: Количество процессов для полного просмотра (1 -
+    без пула, по умолчанию по числу ядер).
+    :type workers: Optional[int]
+    :param parallel_chunk_size: Размер порции для одного процесса.
+    :type parallel_chunk_size: int
+    """
+
+    def __init__(self, buffer: Buffer,
+                 on_found: Optional[Callable[[List[int]], None]] = None,
+                 chunk_size: int = 1048576,
+                 workers: Optional[int] = None,
+                 parallel_chunk_size: int = 67108864) -> None:
+        self.buffer: Buffer = buffer
+        self.pieces = buffer.pieces
+        self.on_found: Optional[Callable[[List[int]], None]] = on_found
+        self.chunk_size: int = chunk_size
+        self.workers: int = workers or os.cpu_count() or 1
+        self.parallel_chunk_size: int = parallel_chunk_size
+        self.full_scan: bool = False
+        self.pattern: bytes = b''
+        self.results: List[int] = []
+        self.pending: List[List[int]] = []
+        self.lock: threading.Lock = threading.Lock()
+        self.synced_version: int = self.pieces.version
+        self.cancelled: threading.Event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        buffer.logger.listeners.append(self.on_change)
+
+    def search(self, pattern: bytes) -> None:
+        """
+        Начинает новый поиск по всему буферу.
+
+        :param pattern: Искомые байты.
+        :type pattern: bytes
+        """
+        self.cancel()
+        with self.lock:
+            self.pattern = pattern
+            self.results = []
+            self.pending = [[0, self.pieces.size]] if pattern else []
+            self.full_scan = (self.workers > 1 and self.pieces.size
+                              > self.parallel_chunk_size)
+        self.start()
+
+    def start(self) -> None:
+        """
+        Запускает поток поиска, если есть непросмотренные диапазоны.
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+        if not self.pending:
+            return
+        self.cancelled.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def cancel(self) -> None:
+        """
+        Останавливает поток поиска. Непросмотренные диапазоны
+        сохраняются до следующего запуска.
+        """
+        self.cancelled.set()
+        self.join()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """
+        Ожидает завершения потока поиска.
+
+        :param timeout: Наибольшее время ожидания в секундах.
+        :type timeout: Optional[float]
+        """
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def close(self) -> None:
+        """
+        Останавливает поиск и отписывается от изменений буфера.
+        """
+        self.cancel()
+        if self.on_change in self.buffer.logger.listeners:
+            self.buffer.logger.listeners.remove(self.on_change)
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Идёт ли сейчас поиск.
+
+        :return: True, если поток поиска работает.
+        :rtype: bool
+        """
+        return self.thread is not None and self.thread.is_alive()
+
+    def complete_results(self, pattern: bytes) -> Optional[List[int]]:
+        """
+        Возвращает все найденные смещения, если поиск этого образца
+        завершён и буфер с тех пор не менялся.
+
+        :param pattern: Искомые байты.
+        :type pattern: bytes
+        :return: Отсортированные смещения либо None.
+        :rtype: Optional[List[int]]
+        """
+        with self.lock:
+            if (pattern != self.pattern or self.pending or self.full_scan
+                    or self.synced_version != self.pieces.version):
+                return None
+            return list(self.results)
+
+    def get_results(self, start: int = 0,
+                    count: Optional[int] = None) -> List[int]:
+        """
+        Возвращает часть найденных смещений.
+
+        :param start: Номер первого результата.
+        :type start: int
+        :param count: Количество результатов (по умолчанию все).
+        :type count: Optional[int]
+        :return: Отсортированные смещения.
+        :rtype: List[int]
+        """
+        with self.lock:
+            if count is None:
+                return self.results[start:]
+            return self.results[start:start + count]
+
+    def on_change(self, offset: int, removed: int, inserted: int) -> None:
+        """
+        Учитывает изменение буфера: удаляет и сдвигает результаты и
+        добавляет окрестность изменения к непросмотренным диапазонам.
+
+        :param offset: Логическое смещение изменения.
+        :type offset: int
+        :param removed: Количество удалённых байтов.
+        :type removed: int
+        :param inserted: Количество вставленных байтов.
+        :type inserted: int
+        """
+        with self.lock:
+            self.synced_version = self.pieces.version
+            if not self.pattern:
+                return
+            delta = inserted - removed
+            end = offset + removed
+            first = max(0, offset - len(self.pattern) + 1)
+
+            low = bisect.bisect_left(self.results, first)
+            high = bisect.bisect_left(self.results, end)
+            self.results[low:] = [result + delta
+                                  for result in self.results[high:]]
+
+            def shift(position: int) -> int:
+                if position <= offset:
+                    return position
+                if position >= end:
+                    return position + delta
+                return offset
+
+            ranges = [[shift(start), shift(stop)]
+                      for start, stop in self.pending]
+            ranges.append([first, offset + inserted])
+            self.pending = self.merge_ranges(ranges)
+
+    @staticmethod
+    def merge_ranges(ranges: List[List[int]]) -> List[List[int]]:
+        """
+        Сортирует диапазоны и объединяет пересекающиеся.
+
+        :param ranges: Диапазоны [начало, конец).
+        :type ranges: List[List[int]]
+        :return: Непересекающиеся диапазоны.
+        :rtype: List[List[int]]
+        """
+        merged: List[List[int]] = []
+        for start, stop in sorted(ranges):
+            if start >= stop:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], stop)
+            else:
+                merged.append([start, stop])
+        return merged
+
+    def run_parallel(self) -> None:
+        """
+        Выполняет полный просмотр пулом процессов. Если во время
+        просмотра буфер изменился, результат отбрасывается и поиск
+        продолжается порциями. Отменённый просмотр начнётся заново при
+        следующем запуске.
+        """
+        with self.lock:
+            self.full_scan = False
+            version = self.synced_version
+            pattern = self.pattern
+        found = find_all(self.pieces, self.buffer.file_name, pattern,
+                         self.parallel_chunk_size, self.workers,
+                         self.cancelled)
+        with self.lock:
+            if self.cancelled.is_set():
+                self.full_scan = pattern == self.pattern
+                return
+            if (version != self.synced_version
+                    or version != self.pieces.version
+                    or pattern != self.pattern):
+                return
+            self.results = found
+            self.pending = []
+        if found and self.on_found is not None:
+            self.on_found(found)
+
+    def run(self) -> None:
+        """
+        Тело потока поиска.
+        """
+        if self.full_scan:
+            self.run_parallel()
+        while not self.cancelled.is_set():
+            with self.lock:
+                if not self.pending:
+                    return
+                start, stop = self.pending[0]
+                stop = min(stop, start + self.chunk_size)
+                pattern = self.pattern
+            with self.pieces.lock:
+                version = self.pieces.version
+                found = scan_range(self.pieces, start, stop, pattern)
+            with self.lock:
+                if (version != self.synced_version
+                        or pattern != self.pattern
+                        or not self.pending
+                        or self.pending[0][0] != start):
+                    self.cancelled.wait(0.01)
+                    continue
+                self.pending[0][0] = stop
+                if stop >= self.pending[0][1]:
+                    self.pending.pop(0)
+                position = bisect.bisect_left(self.results, start)
+                self.results[position:position] = found
+            if found and self.on_found is not None:
+                self.on_found(found)
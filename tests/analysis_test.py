@@ -0,0 +1,160 @@
+import math
+import os
+import tempfile
+import unittest
+
+from model import Buffer
+from model import analysis
+from model.analysis import Minimap, block_stats, many_block_stats
+
+
+class TestBlockStats(unittest.TestCase):
+    def test_uniform(self):
+        entropy, zeros, text, control, high = block_stats(bytes(range(256)))
+        self.assertAlmostEqual(entropy, 8.0)
+        self.assertAlmostEqual(zeros, 1 / 256)
+        self.assertAlmostEqual(text, 98 / 256)
+        self.assertAlmostEqual(control, 29 / 256)
+        self.assertAlmostEqual(high, 0.5)
+
+    def test_classes(self):
+        self.assertEqual(block_stats(bytes(100)), (0.0, 1.0, 0.0, 0.0, 0.0))
+        entropy, _, text, _, _ = block_stats(b'ab' * 50)
+        self.assertAlmostEqual(entropy, 1.0)
+        self.assertAlmostEqual(text, 1.0)
+        entropy = block_stats(b'aaab')[0]
+        self.assertAlmostEqual(entropy, -(0.75 * math.log2(0.75)
+                                          + 0.25 * math.log2(0.25)))
+
+    @unittest.skipIf(analysis.numpy is None, 'NumPy не установлен')
+    def test_numpy_matches_fallback(self):
+        data = os.urandom(5000) + bytes(3000) + b'text ' * 900
+        with_numpy = many_block_stats(data, 1024)
+        numpy_module, analysis.numpy = analysis.numpy, None
+        try:
+            without_numpy = many_block_stats(data, 1024)
+        finally:
+            analysis.numpy = numpy_module
+        self.assertEqual(len(with_numpy), len(without_numpy))
+        for stats, other in zip(with_numpy, without_numpy):
+            for value, expected in zip(stats, other):
+                self.assertAlmostEqual(value, expected, places=9)
+
+    def test_large_block_is_exact(self):
+        data = bytes(range(256)) * 1024 + b'a' * 65536
+        entropy, zeros, text, _, high = block_stats(data)
+        share = 1024 / len(data)
+        self.assertAlmostEqual(zeros, share)
+        self.assertAlmostEqual(high, 128 * share)
+        self.assertAlmostEqual(text, 95 * share + 3 * share + 0.2)
+        self.assertAlmostEqual(entropy, -(255 * share * math.log2(share)
+                                          + (share + 0.2)
+                                          * math.log2(share + 0.2)))
+
+    def test_many_blocks(self):
+        data = bytes(64) + b'text' * 16 + bytes(range(256))[:40]
+        result = many_block_stats(data, 64)
+        self.assertEqual(len(result), 3)
+        for index, stats in enumerate(result):
+            expected = block_stats(data[index * 64:(index + 1) * 64])
+            for value, other in zip(stats, expected):
+                self.assertAlmostEqual(value, other, places=5)
+
+
+class TestMinimap(unittest.TestCase):
+    def setUp(self):
+        test_file = tempfile.NamedTemporaryFile(delete=False)
+        test_file.write(bytes(1024) + b'hello world ' * 100
+                        + bytes(range(256)) * 4)
+        test_file.close()
+        self.file_name = test_file.name
+        self.buffer = Buffer(self.file_name)
+
+    def tearDown(self):
+        self.buffer.close()
+        for name in (self.file_name, self.file_name + '.minimap'):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def expected(self, minimap):
+        data = self.buffer.pieces.read(0, self.buffer.get_size())
+        return [block_stats(data[start:start + minimap.block_size])
+                for start in range(0, len(data), minimap.block_size)]
+
+    def check(self, minimap):
+        minimap.join()
+        self.assertFalse(any(minimap.stale))
+        self.assertEqual(len(minimap.stats), len(self.expected(minimap)))
+        for stats, expected in zip(minimap.stats, self.expected(minimap)):
+            for value, other in zip(stats, expected):
+                self.assertAlmostEqual(value, other, places=5)
+
+    def test_background_analysis(self):
+        progress = []
+        minimap = Minimap(self.buffer, block_size=256, read_size=1024,
+                          on_progress=lambda: progress.append(1))
+        minimap.start()
+        self.check(minimap)
+        self.assertEqual(len(progress), 4)
+        self.assertEqual(len(minimap.rows(2)), 2)
+        self.assertEqual(minimap.rows(13)[0][1], 1.0)
+        self.assertEqual(minimap.offset_at(1, 2), 1536)
+        minimap.close()
+
+    def test_edits(self):
+        minimap = Minimap(self.buffer, block_size=256, read_size=1024)
+        minimap.start()
+        minimap.join()
+        self.buffer.overwrite_range(300, b'\xff' * 10)
+        self.check(minimap)
+        self.buffer.insert_range(10, b'text' * 128)
+        self.check(minimap)
+        self.buffer.delete_range(0, 768)
+        self.check(minimap)
+        self.buffer.logger.undo()
+        self.check(minimap)
+        minimap.close()
+
+    def test_shift_recomputes_few_blocks(self):
+        progress = []
+        minimap = Minimap(self.buffer, block_size=256, read_size=256,
+                          on_progress=lambda: progress.append(1))
+        minimap.start()
+        minimap.join()
+        self.assertEqual(len(progress), 13)
+        self.buffer.insert_range(1030, b'!' * 256)
+        minimap.join()
+        self.assertLessEqual(len(progress), 13 + 2)
+        self.check(minimap)
+        self.buffer.delete_range(300, 512)
+        minimap.join()
+        self.assertLessEqual(len(progress), 13 + 4)
+        self.check(minimap)
+        count = len(progress)
+        self.buffer.insert_range(1030, b'!' * 10)
+        minimap.join()
+        self.assertEqual(len(progress), count + 8)
+        self.check(minimap)
+        minimap.close()
+
+    def test_index(self):
+        minimap = Minimap(self.buffer, block_size=256)
+        minimap.start()
+        minimap.join()
+        minimap.close()
+        self.assertTrue(os.path.exists(self.file_name + '.minimap'))
+        cached = Minimap(self.buffer, block_size=256)
+        self.assertFalse(any(cached.stale))
+        self.assertEqual(cached.stats, minimap.stats)
+        cached.close()
+        other = Minimap(self.buffer, block_size=512)
+        self.assertTrue(all(other.stale))
+        other.close()
+        self.buffer.overwrite_range(0, b'x')
+        edited = Minimap(self.buffer, block_size=256)
+        self.assertTrue(all(edited.stale))
+        edited.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from model.batch import parse_script, process_file, run_batch
+
+SCRIPT = '''
+# правки
+write 0x0 aabb
+insert 4 @{insert}
+delete 0x10 2
+fill 20 3 ff
+replace 0506 07
+'''
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.files = []
+        for index in range(3):
+            name = os.path.join(self.directory.name, f'{index}.bin')
+            with open(name, 'wb') as file:
+                file.write(bytes(range(32)))
+            self.files.append(name)
+        self.insert_name = os.path.join(self.directory.name, 'insert')
+        with open(self.insert_name, 'wb') as file:
+            file.write(b'INS')
+        self.edits = parse_script(
+            SCRIPT.format(insert=self.insert_name).splitlines())
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def expected(self):
+        data = bytearray(range(32))
+        data[0:2] = b'\xaa\xbb'
+        data[4:4] = b'INS'
+        del data[16:18]
+        data[20:23] = b'\xff' * 3
+        return bytes(data).replace(b'\x05\x06', b'\x07')
+
+    def test_parse_errors(self):
+        for line in ('write 1', 'delete x 2', 'fill 0 1 zz', 'jump 1 2'):
+            with self.assertRaises(ValueError):
+                parse_script([line])
+
+    def test_process_file(self):
+        result = process_file(self.files[0], self.edits)
+        self.assertIsNone(result.error)
+        self.assertEqual(result.edits, 5)
+        with open(self.files[0], 'rb') as file:
+            self.assertEqual(file.read(), self.expected())
+
+    def test_run_batch(self):
+        output = os.path.join(self.directory.name, 'out')
+        os.mkdir(output)
+        results = list(run_batch(self.files, self.edits, output, jobs=2))
+        self.assertEqual(sorted(result.file_name for result in results),
+                         self.files)
+        for result in results:
+            self.assertIsNone(result.error)
+            with open(result.target, 'rb') as file:
+                self.assertEqual(file.read(), self.expected())
+        with open(self.files[0], 'rb') as file:
+            self.assertEqual(file.read(), bytes(range(32)))
+
+    def test_missing_file(self):
+        result = process_file(self.files[0] + '.missing', self.edits)
+        self.assertIsNotNone(result.error)
+
+    def test_no_gui_imports(self):
+        code = ('import sys, batch, model.batch; '
+                'sys.exit(any(name.startswith("PyQt5") '
+                'for name in sys.modules))')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(subprocess.call([sys.executable, '-c', code],
+                                         cwd=root), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
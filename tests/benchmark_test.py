@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks.hot_paths import (BENCHMARKS, compare_results,
+                                  generate_file, parse_limits, parse_size,
+                                  replay_history, run_case)
+from model.model import Buffer
+
+
+class TestHotPaths(unittest.TestCase):
+    def test_parse_size(self):
+        self.assertEqual(parse_size('4096'), 4096)
+        self.assertEqual(parse_size('64K'), 65536)
+        self.assertEqual(parse_size('1.5M'), 1572864)
+        self.assertEqual(parse_size('10gb'), 10 << 30)
+        with self.assertRaises(ValueError):
+            parse_size('many')
+        with self.assertRaises(ValueError):
+            parse_limits(['unknown=1'])
+
+    def test_compare(self):
+        baseline = [{'benchmark': 'undo', 'size': 1, 'density': 0,
+                     'per_op': 1.0},
+                    {'benchmark': 'redo', 'size': 1, 'density': 0,
+                     'per_op': 1.0}]
+        results = [dict(baseline[0], per_op=1.4),
+                   dict(baseline[1], per_op=1.4),
+                   dict(baseline[1], size=2)]
+        comparisons = compare_results(results, baseline, 0.25,
+                                      {'redo': 0.5})
+        self.assertEqual([item['regression'] for item in comparisons],
+                         [True, False])
+
+    def test_run(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            file_name = os.path.join(work_dir, 'data.bin')
+            generate_file(file_name, 65536, 0, 4096)
+            self.assertEqual(os.path.getsize(file_name), 65536)
+            results = run_case(file_name, 65536, 32, 5, 1,
+                               list(BENCHMARKS), work_dir, 0)
+            self.assertEqual(os.listdir(work_dir), ['data.bin'])
+        by_name = {result['benchmark']: result for result in results}
+        self.assertEqual(set(by_name), set(BENCHMARKS))
+        self.assertEqual(by_name['edit']['ops'], 2)
+        self.assertEqual(by_name['update_data']['ops'], 5)
+        self.assertEqual(by_name['undo']['ops'], by_name['redo']['ops'])
+        self.assertLessEqual(by_name['undo']['ops'], 2)
+        for result in results:
+            self.assertGreaterEqual(result['per_op'], 0)
+            self.assertEqual(result['edits'], 2)
+
+    def test_history_records(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            file_name = os.path.join(work_dir, 'data.bin')
+            generate_file(file_name, 4096, 0)
+            buffer = Buffer(file_name)
+            buffer.overwrite_range(0, b'a')
+            buffer.overwrite_range(1, b'b')
+            buffer.logger.seal()
+            buffer.overwrite_range(100, b'c')
+            records = len(buffer.logger.undo_stack)
+            _, count = replay_history(buffer, True)
+            self.assertEqual(count, records)
+            self.assertFalse(buffer.logger.undo_stack)
+            _, count = replay_history(buffer, False)
+            self.assertEqual(count, records)
+            buffer.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import random
+import tempfile
+import unittest
+import zlib
+
+from model import Buffer
+from model.checksum import CrcShift, HashTree
+
+
+class TestHashTree(unittest.TestCase):
+    def setUp(self):
+        test_file = tempfile.NamedTemporaryFile(delete=False)
+        test_file.write(bytes(range(256)) * 40)
+        test_file.close()
+        self.file_name = test_file.name
+        self.buffer = Buffer(self.file_name)
+        self.tree = HashTree(self.buffer, chunk_size=512, workers=2)
+
+    def tearDown(self):
+        self.tree.close()
+        self.buffer.close()
+        os.remove(self.file_name)
+
+    def content(self):
+        return self.buffer.pieces.read(0, self.buffer.get_size())
+
+    def expected_digest(self, data):
+        starts = [0]
+        for length in self.tree.lengths:
+            starts.append(starts[-1] + length)
+        self.assertEqual(starts[-1], len(data))
+        level = [hashlib.sha256(b'\x00' + data[start:stop]).digest()
+                 for start, stop in zip(starts, starts[1:])]
+        while len(level) > 1:
+            level = [hashlib.sha256(b'\x01' + level[index]
+                                    + level[index + 1]).digest()
+                     if index + 1 < len(level) else level[index]
+                     for index in range(0, len(level), 2)]
+        return level[0]
+
+    def check(self):
+        data = self.content()
+        self.assertEqual(self.tree.digest(), self.expected_digest(data))
+        self.assertEqual(self.tree.crc32(), zlib.crc32(data))
+        for offset, length in ((0, 1), (100, 3000), (511, 2), (1024, 512),
+                               (7000, 10000)):
+            self.assertEqual(self.tree.crc32(offset, length),
+                             zlib.crc32(data[offset:offset + length]))
+
+    def test_combine(self):
+        shift = CrcShift()
+        self.assertEqual(shift.combine(zlib.crc32(b'hello '),
+                                       zlib.crc32(b'world'), 5),
+                         zlib.crc32(b'hello world'))
+
+    def test_initial_build(self):
+        self.tree.start()
+        self.tree.join()
+        self.check()
+
+    def record_hashes(self):
+        hashed = []
+        original = self.tree.hash_leaf
+
+        def hash_leaf(offset, length):
+            hashed.append(offset)
+            return original(offset, length)
+        self.tree.hash_leaf = hash_leaf
+        return hashed
+
+    def test_overwrite_rehashes_touched_leaves(self):
+        self.check()
+        hashed = self.record_hashes()
+        self.buffer.overwrite_range(1500, b'\xff' * 100)
+        self.check()
+        self.assertEqual(sorted(hashed), [1024, 1536])
+
+    def test_small_insert_rehashes_one_leaf(self):
+        self.check()
+        hashed = self.record_hashes()
+        self.buffer.insert_range(10, b'!')
+        self.check()
+        self.assertEqual(hashed, [0])
+        self.assertEqual(self.tree.lengths[:2], [513, 512])
+        del hashed[:]
+        self.buffer.delete_range(500, 30)
+        self.check()
+        self.assertEqual(sorted(hashed), [0, 500])
+        del hashed[:]
+        self.buffer.insert_range(600, bytes(1200))
+        self.check()
+        self.assertEqual(len(hashed), 4)
+        self.assertTrue(all(length <= 1024 for length in self.tree.lengths))
+
+    def test_insert_delete_undo(self):
+        self.check()
+        self.buffer.insert_range(3000, b'inserted')
+        self.check()
+        self.buffer.delete_range(0, 2000)
+        self.check()
+        self.buffer.logger.undo()
+        self.buffer.logger.undo()
+        self.check()
+
+    def test_random_edits(self):
+        rng = random.Random(0)
+        for _ in range(40):
+            offset = rng.randrange(self.buffer.get_size())
+            choice = rng.randrange(3)
+            if choice == 0:
+                self.buffer.insert_range(offset, b'x' * rng.randrange(1, 700))
+            elif choice == 1:
+                self.buffer.delete_range(offset, rng.randrange(1, 900))
+            else:
+                self.buffer.overwrite_range(offset, b'y' * rng.randrange(50))
+            if rng.randrange(4) == 0:
+                self.check()
+        self.check()
+
+    def test_empty(self):
+        self.buffer.delete_range(0, self.buffer.get_size())
+        self.assertEqual(self.tree.crc32(), 0)
+        self.assertEqual(self.tree.digest(),
+                         hashlib.sha256(b'\x00').digest())
+        self.buffer.insert_range(0, b'abc')
+        self.check()
+
+
+if __name__ == '__main__':
+    unittest.main()
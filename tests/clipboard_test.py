@@ -0,0 +1,68 @@
+import io
+import os
+import tempfile
+import unittest
+
+from model import Buffer, Clipboard
+from model.clipboard import HEX, RAW, HexReader, encode_hex
+
+
+class TestClipboard(unittest.TestCase):
+    def setUp(self):
+        test_file = tempfile.NamedTemporaryFile(delete=False)
+        test_file.write(bytes(range(256)) * 4)
+        test_file.close()
+        self.file_name = test_file.name
+        self.buffer = Buffer(self.file_name)
+
+    def tearDown(self):
+        self.buffer.close()
+        os.remove(self.file_name)
+
+    def test_encode_hex(self):
+        text = b''.join(encode_hex([bytes(range(32)), b'\xff']))
+        self.assertEqual(text.splitlines()[1],
+                         b'10 11 12 13 14 15 16 17 18 19 1a 1b 1c 1d 1e 1f')
+        self.assertEqual(text.splitlines()[2], b'ff')
+
+    def test_hex_reader(self):
+        text = b'00 01\n02 0\n3 ff'
+        reader = HexReader(io.BytesIO(text), chunk_size=3)
+        self.assertEqual(reader.read(), b'\x00\x01\x02\x03\xff')
+        with self.assertRaises(ValueError):
+            HexReader(io.BytesIO(b'0 1 2')).read()
+        with self.assertRaises(ValueError):
+            HexReader(io.BytesIO(b'zz')).read()
+
+    def test_copy_paste(self):
+        clipboard = Clipboard(spool_size=64, chunk_size=48)
+        self.assertEqual(clipboard.copy(self.buffer, 250, 100), 100)
+        self.assertIsNotNone(clipboard.path)
+        expected = self.buffer.pieces.read(250, 100)
+        raw = io.BytesIO()
+        clipboard.write_to(raw)
+        self.assertEqual(raw.getvalue(), expected)
+        clipboard.paste(self.buffer, 0)
+        self.assertEqual(self.buffer.pieces.read(0, 100), expected)
+        self.assertEqual(len(self.buffer.logger.undo_stack), 1)
+        clipboard.paste(self.buffer, 1024, overwrite=True)
+        self.assertEqual(self.buffer.get_size(), 1124)
+        clipboard.clear()
+        self.assertEqual(self.buffer.pieces.read(1024, 100), expected)
+
+    def test_hex_round_trip(self):
+        clipboard = Clipboard(spool_size=1024, chunk_size=64)
+        clipboard.copy(self.buffer, 10, 40)
+        self.assertIsNone(clipboard.path)
+        text = io.BytesIO()
+        clipboard.write_to(text, HEX)
+        other = Clipboard(spool_size=16, chunk_size=32)
+        text.seek(0)
+        self.assertEqual(other.load(text, HEX), 40)
+        self.assertEqual(b''.join(other.iter_chunks(RAW)),
+                         bytes(range(10, 50)))
+        other.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
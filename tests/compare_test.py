@@ -0,0 +1,75 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from model import Buffer
+from model.compare import DiffIndex, compare_buffers, diff_block
+
+
+class TestCompare(unittest.TestCase):
+    def setUp(self):
+        self.data = bytes(range(256)) * 20
+        self.names = []
+        for _ in range(2):
+            test_file = tempfile.NamedTemporaryFile(delete=False)
+            test_file.write(self.data)
+            test_file.close()
+            self.names.append(test_file.name)
+        self.first = Buffer(self.names[0])
+        self.second = Buffer(self.names[1])
+
+    def tearDown(self):
+        self.first.close()
+        self.second.close()
+        for name in self.names:
+            os.remove(name)
+
+    def test_diff_block(self):
+        first = bytes(300)
+        second = bytearray(first)
+        second[5] = 1
+        second[6] = 1
+        second[200] = 1
+        self.assertEqual(diff_block(first, bytes(second), 1000, grain=16),
+                         [(1005, 1007), (1200, 1201)])
+
+    def test_identical(self):
+        index = compare_buffers(self.first, self.second, block_size=256)
+        self.assertEqual(len(index), 0)
+
+    def test_differences(self):
+        self.second.overwrite_range(100, b'\x00' * 10)
+        self.second.overwrite_range(1020, bytes(b ^ 0xff for b
+                                                in self.data[1020:1030]))
+        self.second.overwrite_range(5119, b'tail')
+        expected = [(100, 110), (1020, 1030), (5119, 5123)]
+        index = compare_buffers(self.first, self.second, block_size=256,
+                                workers=3)
+        self.assertEqual(index.ranges, expected)
+        self.assertEqual(index.next_after(100), (1020, 1030))
+        self.assertEqual(index.previous_before(1020)[1], 110)
+        self.assertIsNone(index.previous_before(100))
+        self.assertEqual(index.find(1025), (1020, 1030))
+        self.assertIsNone(index.find(2000))
+
+    def test_cancel(self):
+        self.second.overwrite_range(4000, b'\x00' * 10)
+        cancelled = threading.Event()
+        cancelled.set()
+        index = compare_buffers(self.first, self.second, block_size=256,
+                                cancelled=cancelled)
+        self.assertEqual(len(index), 0)
+
+    def test_index_merge(self):
+        index = DiffIndex()
+        index.add(0, 5)
+        index.add(5, 8)
+        index.add(10, 10)
+        index.add(12, 13)
+        self.assertEqual(index.ranges, [(0, 8), (12, 13)])
+        self.assertEqual(index.total, 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
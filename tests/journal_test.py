@@ -0,0 +1,186 @@
+import io
+import os
+import tempfile
+import unittest
+
+from model import Buffer, Journal
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        test_file = tempfile.NamedTemporaryFile(delete=False)
+        test_file.write(bytes(range(64)))
+        test_file.close()
+        self.file_name = test_file.name
+        self.journal_name = Journal.path_for(self.file_name)
+
+    def tearDown(self):
+        for name in (self.file_name, self.journal_name,
+                     self.journal_name + '.data', self.journal_name + '.add'):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def edit(self, buffer):
+        buffer.add_byte(0, b'a', True)
+        buffer.add_byte(1, b'b', False)
+        buffer.delete_byte(10)
+        buffer.replace_ranges([20, 30], 2, b'xyz')
+        buffer.add_byte(5, b'c', True)
+        buffer.logger.undo()
+        return buffer.pieces.read(0, 128)
+
+    def test_no_journal_without_edits(self):
+        buffer = Buffer(self.file_name, journal=True)
+        buffer.close()
+        self.assertFalse(os.path.exists(self.journal_name))
+
+    def test_recover(self):
+        buffer = Buffer(self.file_name, journal=True)
+        expected = self.edit(buffer)
+        buffer.close()
+        buffer = Buffer(self.file_name, journal=True)
+        self.assertGreater(buffer.recovered, 0)
+        self.assertEqual(buffer.pieces.read(0, 128), expected)
+        buffer.add_byte(0, b'd', True)
+        expected = buffer.pieces.read(0, 128)
+        buffer.close()
+        buffer = Buffer(self.file_name, journal=True)
+        self.assertEqual(buffer.pieces.read(0, 128), expected)
+        buffer.close()
+
+    def test_snapshot(self):
+        buffer = Buffer(self.file_name, journal=True)
+        buffer.journal.snapshot_interval = 2
+        buffer.journal.sync_interval = 0
+        for index in range(40):
+            buffer.add_byte(index % 30, b'x', index % 3 == 0)
+            buffer.journal.join()
+        expected = self.edit(buffer)
+        buffer.close()
+        buffer = Buffer(self.file_name, journal=True)
+        self.assertLess(buffer.recovered, 12)
+        self.assertEqual(buffer.pieces.read(0, 128), expected)
+        buffer.close()
+
+    def test_snapshot_size(self):
+        buffer = Buffer(self.file_name, journal=True)
+        buffer.journal.snapshot_size = 256
+        for index in range(60):
+            buffer.add_byte(index, b'y', False)
+            buffer.journal.join()
+        self.assertLess(buffer.journal.tail_size, 256 + 64)
+        expected = buffer.pieces.read(0, 256)
+        buffer.close()
+        buffer = Buffer(self.file_name, journal=True)
+        self.assertLess(buffer.recovered, 60)
+        self.assertEqual(buffer.pieces.read(0, 256), expected)
+        buffer.close()
+
+    def test_add_buffer_not_rewritten(self):
+        buffer = Buffer(self.file_name, journal=True)
+        buffer.journal.snapshot_interval = 1
+        buffer.insert_range(4, b'payload' * 20000)
+        buffer.journal.join()
+        buffer.add_byte(0, b'z', True)
+        buffer.journal.join()
+        expected = buffer.pieces.read(0, 200000)
+        self.assertLess(os.path.getsize(self.journal_name), 4096)
+        self.assertEqual(os.path.getsize(self.journal_name + '.add'),
+                         len(buffer.pieces.add_buffer))
+        buffer.close()
+        buffer = Buffer(self.file_name, journal=True)
+        self.assertEqual(buffer.pieces.read(0, 200000), expected)
+        buffer.close()
+
+    def test_recover_stream(self):
+        buffer = Buffer(self.file_name, journal=True)
+        buffer.insert_range(8, io.BytesIO(b'streamed' * 1000))
+        buffer.fill_range(0, 4, b'ab')
+        expected = buffer.pieces.read(0, 10000)
+        buffer.close()
+        buffer = Buffer(self.file_name, journal=True)
+        self.assertEqual(buffer.pieces.read(0, 10000), expected)
+        buffer.save(self.file_name)
+        self.assertFalse(os.path.exists(self.journal_name + '.data'))
+        buffer.close()
+        with open(self.file_name, 'rb') as file:
+            self.assertEqual(file.read(), expected)
+
+    def test_write_error_disables_journal(self):
+        os.mkdir(self.journal_name + '.add')
+        try:
+            buffer = Buffer(self.file_name, journal=True)
+            buffer.add_byte(0, b'a', True)
+            buffer.insert_range(1, b'bc')
+            self.assertIsNone(buffer.pieces.journal)
+            self.assertEqual(buffer.pieces.read(0, 4), b'abc\x01')
+            self.assertFalse(os.path.exists(self.journal_name))
+            buffer.close()
+        finally:
+            os.rmdir(self.journal_name + '.add')
+
+    def test_truncated_record(self):
+        buffer = Buffer(self.file_name, journal=True)
+        buffer.add_byte(0, b'a', True)
+        expected = buffer.pieces.read(0, 128)
+        buffer.add_byte(1, b'b', False)
+        buffer.close()
+        with open(self.journal_name, 'r+b') as file:
+            file.truncate(os.path.getsize(self.journal_name) - 3)
+        buffer = Buffer(self.file_name, journal=True)
+        self.assertEqual(buffer.pieces.read(0, 128), expected)
+        buffer.close()
+
+    def test_stale_journal(self):
+        buffer = Buffer(self.file_name, journal=True)
+        self.edit(buffer)
+        buffer.close()
+        with open(self.file_name, 'ab') as file:
+            file.write(b'!')
+        buffer = Buffer(self.file_name, journal=True)
+        self.assertEqual(buffer.recovered, 0)
+        self.assertEqual(buffer.pieces.read(0, 128), bytes(range(64)) + b'!')
+        buffer.close()
+
+    def test_save_restarts_journal(self):
+        buffer = Buffer(self.file_name, journal=True)
+        buffer.add_byte(1, b'b', False)
+        buffer.save(self.file_name)
+        self.assertFalse(os.path.exists(self.journal_name))
+        buffer.insert_range(0, b'X')
+        expected = buffer.pieces.read(0, 128)
+        buffer.close()
+        buffer = Buffer(self.file_name, journal=True)
+        self.assertGreater(buffer.recovered, 0)
+        self.assertEqual(buffer.pieces.read(0, 128), expected)
+        buffer.close()
+
+    def test_save_as_keeps_journal(self):
+        buffer = Buffer(self.file_name, journal=True)
+        buffer.add_byte(1, b'b', False)
+        expected = buffer.pieces.read(0, 128)
+        other_name = self.file_name + '.copy'
+        buffer.save(other_name)
+        buffer.close()
+        with open(other_name, 'rb') as file:
+            self.assertEqual(file.read(), expected)
+        os.remove(other_name)
+        buffer = Buffer(self.file_name, journal=True)
+        self.assertEqual(buffer.pieces.read(0, 128), expected)
+        buffer.close()
+
+    def test_save_in_place_restarts_journal(self):
+        buffer = Buffer(self.file_name, journal=True)
+        buffer.add_byte(0, b'a', True)
+        buffer.save(self.file_name)
+        self.assertFalse(os.path.exists(self.journal_name))
+        buffer.add_byte(1, b'b', True)
+        expected = buffer.pieces.read(0, 128)
+        buffer.close()
+        buffer = Buffer(self.file_name, journal=True)
+        self.assertEqual(buffer.pieces.read(0, 128), expected)
+        buffer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,85 +1,133 @@
+import io
 import unittest
 
-from model import Logger, LogRecord
+from model import Logger, LogRecord, PieceTable
 
 
 class TestLogger(unittest.TestCase):
     def setUp(self):
-        self.extended_bytes = {}
-        self.logger = Logger(self.extended_bytes)
+        self.pieces = PieceTable(io.BytesIO(b'0123'), 4)
+        self.logger = Logger(self.pieces)
+
+    def replace(self, index, length, data):
+        removed = self.pieces.replace(index, length, data)
+        self.logger.add(LogRecord(index, removed, len(data)))
 
     def test_add_byte(self):
-        log_record = LogRecord(0, bytearray(), bytearray([0x01]),
-                               0, True)
-        self.logger.add(log_record)
-        self.logger.extended_bytes[0] = bytearray([0x01])
-        self.assertEqual(self.extended_bytes, {0: bytearray([0x01])})
+        self.replace(0, 1, b'\x01')
+        self.assertEqual(self.pieces.read(0, 4), b'\x01123')
+        self.assertEqual(len(self.logger.undo_stack), 1)
 
     def test_undo_insert(self):
-        log_record = LogRecord(0, bytearray(), bytearray([0x01]),
-                               0, True)
-        self.logger.add(log_record)
-        self.logger.extended_bytes[0] = bytearray([0x01])
+        self.replace(0, 0, b'\x01')
         self.logger.undo()
-        self.assertEqual(self.extended_bytes, {})
+        self.assertEqual(self.pieces.read(0, 5), b'0123')
 
     def test_undo_delete(self):
-        log_record = LogRecord(0, bytearray([0x01]), bytearray(),
-                               0, False)
-        self.logger.add(log_record)
-        self.logger.extended_bytes = {0: bytearray([0x01])}
+        self.replace(1, 1, b'')
+        self.assertEqual(self.pieces.read(0, 4), b'023')
         self.logger.undo()
-        self.assertEqual(self.extended_bytes, {})
+        self.assertEqual(self.pieces.read(0, 4), b'0123')
 
     def test_redo_insert(self):
-        log_record = LogRecord(0, bytearray(), bytearray([0x01]),
-                               0, True)
-        self.logger.add(log_record)
-        self.logger.extended_bytes[0] = bytearray([0x01])
+        self.replace(0, 0, b'\x01')
         self.logger.undo()
         self.logger.redo()
-        self.assertEqual(self.extended_bytes, {0: bytearray([0x01])})
+        self.assertEqual(self.pieces.read(0, 5), b'\x010123')
 
     def test_redo_delete(self):
-        log_record = LogRecord(0, bytearray([0x01]), bytearray(),
-                               0, False)
-        self.logger.add(log_record)
-        self.logger.extended_bytes = {0: bytearray([0x01])}
+        self.replace(1, 1, b'')
         self.logger.undo()
         self.logger.redo()
-        self.assertEqual(self.extended_bytes, {})
+        self.assertEqual(self.pieces.read(0, 4), b'023')
 
     def test_multiple_add_and_undo(self):
-        log_record_1 = LogRecord(1, bytearray(), bytearray([0x02]),
-                                 0, True)
-        log_record_2 = LogRecord(2, bytearray(), bytearray([0x03]),
-                                 0, True)
-        self.logger.add(log_record_1)
-        self.logger.add(log_record_2)
-        self.extended_bytes[1] = bytearray([0x02])
-        self.extended_bytes[2] = bytearray([0x03])
-        self.assertEqual(self.extended_bytes, {1: bytearray([0x02]),
-                                               2: bytearray([0x03])})
+        self.replace(1, 1, b'\x02')
+        self.replace(2, 1, b'\x03')
+        self.assertEqual(self.pieces.read(0, 4), b'0\x02\x033')
         self.logger.undo()
         self.logger.undo()
-        self.assertEqual(self.extended_bytes, {})
+        self.assertEqual(self.pieces.read(0, 4), b'0123')
+        self.assertEqual(self.pieces.overlay(), {})
 
     def test_multiple_add_and_redo(self):
-        log_record_1 = LogRecord(1, bytearray(), bytearray([0x02]),
-                                 0, True)
-        log_record_2 = LogRecord(2, bytearray(), bytearray([0x03]),
-                                 0, True)
-        self.logger.add(log_record_1)
-        self.logger.add(log_record_2)
-        self.extended_bytes[1] = bytearray([0x02])
-        self.extended_bytes[2] = bytearray([0x03])
+        self.replace(1, 1, b'\x02')
+        self.replace(2, 1, b'\x03')
         self.logger.undo()
         self.logger.undo()
         self.logger.redo()
         self.logger.redo()
-        self.assertEqual(self.extended_bytes, {1: bytearray([0x02]),
-                                               2: bytearray([0x03])})
+        self.assertEqual(self.pieces.overlay(), {1: bytearray([0x02]),
+                                                 2: bytearray([0x03])})
+
+    def test_add_clears_redo(self):
+        self.replace(0, 1, b'\x01')
+        self.logger.undo()
+        self.replace(1, 1, b'\x02')
+        self.assertEqual(self.logger.redo_stack, [])
+
+    def test_coalesce_typing(self):
+        for index, byte in enumerate(b'abc'):
+            self.replace(2 + index, 0, bytes([byte]))
+        self.assertEqual(len(self.logger.undo_stack), 1)
+        self.assertEqual(self.pieces.read(0, 7), b'01abc23')
+        self.logger.undo()
+        self.assertEqual(self.pieces.read(0, 7), b'0123')
+        self.logger.redo()
+        self.assertEqual(self.pieces.read(0, 7), b'01abc23')
+
+    def test_coalesce_overwrite(self):
+        self.replace(1, 1, b'a')
+        self.replace(1, 1, b'b')
+        self.replace(2, 1, b'c')
+        self.assertEqual(len(self.logger.undo_stack), 1)
+        self.assertEqual(self.logger.undo_stack[0].removed_size, 2)
+        self.logger.undo()
+        self.assertEqual(self.pieces.read(0, 4), b'0123')
+        self.assertEqual(self.pieces.overlay(), {})
+
+    def test_coalesce_backspace(self):
+        self.replace(3, 1, b'')
+        self.replace(2, 1, b'')
+        self.replace(1, 1, b'')
+        self.assertEqual(len(self.logger.undo_stack), 1)
+        self.assertEqual(self.pieces.read(0, 4), b'0')
+        self.logger.undo()
+        self.assertEqual(self.pieces.read(0, 4), b'0123')
+
+    def test_no_coalesce(self):
+        self.replace(0, 1, b'a')
+        self.replace(2, 1, b'b')
+        self.replace(2, 1, b'')
+        self.assertEqual(len(self.logger.undo_stack), 3)
+        self.logger.seal()
+        self.replace(2, 0, b'c')
+        self.replace(3, 0, b'd')
+        self.logger.undo()
+        self.replace(2, 0, b'e')
+        self.assertEqual(len(self.logger.undo_stack), 4)
+        self.assertEqual(self.pieces.read(0, 5), b'a1e3')
+
+    def test_spill_history(self):
+        logger = Logger(self.pieces, memory_budget=1000)
+        states = [self.pieces.read(0, 64)]
+        for index in range(40):
+            logger.seal()
+            removed = self.pieces.replace(index % 4, 1, bytes([index]))
+            logger.add(LogRecord(index % 4, removed, 1))
+            states.append(self.pieces.read(0, 64))
+        self.assertTrue(logger.spilled_undo)
+        self.assertLessEqual(logger.resident, 1000)
+        for state in reversed(states[:-1]):
+            logger.undo()
+            self.assertEqual(self.pieces.read(0, 64), state)
+        self.assertTrue(logger.spilled_redo)
+        for state in states[1:]:
+            logger.redo()
+            self.assertEqual(self.pieces.read(0, 64), state)
+        logger.clear()
+        self.assertIsNone(logger.history.file)
 
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -1,6 +1,9 @@
+import io
 import unittest
 import tempfile
 import os
+import subprocess
+import sys
 from model.model import Buffer
 
 
@@ -38,6 +41,13 @@ class TestBuffer(unittest.TestCase):
         self.buffer.logger.redo()
         self.assertEqual(self.buffer.extended_bytes, {0: bytearray([1])})
 
+    def test_extended_bytes_cached(self):
+        overlay = self.buffer.extended_bytes
+        self.assertIs(self.buffer.extended_bytes, overlay)
+        self.buffer.add_byte(0, b'\x01', True)
+        self.assertIsNot(self.buffer.extended_bytes, overlay)
+        self.assertEqual(self.buffer.extended_bytes, {0: bytearray([1])})
+
     def test_backspace_event_from_text(self):
         self.buffer.add_byte(0, b'\x01', True)
         position = self.buffer.backspace_event_from_text(1)
@@ -59,11 +69,211 @@ class TestBuffer(unittest.TestCase):
         os.remove(temp_output.name)
         self.assertEqual(data, b'0123456789abcdef')
 
+    def test_write_data_after_edits(self):
+        self.buffer.add_byte(16, b'!', False)
+        self.buffer.add_byte(0, b'x', True)
+        self.buffer.delete_byte(5)
+        self.assertEqual(self.buffer.get_size(), 16)
+        self.assertEqual(self.buffer.shown, b'x12346789abcdef!')
+        temp_output = tempfile.NamedTemporaryFile(delete=False)
+        self.buffer.write_data(temp_output)
+        temp_output.close()
+        with open(temp_output.name, 'rb') as f:
+            data = f.read()
+        os.remove(temp_output.name)
+        self.assertEqual(data, b'x12346789abcdef!')
+
+    def test_write_data_in_chunks(self):
+        self.buffer.add_byte(3, b'!', False)
+        for chunk_size in (1, 3, 64):
+            temp_output = tempfile.NamedTemporaryFile(delete=False)
+            stats = self.buffer.write_data(temp_output, chunk_size)
+            temp_output.close()
+            with open(temp_output.name, 'rb') as f:
+                data = f.read()
+            os.remove(temp_output.name)
+            self.assertEqual(data, b'012!3456789abcdef')
+            self.assertEqual(stats.bytes_written, 17)
+            self.assertLessEqual(stats.bytes_copied, 16)
+
+    def test_save_in_place(self):
+        self.buffer.add_byte(2, b'x', True)
+        self.buffer.add_byte(3, b'y', True)
+        stats = self.buffer.save(self.test_file.name)
+        self.assertEqual(stats.bytes_written, 2)
+        self.assertEqual(self.buffer.logger.undo_stack, [])
+        self.buffer.close()
+        with open(self.test_file.name, 'rb') as f:
+            self.assertEqual(f.read(), b'01xy456789abcdef')
+
+    def test_save_with_resize(self):
+        self.buffer.add_byte(2, b'x', False)
+        stats = self.buffer.save(self.test_file.name)
+        self.assertEqual(stats.bytes_written, 17)
+        self.assertEqual(self.buffer.shown, b'01x23456789abcdef')
+        self.buffer.close()
+        with open(self.test_file.name, 'rb') as f:
+            self.assertEqual(f.read(), b'01x23456789abcdef')
+
+    def test_save_edit_save(self):
+        self.buffer.insert_range(0, b'X')
+        self.buffer.save(self.test_file.name)
+        self.buffer.logger.undo()
+        self.assertEqual(self.buffer.pieces.read(0, 17),
+                         b'X0123456789abcdef')
+        self.buffer.overwrite_range(1, b'z')
+        stats = self.buffer.save(self.test_file.name)
+        self.assertEqual(stats.bytes_written, 1)
+        self.buffer.delete_range(0, 2)
+        self.buffer.save(self.test_file.name)
+        self.buffer.overwrite_range(0, b'y')
+        self.buffer.save(self.test_file.name)
+        self.buffer.close()
+        with open(self.test_file.name, 'rb') as f:
+            self.assertEqual(f.read(), b'y23456789abcdef')
+
+    def test_render_cache(self):
+        test_file = tempfile.NamedTemporaryFile(delete=False)
+        test_file.write(bytes(range(64)))
+        test_file.close()
+        buffer = Buffer(test_file.name)
+        buffer.to_hex()
+        self.assertEqual(buffer.row_cache.misses, 4)
+        buffer.add_byte(20, b'x', True)
+        text = buffer.to_text()
+        self.assertEqual(buffer.row_cache.misses, 5)
+        self.assertEqual(text.split('\n')[1][4], 'x')
+        buffer.add_byte(20, b'y', False)
+        buffer.to_hex()
+        self.assertEqual(buffer.row_cache.misses, 9)
+        self.assertEqual(buffer.row_cache.hits, 4)
+        buffer.close()
+        os.remove(test_file.name)
+
+    def test_prefetch_rows(self):
+        test_file = tempfile.NamedTemporaryFile(delete=False)
+        test_file.write(bytes(range(256)) * 8)
+        test_file.close()
+        buffer = Buffer(test_file.name)
+        self.assertEqual(buffer.prefetch_rows(30, 30), 30)
+        self.assertEqual(buffer.prefetch_rows(30, 30), 0)
+        self.assertEqual(buffer.prefetch_rows(120, 30), 8)
+        buffer.update_data(30)
+        misses = buffer.row_cache.misses
+        self.assertEqual(buffer.to_hex().split('\n')[0][:5], 'e0 e1')
+        self.assertEqual(buffer.row_cache.misses, misses)
+        buffer.close()
+        os.remove(test_file.name)
+
+    def test_multicursor_typing(self):
+        test_file = tempfile.NamedTemporaryFile(delete=False)
+        test_file.write(bytes(32))
+        test_file.close()
+        buffer = Buffer(test_file.name)
+        for cursor in (9, 3, 9, 48):
+            buffer.add_cursor(cursor)
+        self.assertEqual(buffer.cursors, [3, 9, 48])
+        position = buffer.update_from_hex_position(0, 'a', True)
+        position = buffer.update_from_hex_position(position, 'b', True)
+        self.assertEqual(position, 3)
+        self.assertEqual(buffer.cursors, [6, 12, 51])
+        self.assertEqual(buffer.pieces.read(0, 18),
+                         b'\xab\xab\x00\xab' + bytes(12) + b'\xab\x00')
+        self.assertEqual(len(buffer.logger.undo_stack), 2)
+        buffer.logger.undo()
+        buffer.logger.undo()
+        self.assertEqual(buffer.pieces.read(0, 32), bytes(32))
+        buffer.close()
+        os.remove(test_file.name)
+
+    def test_multicursor_insert_and_backspace(self):
+        test_file = tempfile.NamedTemporaryFile(delete=False)
+        test_file.write(bytes(range(8)))
+        test_file.close()
+        buffer = Buffer(test_file.name)
+        buffer.add_cursor(6)
+        buffer.add_cursor(24)
+        position = buffer.update_from_hex_position(3, 'f', False)
+        self.assertEqual(position, 4)
+        self.assertEqual(buffer.cursors, [10, 31])
+        self.assertEqual(buffer.pieces.read(0, 16),
+                         b'\x00\xf0\x01\xf0\x02\x03\x04\x05\x06\x07\xf0')
+        buffer.cursors = [12, 33]
+        position = buffer.backspace_event_from_hex(6)
+        self.assertEqual(position, 3)
+        self.assertEqual(buffer.cursors, [6, 24])
+        self.assertEqual(buffer.pieces.read(0, 16),
+                         b'\x00\x01\x02\x03\x04\x05\x06\x07')
+        buffer.close()
+        os.remove(test_file.name)
+
+    def test_range_operations(self):
+        self.buffer.insert_range(4, b'xyz')
+        self.buffer.insert_range(0, io.BytesIO(b'stream'), 3)
+        self.buffer.overwrite_range(19, memoryview(b'EFGH'))
+        self.buffer.delete_range(1, 2)
+        self.assertEqual(self.buffer.pieces.read(0, 32),
+                         b's0123xyz456789abcEFGH')
+        self.assertEqual(len(self.buffer.logger.undo_stack), 4)
+        self.buffer.fill_range(2, 6, b'\xff')
+        self.assertEqual(self.buffer.shown[:10], b's0' + b'\xff' * 6 + b'45')
+        for _ in range(5):
+            self.buffer.logger.undo()
+        self.assertEqual(self.buffer.pieces.read(0, 32), b'0123456789abcdef')
+        for _ in range(5):
+            self.buffer.logger.redo()
+        self.assertEqual(self.buffer.pieces.read(0, 32),
+                         b's0' + b'\xff' * 6 + b'456789abcEFGH')
+        with tempfile.NamedTemporaryFile(delete=False) as file:
+            target = file.name
+        self.buffer.save(target)
+        with open(target, 'rb') as file:
+            self.assertEqual(file.read(),
+                             b's0' + b'\xff' * 6 + b'456789abcEFGH')
+        os.remove(target)
+        self.buffer.close()
+
+    def test_history_next_to_file(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            file_name = os.path.join(work_dir, 'data.bin')
+            with open(file_name, 'wb') as file:
+                file.write(bytes(64))
+            buffer = Buffer(file_name)
+            history = buffer.logger.history
+            self.assertEqual(history.directory, work_dir)
+            buffer.logger.memory_budget = 100
+            for index in range(40):
+                buffer.logger.seal()
+                buffer.overwrite_range(index, b'x')
+            self.assertTrue(buffer.logger.spilled_undo)
+            link = f'/proc/self/fd/{history.file.fileno()}'
+            if os.path.islink(link):
+                self.assertTrue(os.readlink(link).startswith(work_dir))
+            buffer.close()
+
     def test_get_position(self):
         pos = self.buffer.get_position(1, 0)
         self.assertEqual(pos, 1)
         pos = self.buffer.get_position(1, 1)
         self.assertEqual(pos, 2)
+        self.buffer.add_byte(1, b'x', False)
+        self.assertEqual(self.buffer.get_position(1, 0), 2)
+
+
+class TestPackage(unittest.TestCase):
+    def test_lazy_subsystems(self):
+        code = ('import sys, model; '
+                'print(sorted(m for m in sys.modules '
+                'if m.startswith("model."))); '
+                'print(model.Minimap.__module__)')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, '-c', code], cwd=root,
+                                capture_output=True, text=True,
+                                check=True).stdout.splitlines()
+        for name in ('analysis', 'checksum', 'clipboard', 'compare',
+                     'patch', 'search'):
+            self.assertNotIn(f"'model.{name}'", output[0])
+        self.assertEqual(output[1], 'model.analysis')
 
 
 if __name__ == '__main__':
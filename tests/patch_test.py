@@ -0,0 +1,79 @@
+import io
+import os
+import tempfile
+import unittest
+
+from model import Buffer
+from model.patch import (encode_number, export_patch, import_patch,
+                         read_number)
+
+
+class TestPatch(unittest.TestCase):
+    def setUp(self):
+        test_file = tempfile.NamedTemporaryFile(delete=False)
+        test_file.write(bytes(range(256)) * 64)
+        test_file.close()
+        self.file_name = test_file.name
+
+    def tearDown(self):
+        os.remove(self.file_name)
+
+    def round_trip(self, edit):
+        buffer = Buffer(self.file_name)
+        edit(buffer)
+        expected = buffer.pieces.read(0, buffer.get_size())
+        patch = io.BytesIO()
+        export_patch(buffer, patch, chunk_size=5)
+        buffer.close()
+        buffer = Buffer(self.file_name)
+        patch.seek(0)
+        self.assertEqual(import_patch(buffer, patch), len(expected))
+        self.assertEqual(buffer.pieces.read(0, buffer.get_size()), expected)
+        self.assertEqual(len(buffer.logger.undo_stack), 1)
+        buffer.logger.undo()
+        self.assertEqual(buffer.pieces.read(0, 1 << 20),
+                         bytes(range(256)) * 64)
+        buffer.close()
+        return patch.getvalue()
+
+    def test_numbers(self):
+        stream = io.BytesIO(b''.join(encode_number(number) for number
+                                     in (0, 127, 128, 16511, 16512, 1 << 40)))
+        self.assertEqual([read_number(stream) for _ in range(6)],
+                         [0, 127, 128, 16511, 16512, 1 << 40])
+
+    def test_overwrite(self):
+        patch = self.round_trip(
+            lambda buffer: buffer.overwrite_range(1000, b'\xff\xfe'))
+        self.assertLess(len(patch), 20)
+
+    def test_mixed_edits(self):
+        def edit(buffer):
+            buffer.insert_range(10, b'inserted')
+            buffer.delete_range(500, 3000)
+            buffer.insert_range(0, io.BytesIO(b'stream' * 100))
+            moved = buffer.pieces.cut(8000, 100)
+            buffer.pieces.paste(20, moved)
+            buffer.fill_range(9000, 5, b'ab')
+            buffer.delete_range(buffer.get_size() - 10, 10)
+        self.round_trip(edit)
+
+    def test_unchanged(self):
+        patch = self.round_trip(lambda buffer: None)
+        self.assertLess(len(patch), 16)
+
+    def test_errors(self):
+        buffer = Buffer(self.file_name)
+        buffer.overwrite_range(0, b'abc')
+        patch = io.BytesIO()
+        export_patch(buffer, patch)
+        for data in (b'XXXX' + patch.getvalue()[4:],
+                     patch.getvalue()[:-2],
+                     patch.getvalue()[:4] + b'\x81' + patch.getvalue()[7:]):
+            with self.assertRaises(ValueError):
+                import_patch(buffer, io.BytesIO(data))
+        buffer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from model import PieceTable
+from model.piece_table import (ADD, ORIGINAL, SCRATCH, iter_nodes,
+                               piece_size)
+
+
+class TestPieceTable(unittest.TestCase):
+    def setUp(self):
+        self.data = b'0123456789abcdef'
+        self.pieces = PieceTable(io.BytesIO(self.data), len(self.data))
+
+    def test_read(self):
+        self.assertEqual(self.pieces.size, 16)
+        self.assertEqual(self.pieces.read(0, 16), self.data)
+        self.assertEqual(self.pieces.read(4, 3), b'456')
+        self.assertEqual(self.pieces.read(14, 10), b'ef')
+
+    def test_insert(self):
+        self.pieces.insert(4, b'xy')
+        self.pieces.insert(0, b'z')
+        self.assertEqual(self.pieces.read(0, 32), b'z0123xy456789abcdef')
+        self.assertEqual(self.pieces.add_buffer, bytearray(b'xyz'))
+
+    def test_cut_and_paste(self):
+        removed = self.pieces.cut(2, 5)
+        self.assertEqual(self.pieces.read(0, 16), b'01789abcdef')
+        self.pieces.paste(2, removed)
+        self.assertEqual(self.pieces.read(0, 16), self.data)
+
+    def test_overlay(self):
+        self.pieces.replace(0, 1, b'\x01')
+        self.pieces.cut(3, 2)
+        self.pieces.insert(8, b'!')
+        self.assertEqual(self.pieces.overlay(),
+                         {0: bytearray(b'\x01'), 3: bytearray(),
+                          4: bytearray(), 9: bytearray(b'9!')})
+
+    def test_offset_mapping(self):
+        self.pieces.replace(2, 3, b'xy')
+        self.pieces.insert(0, b'z')
+        self.assertEqual(self.pieces.to_physical(0), (ADD, 2))
+        self.assertEqual(self.pieces.to_physical(2), (ORIGINAL, 1))
+        self.assertEqual(self.pieces.to_physical(5), (ORIGINAL, 5))
+        self.assertEqual(self.pieces.to_logical(1), 2)
+        self.assertEqual(self.pieces.to_logical(3), 3)
+        self.assertEqual(self.pieces.to_logical(5), 5)
+        self.assertEqual(self.pieces.to_logical(15), 15)
+        with self.assertRaises(IndexError):
+            self.pieces.to_physical(16)
+
+    def test_mapped_file(self):
+        self.assertIsNone(self.pieces.mapping)
+        test_file = tempfile.NamedTemporaryFile(delete=False)
+        test_file.write(self.data)
+        test_file.close()
+        with open(test_file.name, 'rb') as file:
+            pieces = PieceTable(file, len(self.data))
+            self.assertIsNotNone(pieces.mapping)
+            self.assertIsInstance(pieces.read_source(ORIGINAL, 2, 3),
+                                  memoryview)
+            pieces.replace(1, 2, b'xy')
+            self.assertEqual(pieces.read(0, 16), b'0xy3456789abcdef')
+            pieces.close()
+        os.remove(test_file.name)
+
+    def test_random_edits(self):
+        rng = random.Random(0)
+        model = bytearray(self.data)
+        for _ in range(500):
+            offset = rng.randint(0, len(model))
+            length = rng.randint(0, 4)
+            data = bytes(rng.randint(0, 255)
+                         for _ in range(rng.randint(0, 3)))
+            self.pieces.replace(offset, length, data)
+            model[offset:offset + length] = data
+            self.assertEqual(self.pieces.size, len(model))
+        self.assertEqual(self.pieces.read(0, len(model)), bytes(model))
+        for offset in range(len(model)):
+            source, start = self.pieces.to_physical(offset)
+            if source == ORIGINAL:
+                self.assertEqual(self.pieces.to_logical(start), offset)
+
+    def test_snapshot(self):
+        rng = random.Random(1)
+        for _ in range(50):
+            self.pieces.replace(rng.randint(0, 16), 1, b'x')
+        expected = self.pieces.read(0, 64)
+        root = self.pieces.snapshot()
+        layout = [(piece.source, piece.start, piece.length)
+                  for piece in iter_nodes(root)]
+        for _ in range(200):
+            self.pieces.replace(rng.randint(0, self.pieces.size),
+                                rng.randint(0, 3), b'yz')
+        self.assertEqual([(piece.source, piece.start, piece.length)
+                          for piece in iter_nodes(root)], layout)
+        self.assertEqual(piece_size(root), len(expected))
+        self.pieces.release_snapshot()
+        self.assertEqual(self.pieces.snapshots, 0)
+        self.pieces.root = root
+        self.assertEqual(self.pieces.read(0, 64), expected)
+
+    def test_replace_from_stream(self):
+        stream = io.BytesIO(b'xyzw')
+        removed, inserted = self.pieces.replace_from(2, 1, stream, 3)
+        self.assertEqual(inserted, 3)
+        self.assertEqual(self.pieces.read(0, 6), b'01xyz3')
+        self.assertEqual(self.pieces.to_physical(2), (SCRATCH, 0))
+        removed, inserted = self.pieces.replace_from(0, None, stream)
+        self.assertEqual(self.pieces.read(0, 6), b'w1xyz3')
+        self.assertEqual(self.pieces.read(0, 16), b'w1xyz3456789abcd')
+        self.assertEqual(self.pieces.overlay()[0], bytearray(b'w'))
+        self.assertIsNone(self.pieces.overwritten_ranges())
+        self.pieces.close()
+
+    def test_append_stream_from_file(self):
+        with tempfile.TemporaryFile() as file:
+            file.write(b'header' + bytes(range(256)))
+            file.seek(6)
+            start, count = self.pieces.append_stream(file, 200,
+                                                     chunk_size=7)
+            self.assertEqual(file.tell(), 206)
+        self.assertEqual((start, count), (0, 200))
+        self.assertEqual(self.pieces.read_source(SCRATCH, 10, 3),
+                         bytes([10, 11, 12]))
+        self.pieces.close()
+
+    def test_fill(self):
+        pieces = PieceTable(io.BytesIO(self.data), len(self.data))
+        pieces.fill(2, 4, 200005, b'abc')
+        self.assertEqual(pieces.size, 200017)
+        self.assertLess(len(pieces.add_buffer), 70000)
+        expected = (b'01' + (b'abc' * 66669)[:200005] + b'6789abcdef')
+        self.assertEqual(pieces.read(0, pieces.size), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from model import RowCache
+
+
+class TestRowCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = RowCache(capacity=3)
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(self.cache.get(0))
+        self.cache.put(0, '30', '0')
+        self.assertEqual(self.cache.get(0), ('30', '0'))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_lru(self):
+        for row in range(3):
+            self.cache.put(row, '', '')
+        self.cache.get(0)
+        self.cache.put(3, '', '')
+        self.assertEqual(list(self.cache.rows), [2, 0, 3])
+
+    def test_contains(self):
+        self.cache.put(0, '', '')
+        self.assertIn(0, self.cache)
+        self.assertNotIn(1, self.cache)
+        self.cache.invalidate(0, 0)
+        self.assertNotIn(0, self.cache)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 0))
+
+    def test_invalidate_range(self):
+        for row in range(3):
+            self.cache.put(row, '', '')
+        self.cache.invalidate(1, 1)
+        self.assertIsNotNone(self.cache.get(0))
+        self.assertIsNone(self.cache.get(1))
+        self.assertIsNotNone(self.cache.get(2))
+
+    def test_invalidate_to_end(self):
+        for row in range(3):
+            self.cache.put(row, '', '')
+        self.cache.invalidate(1)
+        self.cache.put(2, 'x', 'x')
+        self.assertIsNotNone(self.cache.get(0))
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual(self.cache.get(2), ('x', 'x'))
+        self.assertIsNone(self.cache.get(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+
+from model import Buffer, Searcher
+from model.search import find_all, replace_all
+
+
+class TestSearcher(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(1)
+        self.data = bytes(rng.choice(b'ab') for _ in range(4096))
+        self.test_file = tempfile.NamedTemporaryFile(delete=False)
+        self.test_file.write(self.data)
+        self.test_file.close()
+        self.buffer = Buffer(self.test_file.name)
+        self.found = []
+        self.searcher = Searcher(self.buffer, self.found.extend,
+                                 chunk_size=100)
+
+    def tearDown(self):
+        self.searcher.close()
+        self.buffer.close()
+        os.remove(self.test_file.name)
+
+    def expected(self, pattern):
+        content = self.buffer.pieces.read(0, self.buffer.get_size())
+        return [i for i in range(len(content))
+                if content.startswith(pattern, i)]
+
+    def test_search(self):
+        self.searcher.search(b'abba')
+        self.searcher.join()
+        self.assertEqual(self.searcher.results, self.expected(b'abba'))
+        self.assertEqual(sorted(self.found), self.searcher.results)
+
+    def test_rescan_after_edits(self):
+        self.searcher.search(b'abba')
+        self.searcher.join()
+        rng = random.Random(2)
+        for _ in range(50):
+            index = rng.randrange(self.buffer.len_ascii_char * 30)
+            if rng.random() < 0.5:
+                self.buffer.add_byte(index, b'b', rng.random() < 0.5)
+            else:
+                self.buffer.delete_byte(index)
+            self.searcher.start()
+        self.buffer.logger.undo()
+        self.searcher.start()
+        self.searcher.join()
+        self.assertEqual(self.searcher.results, self.expected(b'abba'))
+        self.assertEqual(self.searcher.pending, [])
+
+    def test_find_all(self):
+        self.buffer.add_byte(10, b'a', False)
+        self.buffer.add_byte(40, b'b', True)
+        self.buffer.delete_byte(100)
+        found = find_all(self.buffer.pieces, self.buffer.file_name,
+                         b'abba', chunk_size=300, workers=2)
+        self.assertEqual(found, self.expected(b'abba'))
+
+    def test_parallel_search(self):
+        searcher = Searcher(self.buffer, workers=2, parallel_chunk_size=500)
+        searcher.search(b'baab')
+        searcher.join()
+        self.assertEqual(searcher.results, self.expected(b'baab'))
+        self.assertEqual(searcher.get_results(1, 2),
+                         self.expected(b'baab')[1:3])
+        searcher.close()
+
+    def test_replace_all(self):
+        content = self.buffer.pieces.read(0, self.buffer.get_size())
+        count = replace_all(self.buffer, b'aa', b'xyz')
+        self.assertEqual(count, content.count(b'aa'))
+        self.assertEqual(
+            self.buffer.pieces.read(0, self.buffer.get_size() + count),
+            content.replace(b'aa', b'xyz'))
+        self.assertEqual(len(self.buffer.logger.undo_stack), 1)
+        self.buffer.logger.undo()
+        self.assertEqual(self.buffer.pieces.read(0, len(content) + count),
+                         content)
+        self.buffer.logger.redo()
+        self.assertEqual(replace_all(self.buffer, b'xyz', b''), count)
+        self.assertEqual(self.buffer.pieces.read(0, len(content)),
+                         content.replace(b'aa', b''))
+
+    def test_replace_with_results(self):
+        self.assertIsNone(self.searcher.complete_results(b'ab'))
+        self.searcher.search(b'ab')
+        self.searcher.join()
+        found = self.searcher.complete_results(b'ab')
+        self.assertEqual(found, self.expected(b'ab'))
+        self.assertIsNone(self.searcher.complete_results(b'ba'))
+        content = self.buffer.pieces.read(0, self.buffer.get_size())
+        self.assertEqual(replace_all(self.buffer, b'ab', b'c', found=found),
+                         content.count(b'ab'))
+        self.assertIsNone(self.searcher.complete_results(b'ab'))
+        self.assertEqual(self.buffer.pieces.read(0, len(content)),
+                         content.replace(b'ab', b'c'))
+
+    def test_cancel(self):
+        self.searcher.search(b'ab')
+        self.searcher.cancel()
+        self.assertFalse(self.searcher.is_running)
+        self.searcher.start()
+        self.searcher.join()
+        self.assertEqual(self.searcher.results, self.expected(b'ab'))
+
+    def test_cancel_parallel(self):
+        cancelled = threading.Event()
+        cancelled.set()
+        self.assertEqual(find_all(self.buffer.pieces, self.buffer.file_name,
+                                  b'abba', chunk_size=64, workers=2,
+                                  cancelled=cancelled), [])
+        searcher = Searcher(self.buffer, workers=2, parallel_chunk_size=64)
+        searcher.search(b'abba')
+        time.sleep(0.05)
+        start = time.perf_counter()
+        searcher.cancel()
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertFalse(searcher.is_running)
+        self.assertTrue(searcher.full_scan)
+        searcher.start()
+        searcher.join()
+        self.assertEqual(searcher.results, self.expected(b'abba'))
+        searcher.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
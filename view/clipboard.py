@@ -0,0 +1,70 @@
+from typing import List
+
+from PyQt5 import QtCore
+
+from model.clipboard import HEX, RAW, Clipboard
+
+RAW_MIME: str = 'application/octet-stream'
+TEXT_MIME: str = 'text/plain'
+URI_MIME: str = 'text/uri-list'
+
+
+class RangeMimeData(QtCore.QMimeData):
+    """
+    Данные буфера обмена, которые кодируются только по запросу другого
+    приложения. Копия до mime_limit байтов предлагается как двоичные
+    данные и шестнадцатеричный текст, а более крупная - только ссылкой
+    на временный файл с копией.
+
+    :param clipboard: Копия диапазона.
+    :type clipboard: Clipboard
+    :param mime_limit: Наибольший размер копии, передаваемой в памяти.
+    :type mime_limit: int
+    """
+
+    def __init__(self, clipboard: Clipboard,
+                 mime_limit: int = 67108864) -> None:
+        super().__init__()
+        self.clipboard: Clipboard = clipboard
+        self.mime_limit: int = mime_limit
+
+    def formats(self) -> List[str]:
+        """
+        Возвращает доступные форматы.
+
+        :return: Типы MIME.
+        :rtype: List[str]
+        """
+        if self.clipboard.size <= self.mime_limit:
+            return [RAW_MIME, TEXT_MIME]
+        if self.clipboard.path is not None:
+            return [URI_MIME]
+        return []
+
+    def hasFormat(self, mime_type: str) -> bool:
+        """
+        Проверяет, доступен ли формат.
+
+        :param mime_type: Тип MIME.
+        :type mime_type: str
+        :return: True, если формат доступен.
+        :rtype: bool
+        """
+        return mime_type in self.formats()
+
+    def retrieveData(self, mime_type: str, _: QtCore.QVariant.Type) -> bytes:
+        """
+        Кодирует копию в запрошенном формате.
+
+        :param mime_type: Тип MIME.
+        :type mime_type: str
+        :return: Данные.
+        :rtype: bytes
+        """
+        if not self.hasFormat(mime_type):
+            return b''
+        if mime_type == URI_MIME:
+            url = QtCore.QUrl.fromLocalFile(self.clipboard.path)
+            return bytes(url.toEncoded()) + b'\r\n'
+        data_format = HEX if mime_type == TEXT_MIME else RAW
+        return b''.join(self.clipboard.iter_chunks(data_format))
@@ -1,32 +1,76 @@
 from PyQt5 import QtWidgets
 from model.model import Buffer
+from model.patch import export_patch, import_patch
+from model.saving import WriteStats
 from typing import Union
 
 
-def open_file() -> Union[Buffer, None]:
+def open_file(journal: bool = True) -> Union[Buffer, None]:
     """
     Открывает файл с помощью стандартного диалога открытия файла и
     возвращает его содержимое в виде объекта Buffer.
 
+    :param journal: Вести журнал правок и восстановить несохранённые
+    правки из него.
+    :type journal: bool
     :return: Объект Buffer, содержащий данные файла, либо None, если
     пользователь не выбрал файл.
     :rtype: Union[Buffer, None]
     """
     file_name = QtWidgets.QFileDialog.getOpenFileName()[0]
     if file_name:
-        return Buffer(file_name)
+        return Buffer(file_name, journal=journal)
     return None
 
 
-def save_file(buffer: Buffer) -> None:
+def save_file(buffer: Buffer) -> Union[WriteStats, None]:
     """
     Сохраняет данные из объекта Buffer в файл с помощью стандартного
      диалога сохранения файла.
 
     :param buffer: Объект Buffer, содержащий данные для сохранения.
     :type buffer: Buffer
+    :return: Статистика записи, либо None, если пользователь не выбрал
+    файл.
+    :rtype: Union[WriteStats, None]
+    """
+    file_name = QtWidgets.QFileDialog.getSaveFileName()[0]
+    if file_name:
+        return buffer.save(file_name)
+    return None
+
+
+def export_patch_file(buffer: Buffer) -> Union[int, None]:
+    """
+    Сохраняет патч с изменениями буфера с помощью стандартного диалога
+    сохранения файла.
+
+    :param buffer: Объект Buffer с изменениями.
+    :type buffer: Buffer
+    :return: Количество действий патча, либо None, если пользователь не
+    выбрал файл.
+    :rtype: Union[int, None]
     """
     file_name = QtWidgets.QFileDialog.getSaveFileName()[0]
     if file_name:
         with open(file_name, 'wb') as file:
-            buffer.write_data(file)
+            return export_patch(buffer, file)
+    return None
+
+
+def import_patch_file(buffer: Buffer) -> Union[int, None]:
+    """
+    Применяет к буферу патч, выбранный в стандартном диалоге открытия
+    файла.
+
+    :param buffer: Объект Buffer, открытый на исходном файле патча.
+    :type buffer: Buffer
+    :return: Размер результата, либо None, если пользователь не выбрал
+    файл.
+    :rtype: Union[int, None]
+    """
+    file_name = QtWidgets.QFileDialog.getOpenFileName()[0]
+    if file_name:
+        with open(file_name, 'rb') as file:
+            return import_patch(buffer, file)
+    return None
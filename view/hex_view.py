@@ -0,0 +1,397 @@
+from typing import Dict, List, Tuple
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from controller.cursor_manager import (cursor_controller_for_hex,
+                                       cursor_controller_for_text,
+                                       cursor_correcting_for_hex)
+
+
+class ViewCursor:
+    """
+    Курсор области просмотра. Повторяет ту часть интерфейса
+    QTextCursor, которой пользуется контроллер.
+
+    :param position: Позиция курсора.
+    :type position: int
+    """
+
+    def __init__(self, position: int = 0) -> None:
+        self._position: int = position
+
+    def position(self) -> int:
+        """
+        Возвращает позицию курсора.
+
+        :return: Позиция.
+        :rtype: int
+        """
+        return self._position
+
+    def setPosition(self, position: int) -> None:
+        """
+        Устанавливает позицию курсора.
+
+        :param position: Позиция.
+        :type position: int
+        """
+        self._position = position
+
+
+class HexView(QtWidgets.QWidget):
+    """
+    Область просмотра, которая сама рисует видимые строки: смещения,
+    шестнадцатеричные байты и их текстовое представление. Документ не
+    создаётся, а раскладка каждого байта и символа кэшируется в
+    QStaticText.
+
+    Позиции курсоров совпадают с позициями прежних текстовых полей:
+    в шестнадцатеричной колонке на строку приходится 48 позиций
+    (по 3 на байт), в текстовой - 17.
+
+    :param font: Моноширинный шрифт.
+    :type font: QtGui.QFont
+    :param parent: Родительский виджет.
+    :type parent: QtWidgets.QWidget
+    """
+
+    hex_field_key_pres = QtCore.pyqtSignal(object, str)
+    text_field_key_pres = QtCore.pyqtSignal(object, str)
+    hex_field_backspace = QtCore.pyqtSignal(object)
+    text_field_backspace = QtCore.pyqtSignal(object)
+    wheel_scrolled = QtCore.pyqtSignal(int)
+
+    hex_line = 48
+    text_line = 17
+    row_bytes = 16
+
+    def __init__(self, font: QtGui.QFont,
+                 parent: QtWidgets.QWidget = None) -> None:
+        super().__init__(parent)
+        self.setFont(font)
+        self.setFocusPolicy(QtCore.Qt.StrongFocus)
+        self.setAttribute(QtCore.Qt.WA_OpaquePaintEvent)
+        metrics = QtGui.QFontMetrics(font)
+        self.char_width: int = metrics.horizontalAdvance('a')
+        self.line_height: int = metrics.lineSpacing()
+        self.offset_x: int = self.char_width
+        self.hex_x: int = self.offset_x + self.char_width * 10
+        self.text_x: int = self.hex_x + self.char_width * 50
+        self.setMinimumSize(self.text_x + self.char_width * 18,
+                            self.line_height * 31)
+
+        self.static_texts: Dict[str, QtGui.QStaticText] = {}
+        self.rows: List[Tuple[str, str]] = []
+        self.first_row: int = 0
+        self.byte_count: int = 0
+        self.offset_title: str = ''
+        self.hex_position: int = 0
+        self.text_position: int = 0
+        self.hex_active: bool = True
+        self.read_only: bool = True
+        self.cursors: List[int] = []
+
+    def static_text(self, text: str) -> QtGui.QStaticText:
+        """
+        Возвращает закэшированную раскладку строки.
+
+        :param text: Строка.
+        :type text: str
+        :return: Раскладка.
+        :rtype: QtGui.QStaticText
+        """
+        static = self.static_texts.get(text)
+        if static is None:
+            static = QtGui.QStaticText(text)
+            static.setTextFormat(QtCore.Qt.PlainText)
+            static.prepare(QtGui.QTransform(), self.font())
+            self.static_texts[text] = static
+        return static
+
+    def set_rows(self, first_row: int, rows: List[Tuple[str, str]]) -> None:
+        """
+        Задаёт видимые строки и перерисовывает область.
+
+        :param first_row: Логический номер первой строки.
+        :type first_row: int
+        :param rows: Шестнадцатеричное и текстовое представления строк.
+        :type rows: List[Tuple[str, str]]
+        """
+        self.first_row = first_row
+        self.rows = rows
+        self.byte_count = sum((len(hex_row) + 1) // 3 for hex_row, _ in rows)
+        self.hex_position = min(self.hex_position, self.hex_end())
+        self.text_position = min(self.text_position, self.text_end())
+        self.update()
+
+    def set_offset_title(self, title: str) -> None:
+        """
+        Задаёт заголовок колонки смещений.
+
+        :param title: Заголовок.
+        :type title: str
+        """
+        self.offset_title = title
+        self.update()
+
+    def set_positions(self, hex_position: int, text_position: int) -> None:
+        """
+        Устанавливает позиции курсоров в обеих колонках.
+
+        :param hex_position: Позиция в шестнадцатеричной колонке.
+        :type hex_position: int
+        :param text_position: Позиция в текстовой колонке.
+        :type text_position: int
+        """
+        self.hex_position = min(hex_position, self.hex_end())
+        self.text_position = min(text_position, self.text_end())
+        self.update()
+
+    def cursor_offset(self) -> int:
+        """
+        Логическое смещение байта под курсором активной колонки.
+
+        :return: Смещение.
+        :rtype: int
+        """
+        if self.hex_active:
+            row, column = divmod(self.hex_position, self.hex_line)
+            column //= 3
+        else:
+            row, column = divmod(self.text_position, self.text_line)
+            column = min(column, self.row_bytes - 1)
+        return (self.first_row + row) * self.row_bytes + column
+
+    def setReadOnly(self, read_only: bool) -> None:
+        """
+        Разрешает или запрещает редактирование.
+
+        :param read_only: Только для чтения.
+        :type read_only: bool
+        """
+        self.read_only = read_only
+
+    def clear(self) -> None:
+        """
+        Очищает область просмотра.
+        """
+        self.cursors = []
+        self.set_rows(0, [])
+
+    def hex_end(self) -> int:
+        """
+        Позиция после последнего байта в шестнадцатеричной колонке.
+
+        :return: Позиция.
+        :rtype: int
+        """
+        return self.byte_count * 3
+
+    def text_end(self) -> int:
+        """
+        Позиция после последнего байта в текстовой колонке.
+
+        :return: Позиция.
+        :rtype: int
+        """
+        return self.byte_count + self.byte_count // self.row_bytes
+
+    def paintEvent(self, event: QtGui.QPaintEvent) -> None:
+        """
+        Рисует заголовок, видимые строки и курсоры.
+
+        :param event: Событие отрисовки.
+        :type event: QtGui.QPaintEvent
+        """
+        painter = QtGui.QPainter(self)
+        painter.setFont(self.font())
+        palette = self.palette()
+        painter.fillRect(event.rect(), palette.base())
+        painter.setPen(palette.text().color())
+        width = self.char_width
+        line = self.line_height
+
+        font = QtGui.QFont(self.font())
+        font.setBold(True)
+        painter.setFont(font)
+        painter.drawText(QtCore.QRectF(self.offset_x, 0,
+                                       self.hex_x - self.offset_x, line),
+                         QtCore.Qt.AlignLeft, self.offset_title)
+        painter.setFont(self.font())
+        for column in range(self.row_bytes):
+            painter.drawStaticText(
+                QtCore.QPointF(self.hex_x + column * 3 * width, 0),
+                self.static_text(f'0{column:x}'))
+
+        for index, (hex_row, text_row) in enumerate(self.rows):
+            y = (index + 1) * line
+            painter.drawText(QtCore.QRectF(self.offset_x, y,
+                                           self.hex_x - self.offset_x, line),
+                             QtCore.Qt.AlignLeft,
+                             f'{self.first_row + index:07x}0')
+            for column in range(0, len(hex_row), 3):
+                painter.drawStaticText(
+                    QtCore.QPointF(self.hex_x + column * width, y),
+                    self.static_text(hex_row[column:column + 2]))
+            for column, char in enumerate(text_row):
+                painter.drawStaticText(
+                    QtCore.QPointF(self.text_x + column * width, y),
+                    self.static_text(char))
+
+        if self.read_only:
+            return
+        highlight = palette.highlight().color()
+        for position in self.cursors:
+            self.draw_cursor(painter, self.hex_x, position, self.hex_line,
+                             highlight, False)
+        self.draw_cursor(painter, self.hex_x, self.hex_position,
+                         self.hex_line, highlight, self.hex_active)
+        self.draw_cursor(painter, self.text_x, self.text_position,
+                         self.text_line, highlight, not self.hex_active)
+
+    def draw_cursor(self, painter: QtGui.QPainter, x: int, position: int,
+                    line_length: int, color: QtGui.QColor,
+                    active: bool) -> None:
+        """
+        Рисует курсор в колонке.
+
+        :param painter: Рисовальщик.
+        :type painter: QtGui.QPainter
+        :param x: Левая граница колонки.
+        :type x: int
+        :param position: Позиция курсора.
+        :type position: int
+        :param line_length: Количество позиций в строке колонки.
+        :type line_length: int
+        :param color: Цвет курсора.
+        :type color: QtGui.QColor
+        :param active: Находится ли в этой колонке фокус ввода.
+        :type active: bool
+        """
+        row, column = divmod(position, line_length)
+        left = x + column * self.char_width
+        top = (row + 1) * self.line_height
+        if active:
+            painter.fillRect(left, top, 2, self.line_height, color)
+        else:
+            painter.setPen(color)
+            painter.drawRect(left, top, self.char_width, self.line_height - 1)
+
+    def mousePressEvent(self, event: QtGui.QMouseEvent) -> None:
+        """
+        Переносит курсор в выбранную позицию.
+
+        :param event: Событие мыши.
+        :type event: QtGui.QMouseEvent
+        """
+        row = max(0, event.y() // self.line_height - 1)
+        if event.x() < self.text_x - self.char_width:
+            column = max(0, (event.x() - self.hex_x) // self.char_width)
+            position = row * self.hex_line + min(column, self.hex_line - 1)
+            self.hex_position = min(cursor_controller_for_hex(position),
+                                    self.hex_end())
+            self.hex_active = True
+        else:
+            column = max(0, (event.x() - self.text_x) // self.char_width)
+            position = row * self.text_line + min(column,
+                                                  self.text_line - 1)
+            self.text_position = min(cursor_controller_for_text(position),
+                                     self.text_end())
+            self.hex_active = False
+        self.update()
+
+    def wheelEvent(self, event: QtGui.QWheelEvent) -> None:
+        """
+        Передаёт прокрутку колесом мыши в виде количества строк.
+
+        :param event: Событие колеса мыши.
+        :type event: QtGui.QWheelEvent
+        """
+        self.wheel_scrolled.emit(-event.angleDelta().y() // 40)
+
+    def focusNextPrevChild(self, _: bool) -> bool:
+        """
+        Переключает колонку по Tab вместо перехода к другому виджету.
+
+        :return: True, событие обработано.
+        :rtype: bool
+        """
+        self.hex_active = not self.hex_active
+        self.update()
+        return True
+
+    def keyPressEvent(self, event: QtGui.QKeyEvent) -> None:
+        """
+        Обрабатывает перемещение курсора и ввод в активной колонке.
+
+        :param event: Событие клавиатуры.
+        :type event: QtGui.QKeyEvent
+        """
+        if self.hex_active:
+            self.hex_key_event(event)
+        else:
+            self.text_key_event(event)
+        self.update()
+
+    def hex_key_event(self, event: QtGui.QKeyEvent) -> None:
+        """
+        Обработчик клавиш для шестнадцатеричной колонки.
+
+        :param event: Событие клавиатуры.
+        :type event: QtGui.QKeyEvent
+        """
+        position = self.hex_position
+        key = event.key()
+        if key == QtCore.Qt.Key_Left:
+            position = cursor_correcting_for_hex(position) - 3
+        elif key == QtCore.Qt.Key_Right:
+            position = cursor_correcting_for_hex(position) + 3
+        elif key == QtCore.Qt.Key_Up:
+            position = cursor_correcting_for_hex(position)
+            if position >= self.hex_line:
+                position -= self.hex_line
+        elif key == QtCore.Qt.Key_Down:
+            position = cursor_correcting_for_hex(position) + self.hex_line
+        elif self.read_only:
+            return
+        else:
+            cursor = ViewCursor(position)
+            if key == QtCore.Qt.Key_Backspace:
+                self.hex_field_backspace.emit(cursor)
+            else:
+                self.hex_field_key_pres.emit(cursor, event.text())
+            position = cursor.position()
+        position = cursor_controller_for_hex(max(0, position))
+        self.hex_position = min(position, self.hex_end())
+
+    def text_key_event(self, event: QtGui.QKeyEvent) -> None:
+        """
+        Обработчик клавиш для текстовой колонки.
+
+        :param event: Событие клавиатуры.
+        :type event: QtGui.QKeyEvent
+        """
+        position = self.text_position
+        key = event.key()
+        if key == QtCore.Qt.Key_Left:
+            position -= 1
+            if position % self.text_line == self.text_line - 1:
+                position -= 1
+        elif key == QtCore.Qt.Key_Right:
+            position += 1
+        elif key == QtCore.Qt.Key_Up:
+            if position >= self.text_line:
+                position -= self.text_line
+        elif key == QtCore.Qt.Key_Down:
+            position += self.text_line
+        elif self.read_only:
+            return
+        else:
+            cursor = ViewCursor(position)
+            if key == QtCore.Qt.Key_Backspace:
+                self.text_field_backspace.emit(cursor)
+            else:
+                self.text_field_key_pres.emit(cursor, event.text())
+            position = cursor.position()
+        position = cursor_controller_for_text(max(0, position))
+        self.text_position = min(position, self.text_end())
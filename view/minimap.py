@@ -0,0 +1,91 @@
+from typing import Optional
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from model.analysis import Minimap, Stats
+
+
+def stats_color(stats: Optional[Stats]) -> QtGui.QColor:
+    """
+    Цвет строки обзора: красный растёт с энтропией, зелёный - с долей
+    текста, синий - с долей старших байтов, а нули затемняют строку.
+
+    :param stats: Статистика строки (None - ещё не посчитано).
+    :type stats: Optional[Stats]
+    :return: Цвет.
+    :rtype: QtGui.QColor
+    """
+    if stats is None:
+        return QtGui.QColor(QtCore.Qt.gray)
+    entropy, zeros, text, _, high = stats
+    light = 1.0 - zeros
+    return QtGui.QColor.fromRgbF(min(1.0, entropy / 8) * light,
+                                 min(1.0, text) * light,
+                                 min(1.0, high) * light * 0.8)
+
+
+class MinimapView(QtWidgets.QWidget):
+    """
+    Полоса обзора рядом с полосой прокрутки: каждая строка пикселей
+    показывает цветом энтропию и классы байтов своей части файла, а
+    щелчок переходит к этой части.
+    """
+
+    seek_requested = QtCore.pyqtSignal(int)
+
+    def __init__(self, parent: Optional[QtWidgets.QWidget] = None) -> None:
+        super().__init__(parent)
+        self.minimap: Optional[Minimap] = None
+        self.visible_offset: int = 0
+        self.setFixedWidth(16)
+
+    def set_minimap(self, minimap: Optional[Minimap]) -> None:
+        """
+        Задаёт отображаемый обзор.
+
+        :param minimap: Обзор либо None.
+        :type minimap: Optional[Minimap]
+        """
+        self.minimap = minimap
+        self.update()
+
+    def set_visible_offset(self, offset: int) -> None:
+        """
+        Отмечает смещение первой видимой строки данных.
+
+        :param offset: Смещение.
+        :type offset: int
+        """
+        self.visible_offset = offset
+        self.update()
+
+    def paintEvent(self, event: QtGui.QPaintEvent) -> None:
+        """
+        Рисует строки обзора и отметку видимой части.
+
+        :param event: Событие отрисовки.
+        :type event: QtGui.QPaintEvent
+        """
+        painter = QtGui.QPainter(self)
+        painter.fillRect(event.rect(), self.palette().base())
+        if self.minimap is None:
+            return
+        height = self.height()
+        for row, stats in enumerate(self.minimap.rows(height)):
+            painter.fillRect(0, row, self.width(), 1, stats_color(stats))
+        size = self.minimap.buffer.get_size()
+        if size:
+            y = self.visible_offset * height // size
+            painter.fillRect(0, y, self.width(), 2,
+                             self.palette().highlight())
+
+    def mousePressEvent(self, event: QtGui.QMouseEvent) -> None:
+        """
+        Запрашивает переход к части файла под указателем.
+
+        :param event: Событие мыши.
+        :type event: QtGui.QMouseEvent
+        """
+        if self.minimap is not None:
+            self.seek_requested.emit(self.minimap.offset_at(
+                max(0, event.y()), self.height()))
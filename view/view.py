@@ -1,8 +1,9 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QDialog
 
-from controller.cursor_manager import cursor_correcting_for_hex
+from view.hex_view import HexView
 from view.localization import Localization
+from view.minimap import MinimapView
 from view.utils import CustomDialog
 
 
@@ -12,10 +13,13 @@ class UiMainWindow(QtWidgets.QMainWindow):
 
     """
 
-    hex_field_key_pres = QtCore.pyqtSignal(QtGui.QTextCursor, str)
-    text_field_key_pres = QtCore.pyqtSignal(QtGui.QTextCursor, str)
-    hex_field_backspace = QtCore.pyqtSignal(QtGui.QTextCursor)
-    text_field_backspace = QtCore.pyqtSignal(QtGui.QTextCursor)
+    hex_field_key_pres = QtCore.pyqtSignal(object, str)
+    text_field_key_pres = QtCore.pyqtSignal(object, str)
+    hex_field_backspace = QtCore.pyqtSignal(object)
+    text_field_backspace = QtCore.pyqtSignal(object)
+    search_found = QtCore.pyqtSignal()
+    compare_finished = QtCore.pyqtSignal()
+    minimap_updated = QtCore.pyqtSignal()
 
     def __init__(self) -> None:
         """
@@ -36,71 +40,64 @@ class UiMainWindow(QtWidgets.QMainWindow):
         font = QtGui.QFont("PT Mono", 12)
         font_metrics = QtGui.QFontMetrics(font)
         char_width = font_metrics.horizontalAdvance('a')
-        char_height = font_metrics.height()
 
         self.central_widget = QtWidgets.QWidget(self)
         self.setCentralWidget(self.central_widget)
 
         self.locale = Localization()
 
-        spacer = QtWidgets.QSpacerItem(40, 20,
-                                       QtWidgets.QSizePolicy.Expanding,
-                                       QtWidgets.QSizePolicy.Minimum)
-
-        self.bytes_field = QtWidgets.QTextEdit(self.central_widget)
-        self.bytes_field.setFont(font)
-        self.bytes_field.setMinimumWidth(char_width * 16 * 3 + thickening)
-        self.bytes_field.setVerticalScrollBarPolicy(
-            QtCore.Qt.ScrollBarAlwaysOff)
-        self.bytes_field.setReadOnly(True)
-        self.bytes_field.keyPressEvent = self.hex_key_event
-        self.bytes_field.wheelEvent = lambda _: None
-
-        self.count_tens = QtWidgets.QTextEdit(self.central_widget)
-        self.count_tens.setFixedWidth(char_width * 9 + thickening)
-        self.count_tens.setFont(font)
-        self.count_tens.setVerticalScrollBarPolicy(
-            QtCore.Qt.ScrollBarAlwaysOff)
-        self.count_tens.setDisabled(True)
-
-        self.bytes_decryption_field = QtWidgets.QTextEdit(self.central_widget)
-        self.bytes_decryption_field.setFixedWidth(char_width * 17 + thickening)
-        self.bytes_decryption_field.setFont(font)
-        self.bytes_decryption_field.setVerticalScrollBarPolicy(
-            QtCore.Qt.ScrollBarAlwaysOff)
-        self.bytes_decryption_field.setWordWrapMode(QtGui.QTextOption.NoWrap)
-        self.bytes_decryption_field.setReadOnly(True)
-        self.bytes_decryption_field.keyPressEvent = self.text_key_event
-        self.bytes_decryption_field.wheelEvent = lambda _: None
-
-        self.count_units = QtWidgets.QTextBrowser(self.central_widget)
-        self.count_units.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
-        self.count_units.setMaximumHeight(char_height + 10)
-        self.count_units.setFont(font)
-        self.count_units.setDisabled(True)
-
-        self.lable = QtWidgets.QLabel()
-        self.lable.setFont(font)
-        font.setBold(True)
-        self.lable.setFont(font)
+        self.hex_view = HexView(font, self.central_widget)
+        self.hex_view.hex_field_key_pres.connect(self.hex_field_key_pres)
+        self.hex_view.text_field_key_pres.connect(self.text_field_key_pres)
+        self.hex_view.hex_field_backspace.connect(self.hex_field_backspace)
+        self.hex_view.text_field_backspace.connect(
+            self.text_field_backspace)
 
         self.scroll_bar = QtWidgets.QScrollBar()
         self.scroll_bar.setRange(0, 0)
+        self.hex_view.wheel_scrolled.connect(
+            lambda rows: self.scroll_bar.setValue(
+                self.scroll_bar.value() + rows))
 
-        self.layout = QtWidgets.QGridLayout()
-        self.layout.addItem(spacer, 1, 0, 1, 1)
-        self.layout.addWidget(self.bytes_field, 1, 2, 1, 1)
-        self.layout.addWidget(self.count_tens, 1, 1, 1, 1)
-        self.layout.addWidget(self.bytes_decryption_field, 1, 3, 1, 1)
-        self.layout.addWidget(self.count_units, 0, 2, 1, 1)
-        self.layout.addWidget(self.lable, 0, 1, 1, 1)
-        self.layout.addItem(spacer, 1, 4, 1, 1)
+        self.minimap_view = MinimapView(self.central_widget)
+        self.minimap_updated.connect(self.minimap_view.update)
+
+        self.search_field = QtWidgets.QLineEdit(self.central_widget)
+        self.search_field.setFont(font)
+
+        self.search_mode = QtWidgets.QComboBox(self.central_widget)
+        self.search_mode.addItems(['', ''])
+
+        self.replace_field = QtWidgets.QLineEdit(self.central_widget)
+        self.replace_field.setFont(font)
+
+        self.replace_button = QtWidgets.QPushButton(self.central_widget)
+
+        self.search_status = QtWidgets.QLabel(self.central_widget)
+
+        self.search_previous_page = QtWidgets.QPushButton(
+            '<', self.central_widget)
+        self.search_next_page = QtWidgets.QPushButton(
+            '>', self.central_widget)
+
+        self.search_results = QtWidgets.QListWidget(self.central_widget)
+        self.search_results.setFont(font)
+        self.search_results.setFixedWidth(char_width * 12 + thickening)
 
         self.upper_layout = QtWidgets.QHBoxLayout()
+        self.upper_layout.addWidget(self.search_field)
+        self.upper_layout.addWidget(self.search_mode)
+        self.upper_layout.addWidget(self.replace_field)
+        self.upper_layout.addWidget(self.replace_button)
+        self.upper_layout.addWidget(self.search_status)
+        self.upper_layout.addWidget(self.search_previous_page)
+        self.upper_layout.addWidget(self.search_next_page)
 
         self.main_layout = QtWidgets.QHBoxLayout()
-        self.main_layout.addLayout(self.layout)
+        self.main_layout.addWidget(self.hex_view)
         self.main_layout.addWidget(self.scroll_bar)
+        self.main_layout.addWidget(self.minimap_view)
+        self.main_layout.addWidget(self.search_results)
 
         self.global_layout = QtWidgets.QVBoxLayout(self.central_widget)
         self.global_layout.addLayout(self.upper_layout)
@@ -122,15 +119,37 @@ class UiMainWindow(QtWidgets.QMainWindow):
 
         self.undo_action = QtWidgets.QAction(self)
         self.redo_action = QtWidgets.QAction(self)
+        self.select_action = QtWidgets.QAction(self)
+        self.select_action.setShortcut(QtGui.QKeySequence("Ctrl+B"))
+        self.copy_action = QtWidgets.QAction(self)
+        self.copy_action.setShortcut(QtGui.QKeySequence.Copy)
+        self.paste_action = QtWidgets.QAction(self)
+        self.paste_action.setShortcut(QtGui.QKeySequence.Paste)
+        self.compare_action = QtWidgets.QAction(self)
+        self.next_difference_action = QtWidgets.QAction(self)
+        self.next_difference_action.setShortcut(QtGui.QKeySequence("F8"))
+        self.previous_difference_action = QtWidgets.QAction(self)
+        self.previous_difference_action.setShortcut(
+            QtGui.QKeySequence("Shift+F8"))
         self.setMenuBar(self.menubar)
 
         self.open_action = QtWidgets.QAction(self)
         self.save_action = QtWidgets.QAction(self)
+        self.export_patch_action = QtWidgets.QAction(self)
+        self.import_patch_action = QtWidgets.QAction(self)
 
         self.file_menu.addAction(self.open_action)
         self.file_menu.addAction(self.save_action)
+        self.file_menu.addAction(self.export_patch_action)
+        self.file_menu.addAction(self.import_patch_action)
         self.actions_menu.addAction(self.undo_action)
         self.actions_menu.addAction(self.redo_action)
+        self.actions_menu.addAction(self.select_action)
+        self.actions_menu.addAction(self.copy_action)
+        self.actions_menu.addAction(self.paste_action)
+        self.actions_menu.addAction(self.compare_action)
+        self.actions_menu.addAction(self.next_difference_action)
+        self.actions_menu.addAction(self.previous_difference_action)
         self.menubar.addAction(self.file_menu.menuAction())
         self.menubar.addAction(self.actions_menu.menuAction())
         self.language_menu.addAction(self.language_action_en)
@@ -140,13 +159,13 @@ class UiMainWindow(QtWidgets.QMainWindow):
 
         self.set_titles()
 
-        self.multicursor_action = QtWidgets.QAction("Multicursor", self.bytes_field)
+        self.multicursor_action = QtWidgets.QAction("Multicursor", self.hex_view)
         self.multicursor_action.setShortcut(QtGui.QKeySequence("Ctrl+Q"))
-        self.bytes_field.addAction(self.multicursor_action)
+        self.hex_view.addAction(self.multicursor_action)
 
-        self.cursor_reset_action = QtWidgets.QAction("Multicursor", self.bytes_field)
+        self.cursor_reset_action = QtWidgets.QAction("Multicursor", self.hex_view)
         self.cursor_reset_action.setShortcut(QtGui.QKeySequence("Ctrl+R"))
-        self.bytes_field.addAction(self.cursor_reset_action)
+        self.hex_view.addAction(self.cursor_reset_action)
 
         self.language_action_en.triggered.connect(lambda: self.change_language('english'))
         self.language_action_ru.triggered.connect(lambda: self.change_language('russian'))
@@ -160,12 +179,30 @@ class UiMainWindow(QtWidgets.QMainWindow):
         self.file_menu.setTitle(self.locale.localize('file'))
         self.open_action.setText(self.locale.localize('open'))
         self.save_action.setText(self.locale.localize('save'))
+        self.export_patch_action.setText(
+            self.locale.localize('patch.export'))
+        self.import_patch_action.setText(
+            self.locale.localize('patch.import'))
         self.actions_menu.setTitle(self.locale.localize('action'))
         self.undo_action.setText(self.locale.localize('action.undo'))
         self.redo_action.setText(self.locale.localize('action.redo'))
+        self.select_action.setText(self.locale.localize('action.select'))
+        self.copy_action.setText(self.locale.localize('action.copy'))
+        self.paste_action.setText(self.locale.localize('action.paste'))
+        self.compare_action.setText(self.locale.localize('compare'))
+        self.next_difference_action.setText(
+            self.locale.localize('compare.next'))
+        self.previous_difference_action.setText(
+            self.locale.localize('compare.previous'))
         self.window_menu.setTitle(self.locale.localize('window'))
         self.language_menu.setTitle(self.locale.localize('language'))
-        self.lable.setText(self.locale.localize('offset'))
+        self.hex_view.set_offset_title(self.locale.localize('offset'))
+        self.search_field.setPlaceholderText(self.locale.localize('search'))
+        self.search_mode.setItemText(0, self.locale.localize('search.hex'))
+        self.search_mode.setItemText(1, self.locale.localize('search.text'))
+        self.replace_field.setPlaceholderText(
+            self.locale.localize('replace'))
+        self.replace_button.setText(self.locale.localize('replace.all'))
 
     def change_language(self, language_code: str) -> None:
         """
@@ -178,58 +215,6 @@ class UiMainWindow(QtWidgets.QMainWindow):
         self.locale.set_language(language_code)
         self.set_titles()
 
-    def hex_key_event(self, event: QtGui.QKeyEvent) -> None:
-        """
-        Обработчик событий для поля шестнадцатеричных данных.
-
-        :param event: Событие клавиатуры.
-        :type event: QtGui.QKeyEvent
-
-        """
-        cursor = self.bytes_field.textCursor()
-        if event.key() == QtCore.Qt.Key_Left:
-            cursor_correcting_for_hex(cursor)
-            cursor.movePosition(cursor.Left, cursor.MoveAnchor, 3)
-        elif event.key() == QtCore.Qt.Key_Right:
-            cursor_correcting_for_hex(cursor)
-            cursor.movePosition(cursor.Right, cursor.MoveAnchor, 3)
-        elif event.key() == QtCore.Qt.Key_Up:
-            cursor_correcting_for_hex(cursor)
-            cursor.movePosition(cursor.Up, cursor.MoveAnchor, 1)
-        elif event.key() == QtCore.Qt.Key_Down:
-            cursor_correcting_for_hex(cursor)
-            cursor.movePosition(cursor.Down, cursor.MoveAnchor, 1)
-        elif event.key() == QtCore.Qt.Key_Backspace:
-            self.hex_field_backspace.emit(cursor)
-        else:
-            self.hex_field_key_pres.emit(cursor, event.text())
-        self.bytes_field.setTextCursor(cursor)
-
-    def text_key_event(self, event: QtGui.QKeyEvent) -> None:
-        """
-        Обработчик событий для поля текстовых данных.
-
-        :param event: Событие клавиатуры.
-        :type event: QtGui.QKeyEvent
-
-        """
-        cursor = self.bytes_decryption_field.textCursor()
-        if event.key() == QtCore.Qt.Key_Left:
-            cursor.movePosition(cursor.Left, cursor.MoveAnchor, 1)
-            if cursor.position() % 17 == 16:
-                cursor.movePosition(cursor.Left, cursor.MoveAnchor, 1)
-        elif event.key() == QtCore.Qt.Key_Right:
-            cursor.movePosition(cursor.Right, cursor.MoveAnchor, 1)
-        elif event.key() == QtCore.Qt.Key_Up:
-            cursor.movePosition(cursor.Up, cursor.MoveAnchor, 1)
-        elif event.key() == QtCore.Qt.Key_Down:
-            cursor.movePosition(cursor.Down, cursor.MoveAnchor, 1)
-        elif event.key() == QtCore.Qt.Key_Backspace:
-            self.text_field_backspace.emit(cursor)
-        else:
-            self.text_field_key_pres.emit(cursor, event.text())
-        self.bytes_decryption_field.setTextCursor(cursor)
-
     def closeEvent(self, event: QtGui.QCloseEvent) -> None:
         """
         Обработчик события закрытия окна.